@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from .archive import ArchiveReader, write_archive, ARCHIVE_EXT
+from .danmaku import DanmakuStore
+from .danmaku_stats import to_jsonable
+
+logger = logging.getLogger('bilibili_core.analysis_cache')
+
+
+class AnalysisCache:
+    """
+    负责按BV号在本地保存视频分析结果：
+    result.json 保存可直接显示的结果和各部分的更新时间，NLP汇总状态和已分析的评论id单独保存，
+    原始弹幕写成归档，封面单独保存为图片；再次分析时先显示缓存，再只获取和计算变化的部分
+    """
+    RESULT_FILE = 'result.json'
+    STATE_FILE = 'nlp_state.json'
+    COVER_FILE = 'cover.jpg'
+    DANMAKU_FILE = 'danmaku' + ARCHIVE_EXT
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+
+    def video_dir(self, bvid):
+        return os.path.join(self.root, bvid)
+
+    def _path(self, bvid, name):
+        return os.path.join(self.video_dir(bvid), name)
+
+    def _read_json(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"分析缓存损坏，将重新分析: {path}: {e}")
+            return None
+
+    def _write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load(self, bvid):
+        """
+        :return: {'result': 分析结果, 'updated': {部分: 时间戳}}，没有缓存时返回 None
+        """
+        with self.lock:
+            cached = self._read_json(self._path(bvid, self.RESULT_FILE))
+            if not cached:
+                return None
+            cover_path = self._path(bvid, self.COVER_FILE)
+            if os.path.exists(cover_path):
+                with open(cover_path, 'rb') as f:
+                    cached['result']['cover_data'] = f.read()
+            return cached
+
+    def save(self, bvid, result, updated):
+        """
+        :param result: 分析结果 (danmaku、cover_data 不写入 result.json，分别单独保存)
+        :param updated: {部分: 时间戳}
+        """
+        data = {k: v for k, v in result.items() if k not in ('danmaku', 'cover_data')}
+        with self.lock:
+            self._write_json(self._path(bvid, self.RESULT_FILE),
+                             {'result': to_jsonable(data), 'updated': updated, 'saved_at': time.time()})
+            cover_data = result.get('cover_data')
+            if cover_data:
+                cover_path = self._path(bvid, self.COVER_FILE)
+                if not os.path.exists(cover_path):
+                    with open(cover_path, 'wb') as f:
+                        f.write(cover_data)
+
+    def load_nlp_state(self, bvid):
+        """
+        :return: (NLP汇总状态, 已分析的评论id集合)，没有缓存时返回 (None, set())
+        """
+        with self.lock:
+            data = self._read_json(self._path(bvid, self.STATE_FILE))
+        if not data:
+            return None, set()
+        return data['state'], set(data.get('ids', []))
+
+    def save_nlp_state(self, bvid, state, ids):
+        with self.lock:
+            self._write_json(self._path(bvid, self.STATE_FILE), {'state': state, 'ids': sorted(ids)})
+
+    def load_danmaku(self, bvid):
+        path = self._path(bvid, self.DANMAKU_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            return DanmakuStore.from_list(ArchiveReader(path))
+        except Exception as e:
+            logger.warning(f"读取缓存弹幕失败: {e}")
+            return None
+
+    def save_danmaku(self, bvid, store):
+        os.makedirs(self.video_dir(bvid), exist_ok=True)
+        write_archive(self._path(bvid, self.DANMAKU_FILE), 'danmaku', store, meta={'bvid': bvid})
+
+    def chart_dir(self, bvid):
+        return os.path.join(self.video_dir(bvid), 'charts')
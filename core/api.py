@@ -1,5 +1,7 @@
 import logging
 from .network import NetworkManager
+from .dash import get_segment_base
+from .selector import StreamSelector, estimate_stream_size
 
 logger = logging.getLogger('bilibili_core.api')
 
@@ -53,12 +55,15 @@ class BilibiliAPI:
             return None
         return self.network.make_request(url)
     
-    def get_video_download_url(self, bvid, quality_preference='1080p', codec_preference='H.264/AVC', audio_quality_preference='高音质 (Hi-Res/Dolby)'):
+    def get_video_download_url(self, bvid, quality_preference='1080p', codec_preference='H.264/AVC', audio_quality_preference='高音质 (Hi-Res/Dolby)',
+                               selection_policy='preference', size_budget=None):
         """
         获取视频下载链接
         quality_preference: '4k', '1080p', '720p', etc.
         codec_preference: 'H.264/AVC', 'H.265/HEVC', 'AV1'
         audio_quality_preference: '高音质 (Hi-Res/Dolby)', '中等音质', '低音质'
+        selection_policy: 'preference', 'min_bytes', 'budget' (见 core.selector)
+        size_budget: 单个视频体积上限 (字节)，仅 budget 策略使用
         """
         # 1. 获取视频信息
         video_info = self.get_video_info(bvid)
@@ -105,6 +110,9 @@ class BilibiliAPI:
         
         dash_data = download_info['data'].get('dash')
         if not dash_data:
+            # 老视频和部分PGC内容只提供 durl 分段 (FLV/MP4)
+            if download_info['data'].get('durl'):
+                return self._build_durl_result(download_info['data'], video_info['data'], bvid)
             logger.error(f"视频 {bvid} 不支持DASH格式下载")
             return None
         
@@ -128,6 +136,8 @@ class BilibiliAPI:
             dash_data = data_block.get('dash')
             
             if not dash_data:
+                if data_block.get('durl'):
+                    return self._build_durl_result(data_block, video_info['data'], bvid)
                 logger.error(f"视频 {bvid} 不支持DASH格式下载 (PGC)")
                 return None
                 
@@ -224,8 +234,18 @@ class BilibiliAPI:
             else:
                 # 默认高音质
                 best_audio = audio_streams[0]
+
+        # 基于预估体积的选择策略 (bandwidth × 时长)
+        duration = dash_data.get('duration') or video_info['data'].get('duration', 0)
+        audio_size = estimate_stream_size(best_audio, duration)
+        selector = StreamSelector(selection_policy, size_budget)
+        selected = selector.select(video_streams, target_qn, duration, audio_size)
+        if selected:
+            best_video = selected
+        video_size = estimate_stream_size(best_video, duration)
             
         return {
+            'format': 'dash',
             'video_url': best_video.get('baseUrl'),
             'audio_url': best_audio.get('baseUrl') if best_audio else None,
             'title': video_info['data'].get('title', f'video_{bvid}'),
@@ -233,9 +253,78 @@ class BilibiliAPI:
             'quality_desc': self._get_quality_desc(best_video.get('id')),
             'codecid': best_video.get('codecid'),
             'codec_desc': self._get_codec_desc(best_video.get('codecid')),
+            'duration': duration,
+            'video_size': video_size,
+            'audio_size': audio_size,
+            'estimated_size': video_size + audio_size,
+            'video_segment_base': get_segment_base(best_video),
+            'audio_segment_base': get_segment_base(best_audio),
             'video_info': video_info['data']
         }
 
+    def _build_durl_result(self, data_block, video_data, bvid):
+        """构造 durl (分段FLV/MP4) 格式的下载信息"""
+        segments = []
+        for seg in sorted(data_block.get('durl', []), key=lambda x: x.get('order', 0)):
+            url = seg.get('url')
+            if not url:
+                continue
+            segments.append({
+                'url': url,
+                'backup_url': seg.get('backup_url') or [],
+                'size': seg.get('size', 0),
+                'length': seg.get('length', 0) / 1000,
+                'order': seg.get('order', len(segments) + 1)
+            })
+
+        if not segments:
+            logger.error(f"视频 {bvid} 的durl分段为空")
+            return None
+
+        qn = data_block.get('quality')
+        fmt = data_block.get('format', '')
+        codecid = self._durl_codecid(data_block, qn, fmt)
+        logger.info(f"视频 {bvid} 使用durl格式下载: {len(segments)} 个分段, 格式 {fmt}, "
+                    f"画质 {self._get_quality_desc(qn)}, 编码 {self._get_codec_desc(codecid)}")
+        return {
+            'format': 'durl',
+            'container': 'flv' if 'flv' in fmt else 'mp4',
+            'segments': segments,
+            'video_url': None,
+            'audio_url': None,
+            'title': video_data.get('title', f'video_{bvid}'),
+            'quality': qn,
+            'quality_desc': self._get_quality_desc(qn),
+            'codecid': codecid,
+            'codec_desc': self._get_codec_desc(codecid),
+            'duration': data_block.get('timelength', 0) / 1000,
+            'video_size': sum(seg['size'] for seg in segments),
+            'audio_size': 0,
+            'estimated_size': sum(seg['size'] for seg in segments),
+            'video_segment_base': None,
+            'audio_segment_base': None,
+            'video_info': video_data
+        }
+
+    def _durl_codecid(self, data_block, qn, fmt):
+        """
+        推断 durl 分段的视频编码：优先使用接口返回的 video_codecid，
+        其次根据 support_formats 中当前格式的 codecs 字符串判断，都没有时按 AVC 处理
+        """
+        codecid = data_block.get('video_codecid')
+        if codecid in (7, 12, 13):
+            return codecid
+
+        prefixes = {'avc1': 7, 'hev1': 12, 'hvc1': 12, 'av01': 13}
+        for item in data_block.get('support_formats') or []:
+            if item.get('quality') != qn and item.get('format') != fmt:
+                continue
+            for codec in item.get('codecs') or []:
+                codecid = prefixes.get(str(codec).split('.')[0].lower())
+                if codecid:
+                    return codecid
+        return 7
+
     def _get_codec_desc(self, codecid):
         mapping = {
             7: "AVC/H.264",
@@ -260,6 +349,30 @@ class BilibiliAPI:
             return response.get('data', {}).get('replies', [])
         return []
 
+    def get_comments_cursor(self, aid, cursor=0, mode=2):
+        """
+        游标翻页获取评论
+        :param cursor: 上一页返回的 cursor.next，首页为0
+        :param mode: 2 按时间倒序 / 3 按热度
+        :return: data 字典 (replies, cursor)，失败时返回 None
+        """
+        url = f'{self.API_BASE}/x/v2/reply/main?type=1&oid={aid}&mode={mode}&next={cursor}&ps=20'
+        response = self.network.make_request(url)
+        if isinstance(response, dict) and response.get('code', 0) == 0:
+            return response.get('data') or {}
+        return None
+
+    def get_comment_replies(self, aid, root, page=1, page_size=20):
+        """
+        获取某条评论下的楼中楼回复
+        :return: data 字典 (replies, page)，失败时返回 None
+        """
+        url = f'{self.API_BASE}/x/v2/reply/reply?type=1&oid={aid}&root={root}&pn={page}&ps={page_size}'
+        response = self.network.make_request(url)
+        if isinstance(response, dict) and response.get('code', 0) == 0:
+            return response.get('data') or {}
+        return None
+
     def get_video_danmaku(self, cid):
         """获取视频弹幕"""
         url = f'{self.API_BASE}/x/v1/dm/list.so?oid={cid}'
@@ -269,6 +382,16 @@ class BilibiliAPI:
             return response
         return None
     
+    def get_danmaku_segment(self, cid, segment_index, aid=None):
+        """获取分段弹幕 (protobuf，每段6分钟，segment_index 从1开始)"""
+        url = f'{self.API_BASE}/x/v2/dm/web/seg.so?type=1&oid={cid}&segment_index={segment_index}'
+        if aid:
+            url += f'&pid={aid}'
+        response = self.network.make_request(url)
+        if isinstance(response, bytes):
+            return response
+        return None
+
     def get_history(self, page=1):
         """获取历史记录"""
 
@@ -0,0 +1,220 @@
+import os
+import json
+import zlib
+import struct
+import logging
+
+logger = logging.getLogger('bilibili_core.archive')
+
+MAGIC = b'BDARC1\n'
+FOOTER = struct.Struct('<Q7s')  # 索引位置 + 结尾标记
+
+# 各类数据按哪些字段建立块索引
+INDEX_FIELDS = {
+    'danmaku': ('time',),
+    'comments': ('ctime', 'rpid'),
+}
+
+ARCHIVE_EXT = '.bdarc'
+
+
+class ArchiveWriter:
+    """
+    负责流式写入压缩归档：记录按 JSON Lines 分块，每块单独 zlib 压缩，
+    文件末尾保存各块的位置和索引字段的取值范围，读取时可只解压需要的块
+    """
+    def __init__(self, path, kind, block_size=2000, meta=None, level=6):
+        """
+        :param kind: 数据类型 (danmaku / comments)，决定索引字段
+        :param block_size: 每块的记录数
+        :param meta: 附加信息，原样保存在索引中
+        """
+        self.path = path
+        self.kind = kind
+        self.fields = INDEX_FIELDS.get(kind, ())
+        self.block_size = block_size
+        self.meta = meta or {}
+        self.level = level
+        self.blocks = []
+        self.pending = []
+        self.count = 0
+        self.tmp_path = path + '.tmp'
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, record):
+        self.pending.append(record)
+        if len(self.pending) >= self.block_size:
+            self._flush_block()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def _flush_block(self):
+        if not self.pending:
+            return
+        payload = '\n'.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) for r in self.pending)
+        data = zlib.compress(payload.encode('utf-8'), self.level)
+        entry = {'offset': self.file.tell(), 'length': len(data), 'count': len(self.pending)}
+        for field in self.fields:
+            values = [r[field] for r in self.pending if isinstance(r.get(field), (int, float))]
+            if values:
+                entry[field] = [min(values), max(values)]
+        self.file.write(data)
+        self.blocks.append(entry)
+        self.count += len(self.pending)
+        self.pending = []
+
+    def close(self):
+        self._flush_block()
+        index = {'kind': self.kind, 'count': self.count, 'fields': list(self.fields),
+                 'meta': self.meta, 'blocks': self.blocks}
+        index_offset = self.file.tell()
+        self.file.write(zlib.compress(json.dumps(index, ensure_ascii=False).encode('utf-8')))
+        self.file.write(FOOTER.pack(index_offset, MAGIC))
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class ArchiveReader:
+    """
+    负责读取压缩归档：按块流式读取全部记录，或根据块索引只读取某个范围
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是有效的归档文件: {path}")
+            f.seek(-FOOTER.size, os.SEEK_END)
+            index_offset, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"归档文件不完整: {path}")
+            f.seek(index_offset)
+            raw = f.read(os.path.getsize(path) - FOOTER.size - index_offset)
+        self.index = json.loads(zlib.decompress(raw).decode('utf-8'))
+        self.kind = self.index.get('kind')
+        self.meta = self.index.get('meta', {})
+
+    def __len__(self):
+        return self.index.get('count', 0)
+
+    def _read_blocks(self, blocks):
+        with open(self.path, 'rb') as f:
+            for block in blocks:
+                f.seek(block['offset'])
+                payload = zlib.decompress(f.read(block['length'])).decode('utf-8')
+                for line in payload.split('\n'):
+                    if line:
+                        yield json.loads(line)
+
+    def __iter__(self):
+        return self._read_blocks(self.index['blocks'])
+
+    def range(self, field, start=None, end=None):
+        """
+        读取 field 在 [start, end] 内的记录，只解压取值范围有交集的块
+        如 reader.range('time', 600, 660) 读取10:00-11:00之间的弹幕
+        """
+        def overlaps(block):
+            bounds = block.get(field)
+            if not bounds:
+                return True
+            return (end is None or bounds[0] <= end) and (start is None or bounds[1] >= start)
+
+        for record in self._read_blocks([b for b in self.index['blocks'] if overlaps(b)]):
+            value = record.get(field)
+            if value is None:
+                continue
+            if (start is None or value >= start) and (end is None or value <= end):
+                yield record
+
+
+def write_archive(path, kind, records, meta=None):
+    """一次写入全部记录，返回记录数"""
+    with ArchiveWriter(path, kind, meta=meta) as writer:
+        writer.write_many(records)
+    return writer.count
+
+
+def archive_path_for(json_path):
+    """旧的 xxx_danmaku.json / xxx_comments.json 对应的归档路径"""
+    return os.path.splitext(json_path)[0] + ARCHIVE_EXT
+
+
+def read_records(path):
+    """读取归档或旧的JSON文件中的全部记录"""
+    if path.endswith(ARCHIVE_EXT):
+        return list(ArchiveReader(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def migrate_json(json_path, remove_source=False):
+    """
+    把旧的JSON弹幕/评论文件转换为归档
+    :return: 归档路径，不是弹幕/评论文件或转换失败时返回 None
+    """
+    name = os.path.basename(json_path)
+    if name.endswith('_danmaku.json'):
+        kind = 'danmaku'
+    elif name.endswith('_comments.json'):
+        kind = 'comments'
+    else:
+        return None
+
+    target = archive_path_for(json_path)
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        if not isinstance(records, list):
+            return None
+        if kind == 'danmaku':
+            records.sort(key=lambda r: r.get('time', 0))
+        count = write_archive(target, kind, records, meta={'source': name})
+    except Exception as e:
+        logger.error(f"转换失败: {json_path}: {e}")
+        return None
+
+    before, after = os.path.getsize(json_path), os.path.getsize(target)
+    logger.info(f"已转换 {name}: {count} 条, {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+    if remove_source:
+        os.remove(json_path)
+    return target
+
+
+def migrate_directory(root, remove_source=False):
+    """
+    转换目录下所有旧的弹幕/评论JSON文件
+    :return: {'converted': n, 'failed': n, 'saved_bytes': n}
+    """
+    summary = {'converted': 0, 'failed': 0, 'saved_bytes': 0}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if not name.endswith(('_danmaku.json', '_comments.json')):
+                continue
+            path = os.path.join(dirpath, name)
+            size = os.path.getsize(path)
+            target = migrate_json(path, remove_source)
+            if target:
+                summary['converted'] += 1
+                summary['saved_bytes'] += size - os.path.getsize(target)
+            else:
+                summary['failed'] += 1
+    return summary
@@ -0,0 +1,235 @@
+import os
+import re
+import logging
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import ConfigManager
+from core.encoders import SOFTWARE_ENCODERS
+
+logger = logging.getLogger('bilibili_core.batch')
+
+# 批量操作名称 (界面显示名 -> 操作)
+OPERATION_NAMES = {
+    '格式转换': 'convert',
+    '视频压缩': 'compress',
+    '去水印': 'watermark',
+    '音视频合并': 'av_merge',
+    '视频剪辑': 'cut',
+}
+
+# 只做流复制、瓶颈在磁盘的操作
+COPY_OPERATIONS = ('av_merge',)
+
+# 同时运行的硬件编码会话数 (消费级 NVENC 通常限制为3路)
+HARDWARE_SESSIONS = 2
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.flv')
+
+# 编辑操作生成的文件名 (不含扩展名)，以及批量处理中途留下的 .partial 文件
+OUTPUT_NAME_PATTERN = re.compile(
+    r'(_converted(_\d+)?|_compressed_\d+x\d+|_clean|_ai_clean|_cut(_[\d.]+-[\d.]+)?|_reverse(_\d+)?'
+    r'|_av_merge(_\d+)?|\.partial)$'
+)
+
+
+def is_edit_output(path):
+    """是否为编辑操作的输出文件或未完成的临时文件"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return bool(OUTPUT_NAME_PATTERN.search(name))
+
+
+def collect_sources(folder):
+    """
+    递归收集文件夹中的视频文件，跳过之前编辑生成的文件，
+    避免对同一文件夹重复批量处理时把上次的输出再处理一遍
+    """
+    sources = []
+    for root, _, names in os.walk(folder):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            if name.lower().endswith(VIDEO_EXTENSIONS) and not is_edit_output(path):
+                sources.append(path)
+    return sources
+
+
+class BatchItem:
+    def __init__(self, source):
+        """
+        :param source: 输入文件路径，音视频合并时为 (视频路径, 音频路径)
+        """
+        self.source = source
+        self.output_path = None
+        self.status = 'pending'  # pending / running / success / skipped / failed / cancelled
+        self.message = ''
+        self.progress = 0
+
+    @property
+    def primary_path(self):
+        return self.source[0] if isinstance(self.source, (tuple, list)) else self.source
+
+    def to_dict(self):
+        return {'source': self.source, 'output_path': self.output_path,
+                'status': self.status, 'message': self.message}
+
+
+class BatchProcessor:
+    """
+    负责批量执行同一种编辑操作：按并行度调度、跳过已处理的文件、汇总进度
+    """
+    def __init__(self, processor, max_workers=None):
+        self.processor = processor
+        self.max_workers = max_workers
+
+    def output_path_for(self, operation, source, options):
+        """操作的固定输出路径，已存在即视为处理过"""
+        path = source[0] if isinstance(source, (tuple, list)) else source
+        directory = options.get('output_dir') or os.path.dirname(path)
+        name, ext = os.path.splitext(os.path.basename(path))
+        if operation == 'convert':
+            return os.path.join(directory, f"{name}_converted.{options.get('format', 'mp4')}")
+        if operation == 'compress':
+            return os.path.join(directory, f"{name}_compressed_{options.get('resolution', '1280x720')}{ext}")
+        if operation == 'watermark':
+            return os.path.join(directory, f"{name}_clean{ext}")
+        if operation == 'av_merge':
+            return os.path.join(directory, f"{name}_av_merge.mp4")
+        if operation == 'cut':
+            return os.path.join(directory, f"{name}_cut_{options.get('start', 0)}-{options.get('end', 0)}{ext}")
+        raise ValueError(f"未知的批量操作: {operation}")
+
+    def _execute(self, operation, source, output_path, options, progress_callback, stop_event):
+        p = self.processor
+        if operation == 'convert':
+            return p.convert_video(source, options.get('format', 'mp4'), progress_callback,
+                                   stop_event=stop_event, output_path=output_path)
+        if operation == 'compress':
+            return p.compress_video(source, options.get('resolution', '1280x720'), options.get('crf', 23),
+                                    output_path=output_path, progress_callback=progress_callback,
+                                    stop_event=stop_event)
+        if operation == 'watermark':
+            return p.watermark_remover.remove_watermark_delogo(source, output_path=output_path,
+                                                               rect=options.get('rect'),
+                                                               progress_callback=progress_callback,
+                                                               stop_event=stop_event)
+        if operation == 'av_merge':
+            video_path, audio_path = source
+            return p.av_merge(video_path, audio_path, output_path=output_path,
+                              progress_callback=progress_callback, stop_event=stop_event)
+        if operation == 'cut':
+            return p.cut_video(source, options.get('start', 0), options.get('end', 0), options.get('unit', 'time'),
+                               output_path=output_path, progress_callback=progress_callback,
+                               smart=options.get('smart', True), stop_event=stop_event)
+        raise ValueError(f"未知的批量操作: {operation}")
+
+    def default_workers(self, operation):
+        """
+        默认并行度：流复制按磁盘并发，硬件编码受编码会话数限制，
+        CPU编码时单个ffmpeg已能使用多核 (长视频还会分段并行)，因此每8核一个任务
+        """
+        configured = ConfigManager().get('batch_workers', 0)
+        if configured:
+            return configured
+        if operation in COPY_OPERATIONS:
+            return 4
+        encoders = getattr(self.processor, 'encoders', None)
+        if self.processor.hardware_acceleration and encoders:
+            if encoders.select('h264', hardware=True) not in SOFTWARE_ENCODERS:
+                return HARDWARE_SESSIONS
+        return max(1, min(4, (os.cpu_count() or 1) // 8))
+
+    def run(self, operation, sources, options=None, progress_callback=None, item_callback=None,
+            stop_event=None):
+        """
+        :param sources: 输入列表 (音视频合并时每项为 (视频, 音频))
+        :param progress_callback: 总进度回调 (current, total)
+        :param item_callback: 单项状态回调 (index, BatchItem)
+        :return: 汇总 {'total', 'success', 'skipped', 'failed', 'items'}
+        """
+        options = options or {}
+        items = []
+        seen = set()
+        for source in sources:
+            key = tuple(os.path.abspath(p) for p in source) if isinstance(source, (tuple, list)) else os.path.abspath(source)
+            if key in seen:
+                continue
+            seen.add(key)
+            items.append(BatchItem(source))
+
+        lock = threading.Lock()
+
+        def report():
+            if progress_callback and items:
+                with lock:
+                    total = sum(100 if item.status in ('success', 'skipped', 'failed', 'cancelled') else item.progress
+                                for item in items)
+                progress_callback(int(total / len(items)), 100)
+
+        def notify(index):
+            if item_callback:
+                item_callback(index, items[index])
+
+        def process(index):
+            item = items[index]
+            if stop_event and stop_event.is_set():
+                item.status, item.message = 'cancelled', '已取消'
+                notify(index)
+                return
+
+            item.output_path = self.output_path_for(operation, item.source, options)
+            if os.path.exists(item.output_path) and os.path.getsize(item.output_path) > 0:
+                item.status, item.message = 'skipped', '输出已存在，跳过'
+                notify(index)
+                report()
+                return
+
+            # 先写入临时文件，成功后再改名，中断时不会留下被当作"已处理"的半成品
+            base, ext = os.path.splitext(item.output_path)
+            partial_path = f"{base}.partial{ext}"
+            item.status = 'running'
+            notify(index)
+
+            def item_progress(current, total):
+                if total > 0:
+                    item.progress = min(int(current * 100 / total), 99)
+                    report()
+
+            try:
+                # 多个任务同时运行时，每个任务的分段编码只使用分到的CPU核
+                with encoder.budget(cores_per_item) if encoder else nullcontext():
+                    success, message = self._execute(operation, item.source, partial_path, options,
+                                                      item_progress, stop_event)
+            except Exception as e:
+                success, message = False, str(e)
+
+            if success:
+                os.replace(partial_path, item.output_path)
+                item.status, item.message = 'success', item.output_path
+            else:
+                if os.path.exists(partial_path):
+                    try: os.remove(partial_path)
+                    except OSError: pass
+                cancelled = stop_event is not None and stop_event.is_set()
+                item.status = 'cancelled' if cancelled else 'failed'
+                item.message = '已取消' if cancelled else message
+                logger.error(f"批量任务失败: {item.primary_path}: {message}")
+            notify(index)
+            report()
+
+        workers = self.max_workers or self.default_workers(operation)
+        encoder = getattr(self.processor, 'chunked_encoder', None)
+        cores_per_item = max(1, (os.cpu_count() or 1) // max(1, min(workers, len(items))))
+        logger.info(f"批量{operation}: {len(items)} 个文件, 并行 {workers}")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(process, range(len(items))))
+
+        summary = {
+            'total': len(items),
+            'success': sum(1 for i in items if i.status == 'success'),
+            'skipped': sum(1 for i in items if i.status == 'skipped'),
+            'failed': sum(1 for i in items if i.status == 'failed'),
+            'items': [i.to_dict() for i in items]
+        }
+        logger.info(f"批量处理完成: 成功 {summary['success']}, 跳过 {summary['skipped']}, 失败 {summary['failed']}")
+        return summary
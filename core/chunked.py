@@ -0,0 +1,270 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('bilibili_core.chunked')
+
+
+def auto_workers(cpu_count=None):
+    """
+    默认并行度: libx264 在1080p下单进程约4线程后收益递减，
+    因此按每4核一个编码进程划分 (32核 -> 8进程 x 4线程)
+    """
+    cores = cpu_count or os.cpu_count() or 1
+    return max(1, min(cores // 4, 8))
+
+
+class ChunkedEncoder:
+    """
+    负责分段并行编码：按关键帧把输入切成若干段，多个ffmpeg进程同时编码，
+    再用 concat demuxer 无损拼接并合入音频
+    """
+    def __init__(self, ffmpeg_path, probe, runner, workers=0, min_chunk=20):
+        """
+        :param probe: MediaProbe 实例 (用于获取时长和关键帧)
+        :param runner: 执行ffmpeg的函数 (cmd, progress_callback, stop_event=, duration=, timeout=, stats_callback=) -> bool
+        :param workers: 并行编码进程数，0 表示按CPU核数自动选择
+        :param min_chunk: 每段最短时长(秒)，过短的分段会降低编码效率
+        """
+        self.ffmpeg_path = ffmpeg_path
+        self.probe = probe
+        self.runner = runner
+        self.workers = workers or auto_workers()
+        self.min_chunk = min_chunk
+        self.last_stats = {}
+        self._budget = threading.local()
+
+    @contextmanager
+    def budget(self, cores):
+        """
+        在当前线程中限制分段编码可用的CPU核数：批量引擎同时运行多个任务时为每个任务分配一部分核，
+        进程数和每个进程的线程数都按分到的核数计算
+        """
+        previous = getattr(self._budget, 'cores', None)
+        self._budget.cores = max(1, cores)
+        try:
+            yield
+        finally:
+            self._budget.cores = previous
+
+    def available_cores(self):
+        return getattr(self._budget, 'cores', None) or os.cpu_count() or 1
+
+    def effective_workers(self, requested=None):
+        """受当前线程CPU预算限制后的并行进程数"""
+        workers = requested or self.workers
+        cores = getattr(self._budget, 'cores', None)
+        if cores:
+            workers = min(workers, auto_workers(cores))
+        return max(1, workers)
+
+    def can_encode(self, info):
+        """只有时长足够切出至少两段、且CPU预算允许多个进程时才值得分段"""
+        return (self.effective_workers() > 1 and info is not None and info.has_video
+                and info.has_keyframe_index and info.duration >= self.min_chunk * 2)
+
+    def plan(self, duration, keyframes):
+        """
+        在关键帧处切分，分段数为并行度的2倍以平衡各进程负载
+        :return: [(start, end), ...]
+        """
+        count = max(1, min(self.effective_workers() * 2, int(duration // self.min_chunk)))
+        cuts = [0.0]
+        for i in range(1, count):
+            target = duration * i / count
+            nearest = min(keyframes, key=lambda k: abs(k - target)) if keyframes else None
+            if nearest is not None and nearest - cuts[-1] >= self.min_chunk / 2 and duration - nearest >= self.min_chunk / 2:
+                cuts.append(nearest)
+        cuts.append(duration)
+        return list(zip(cuts[:-1], cuts[1:]))
+
+    def encode(self, input_path, output_path, video_args, audio_args, progress_callback=None, stop_event=None,
+               stats_callback=None, timeout=None):
+        """
+        :param video_args: 视频滤镜和编码参数，如 ['-vf', 'scale=...', '-c:v', 'libx264', ...]
+        :param audio_args: 音频参数，如 ['-c:a', 'aac', '-b:a', '128k']
+        :param stats_callback: 统计回调，并行阶段汇总各分段的 fps/speed 后上报
+        :param timeout: 单个ffmpeg进程的无输出超时 (秒)
+        :return: 成功/失败
+        """
+        info = self.probe.probe(input_path)
+        if not self.can_encode(info):
+            return False
+        keyframes = self.probe.keyframes(input_path, 0, info.duration)
+        segments = self.plan(info.duration, keyframes)
+        if len(segments) < 2:
+            return False
+
+        start_clock = time.time()
+        work_dir = tempfile.mkdtemp(prefix='chunked_')
+        try:
+            pieces = self._encode_segments(input_path, info, segments, ['-an'] + video_args,
+                                           self.workers, work_dir, progress_callback, stop_event,
+                                           stats_callback, timeout)
+            if not pieces:
+                return False
+
+            list_file = self._write_list(pieces, work_dir)
+            cmd = [self.ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', list_file, '-i', input_path,
+                   '-map', '0:v:0', '-map', '1:a:0?', '-c:v', 'copy'] + audio_args
+            if not self._mux(cmd, output_path, progress_callback, stop_event, info.duration,
+                             stats_callback, timeout):
+                return False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        self._finish(info, start_clock, progress_callback)
+        return True
+
+    def reverse(self, input_path, output_path, video_args, audio_args, chunk_seconds=5,
+                max_workers=None, progress_callback=None, stop_event=None, stats_callback=None, timeout=None):
+        """
+        分段反转：按固定时长切段，各段分别反转后倒序拼接
+        reverse 滤镜需要缓存整段画面，峰值内存约为 并行数 x 单段解码帧大小，与视频总长无关
+        音频各段反转为PCM，拼接后只编码一次：逐段编码AAC会在每个分段边界引入编码器预延迟和帧补齐，
+        分段多时产生可闻的间隙并使时长变长
+        """
+        info = self.probe.probe(input_path)
+        if not info or not info.has_video or not info.duration:
+            return False
+
+        count = max(1, int(-(-info.duration // chunk_seconds)))
+        segments = [(i * chunk_seconds, min((i + 1) * chunk_seconds, info.duration)) for i in range(count)]
+        args = ['-an', '-vf', 'reverse'] + video_args
+        pcm_args = ['-vn', '-af', 'areverse', '-c:a', 'pcm_s16le', '-f', 'wav'] if info.has_audio else None
+        workers = max_workers or self.workers
+
+        start_clock = time.time()
+        work_dir = tempfile.mkdtemp(prefix='reverse_')
+        try:
+            pieces = self._encode_segments(input_path, info, segments, args, workers, work_dir,
+                                           progress_callback, stop_event, stats_callback, timeout,
+                                           audio_args=pcm_args)
+            if not pieces:
+                return False
+
+            pieces = list(reversed(pieces))
+            list_file = self._write_list(pieces, work_dir)
+            cmd = [self.ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', list_file]
+            if pcm_args:
+                audio_list = self._write_list([self._audio_piece(p) for p in pieces], work_dir, 'audio.txt')
+                cmd.extend(['-f', 'concat', '-safe', '0', '-i', audio_list,
+                            '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy'] + audio_args)
+            else:
+                cmd.extend(['-c', 'copy'])
+            if not self._mux(cmd, output_path, progress_callback, stop_event, info.duration,
+                             stats_callback, timeout):
+                return False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        self._finish(info, start_clock, progress_callback)
+        return True
+
+    def _encode_segments(self, input_path, info, segments, args, workers, work_dir, progress_callback,
+                         stop_event=None, stats_callback=None, timeout=None, audio_args=None):
+        """
+        并行编码各分段为 MPEG-TS，返回按时间顺序的文件列表，失败返回 None
+        :param audio_args: 不为空时同一进程另外输出该分段的音频 (见 _audio_piece)
+        """
+        workers = max(1, min(self.effective_workers(workers), len(segments)))
+        threads = max(1, self.available_cores() // workers)
+        logger.info(f"分段并行编码: {len(segments)} 段, {workers} 个进程 x {threads} 线程")
+        self.last_stats = {'segments': len(segments), 'workers': workers, 'threads': threads}
+
+        done = [0.0] * len(segments)
+        running = {}  # 分段序号 -> 该分段ffmpeg最近一次的统计
+        lock = threading.Lock()
+
+        def report():
+            if progress_callback:
+                with lock:
+                    finished = sum(done)
+                progress_callback(min(int(finished * 90 / info.duration), 89), 100)
+
+        def report_stats():
+            # 并行阶段的统计为各分段之和，剩余时间按总速度估算
+            with lock:
+                finished = sum(done)
+                fps = sum(s.get('fps') or 0 for s in running.values())
+                speed = sum(s.get('speed') or 0 for s in running.values())
+            eta = max(0.0, (info.duration - finished) / speed) if speed > 0 else None
+            stats_callback({'frame': None, 'fps': fps, 'speed': speed, 'bitrate': None,
+                            'out_time': finished, 'out_time_us': int(finished * 1_000_000),
+                            'eta': eta, 'done': False})
+
+        def encode_segment(index):
+            seg_start, seg_end = segments[index]
+            seg_duration = seg_end - seg_start
+            piece = os.path.join(work_dir, f"{index:04d}.ts")
+
+            def segment_callback(current, total):
+                if total > 0:
+                    with lock:
+                        done[index] = current / total * seg_duration
+                    report()
+
+            def segment_stats(stats):
+                with lock:
+                    running[index] = stats
+                report_stats()
+
+            cmd = [self.ffmpeg_path, '-ss', str(seg_start), '-i', input_path,
+                   '-t', str(seg_duration)] + args
+            cmd.extend(['-threads', str(threads), '-f', 'mpegts', '-y', piece])
+            if audio_args:
+                cmd.extend(['-t', str(seg_duration)] + audio_args + ['-y', self._audio_piece(piece)])
+            if stop_event and stop_event.is_set():
+                return None
+            if not self.runner(cmd, segment_callback, stop_event=stop_event, duration=seg_duration,
+                               timeout=timeout, stats_callback=segment_stats if stats_callback else None):
+                return None
+            with lock:
+                done[index] = seg_duration
+                running.pop(index, None)
+            report()
+            return piece
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pieces = list(executor.map(encode_segment, range(len(segments))))
+        if not all(pieces):
+            logger.error("分段编码失败")
+            return None
+        return pieces
+
+    def _audio_piece(self, piece):
+        return os.path.splitext(piece)[0] + '.wav'
+
+    def _write_list(self, pieces, work_dir, name='list.txt'):
+        list_file = os.path.join(work_dir, name)
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for piece in pieces:
+                escaped = piece.replace('\\', '/').replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        return list_file
+
+    def _mux(self, cmd, output_path, progress_callback, stop_event=None, duration=None, stats_callback=None,
+             timeout=None):
+        if output_path.lower().endswith(('.mp4', '.mov', '.m4v')):
+            cmd.extend(['-movflags', '+faststart'])
+        cmd.extend(['-y', output_path])
+
+        def mux_callback(current, total):
+            if progress_callback and total > 0:
+                progress_callback(min(90 + int(current * 10 / total), 99), 100)
+
+        return self.runner(cmd, mux_callback, stop_event=stop_event, duration=duration, timeout=timeout,
+                           stats_callback=stats_callback)
+
+    def _finish(self, info, start_clock, progress_callback):
+        elapsed = time.time() - start_clock
+        frames = info.nb_frames or int(info.duration * info.fps)
+        self.last_stats.update({'elapsed': elapsed, 'fps': frames / elapsed if elapsed > 0 else 0})
+        logger.info(f"分段并行编码完成: 耗时 {elapsed:.1f} 秒, 平均 {self.last_stats['fps']:.1f} fps")
+        if progress_callback:
+            progress_callback(100, 100)
@@ -5,6 +5,7 @@ import logging
 
 from core.crawler import BilibiliCrawler
 from core.config import APP_VERSION
+from core.utils import format_size
 
 
 logger = logging.getLogger('bilibili_cli')
@@ -29,17 +30,104 @@ class CliHandler:
             logger.info(f"正在获取视频信息：{bvid}")
             self.crawler.crawl_video_details(bvid)
         
+        elif getattr(args, 'estimate', None):
+            # 批量预估下载大小和耗时
+            bvids = [b.strip() for b in args.estimate.split(',') if b.strip()]
+            budget = int(args.budget_gb * 1024 ** 3) if getattr(args, 'budget_gb', None) else None
+            result = self.crawler.estimate_batch(bvids, selection_policy=getattr(args, 'policy', None) or 'preference',
+                                                 size_budget=budget)
+            for item in result['items']:
+                if item.get('error'):
+                    print(f"{item['bvid']}: {item['error']}")
+                else:
+                    print(f"{item['bvid']}: {item['title']} [{item['quality_desc']} / {item['codec_desc']}] "
+                          f"{format_size(item['estimated_size'])}")
+            print(f"\n总计: {format_size(result['total_bytes'])}")
+            if result['eta_seconds']:
+                print(f"预计耗时: {result['eta_seconds']:.0f} 秒 (按 {format_size(result['speed'])}/s 估算)")
+            else:
+                print("无法测速，未能预估耗时")
+
+        elif getattr(args, 'batch', None):
+            self.run_batch(args)
+
+        elif getattr(args, 'migrate_archives', None):
+            # 旧的JSON弹幕/评论文件转换为压缩归档
+            from core.archive import migrate_directory
+            summary = migrate_directory(args.migrate_archives, remove_source=args.remove_json)
+            print(f"已转换 {summary['converted']} 个文件，失败 {summary['failed']} 个，"
+                  f"节省 {format_size(max(summary['saved_bytes'], 0))}")
+
         elif args.download:
             # Download video
             bvid = args.download
-            logger.info(f"正在下载视频：{bvid}")
-            self.crawler.download_video(bvid)
+            start = getattr(args, 'start', None)
+            end = getattr(args, 'end', None)
+            if start is not None or end is not None:
+                # 按时间范围只下载片段
+                start = start or 0
+                if end is None:
+                    print("片段下载需要同时指定 --end")
+                    return
+                logger.info(f"正在下载视频片段：{bvid} ({start}s - {end}s)")
+                result = self.crawler.download_video_clip(bvid, start, end)
+                if not result.get('download_success'):
+                    print(f"片段下载失败: {result.get('message', '')}")
+            else:
+                logger.info(f"正在下载视频：{bvid}")
+                budget = int(args.budget_gb * 1024 ** 3) if getattr(args, 'budget_gb', None) else None
+                self.crawler.download_video(bvid, selection_policy=getattr(args, 'policy', None) or 'preference',
+                                            size_budget=budget)
             print(f"\n下载目录: {os.path.abspath(self.crawler.download_dir)}")
         
         else:
             # Interactive mode
             self.run_interactive()
 
+    def run_batch(self, args):
+        """批量处理本地视频"""
+        from core.processor import MediaProcessor
+        from core.batch import BatchProcessor, collect_sources
+
+        sources = []
+        for entry in (args.inputs or '').split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            if args.batch == 'av_merge':
+                # 视频+音频 成对指定
+                video_path, _, audio_path = entry.partition('+')
+                if not audio_path:
+                    print(f"音视频合并需要以 视频+音频 的形式指定: {entry}")
+                    continue
+                sources.append((video_path, audio_path))
+            elif os.path.isdir(entry):
+                sources.extend(collect_sources(entry))
+            else:
+                sources.append(entry)
+        if not sources:
+            print("没有找到需要处理的文件，请用 --inputs 指定")
+            return
+
+        options = {'format': args.format, 'resolution': args.resolution, 'crf': args.crf}
+        if args.batch == 'cut':
+            if args.end is None:
+                print("批量剪辑需要指定 --end")
+                return
+            options.update({'start': args.start or 0, 'end': args.end})
+
+        def progress(current, total):
+            print(f"\r进度: {current}%", end='', flush=True)
+
+        def item_changed(index, item):
+            if item.status in ('success', 'skipped', 'failed'):
+                print(f"\n[{item.status}] {item.primary_path} {item.message}")
+
+        batch = BatchProcessor(MediaProcessor(), max_workers=args.workers)
+        summary = batch.run(args.batch, sources, options, progress, item_changed)
+        print(f"\n共 {summary['total']} 个: 成功 {summary['success']}, "
+              f"跳过 {summary['skipped']}, 失败 {summary['failed']}")
+
     def run_interactive(self):
         """Run interactive CLI"""
         while True:
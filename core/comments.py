@@ -0,0 +1,265 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .archive import ArchiveWriter, ArchiveReader, write_archive, ARCHIVE_EXT
+
+logger = logging.getLogger('bilibili_core.comments')
+
+# 增量文件超过这个数量时合并为一个
+MAX_DELTAS = 16
+
+
+class CommentStore:
+    """
+    负责按视频在本地保存评论：每次刷新获取的新评论写成一个增量归档，
+    state.json 记录已保存的最大 rpid (高水位) 和未完成的补齐进度
+    """
+    def __init__(self, root):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def lock(self, aid):
+        with self._locks_guard:
+            return self._locks.setdefault(str(aid), threading.RLock())
+
+    def video_dir(self, aid):
+        return os.path.join(self.root, str(aid))
+
+    def _state_path(self, aid):
+        return os.path.join(self.video_dir(aid), 'state.json')
+
+    def state(self, aid):
+        """
+        :return: {'max_rpid', 'count', 'deltas', 'backlog', 'gaps', 'threads'}
+                 backlog 为上次中断时尚未补齐的较早评论: {'cursor', 'min_rpid', 'floor'}
+                 gaps 为排在 backlog 之后、更早的待补齐区间 (只获取新评论时产生)
+        """
+        state = {'max_rpid': 0, 'count': 0, 'deltas': [], 'backlog': None, 'gaps': [], 'threads': {}}
+        try:
+            with open(self._state_path(aid), 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"评论状态文件损坏，将重新获取: {aid}: {e}")
+        return state
+
+    def save_state(self, aid, state):
+        path = self._state_path(aid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def new_delta(self, aid, state):
+        """创建下一个增量归档的写入器"""
+        os.makedirs(self.video_dir(aid), exist_ok=True)
+        seq = max((int(name.split('.')[0]) for name in state['deltas']), default=0) + 1
+        name = f"{seq:06d}{ARCHIVE_EXT}"
+        return name, ArchiveWriter(os.path.join(self.video_dir(aid), name), 'comments', block_size=500,
+                                   meta={'aid': aid})
+
+    def iter_comments(self, aid):
+        """逐条读取已保存的根评论"""
+        state = self.state(aid)
+        for name in state['deltas']:
+            path = os.path.join(self.video_dir(aid), name)
+            if os.path.exists(path):
+                yield from ArchiveReader(path)
+
+    def load(self, aid):
+        """读取已保存的全部根评论，按时间倒序"""
+        comments = list(self.iter_comments(aid))
+        comments.sort(key=lambda r: r.get('ctime', 0), reverse=True)
+        return comments
+
+    def compact(self, aid):
+        """把多个增量归档合并为一个"""
+        with self.lock(aid):
+            state = self.state(aid)
+            if len(state['deltas']) <= 1:
+                return
+            comments = self.load(aid)
+            old = list(state['deltas'])
+            name, writer = self.new_delta(aid, state)
+            with writer:
+                writer.write_many(comments)
+            state['deltas'] = [name]
+            state['count'] = len(comments)
+            self.save_state(aid, state)
+            for old_name in old:
+                try:
+                    os.remove(os.path.join(self.video_dir(aid), old_name))
+                except OSError:
+                    pass
+            logger.info(f"已合并 {len(old)} 个评论增量文件: {aid}")
+
+    def thread_path(self, aid, root):
+        return os.path.join(self.video_dir(aid), 'threads', f"{root}{ARCHIVE_EXT}")
+
+
+class CommentCrawler:
+    """
+    负责增量获取评论：按时间倒序游标翻页，遇到已保存的评论即停止，
+    中断或达到数量上限时记录游标，下次先补齐较早的评论再获取新评论
+    """
+    def __init__(self, api, store, max_workers=4):
+        self.api = api
+        self.store = store
+        self.max_workers = max_workers
+
+    def refresh(self, aid, max_comments=None, progress_callback=None, stop_event=None, backfill=True):
+        """
+        获取自上次以来的新评论并保存
+        :param max_comments: 本次最多获取的评论数，None 表示不限
+        :param backfill: 是否先补齐较早的评论；为 False 时只获取新评论，未补齐的区间留给之后的完整获取
+        :return: 本次新增的评论数
+        """
+        with self.store.lock(aid):
+            state = self.store.state(aid)
+            name, writer = self.store.new_delta(aid, state)
+            fetched = 0
+            try:
+                if backfill:
+                    while state['backlog'] and not (stop_event and stop_event.is_set()):
+                        limit = max_comments - fetched if max_comments else None
+                        if limit is not None and limit <= 0:
+                            break
+                        fetched += self._crawl(aid, state, writer, state['backlog'], limit,
+                                               progress_callback, stop_event)
+                        if state['backlog'] is None and state['gaps']:
+                            state['backlog'] = state['gaps'].pop(0)
+                        else:
+                            break
+                pending = state['backlog']
+                if (not pending or not backfill) and not (stop_event and stop_event.is_set()):
+                    limit = max_comments - fetched if max_comments else None
+                    if limit is None or limit > 0:
+                        head = {'cursor': 0, 'min_rpid': None, 'floor': state['max_rpid']}
+                        fetched += self._crawl(aid, state, writer, head, limit, progress_callback, stop_event)
+                        if pending:
+                            # 新评论与已保存评论之间的空缺先补齐，原来的 backlog 排在其后
+                            if state['backlog']:
+                                state['gaps'].insert(0, pending)
+                            else:
+                                state['backlog'] = pending
+            except Exception:
+                writer.abort()
+                raise
+
+            if writer.count or writer.pending:
+                writer.close()
+                state['deltas'].append(name)
+                state['count'] += fetched
+            else:
+                writer.abort()
+            self.store.save_state(aid, state)
+
+        if len(state['deltas']) > MAX_DELTAS:
+            self.store.compact(aid)
+        logger.info(f"评论增量获取完成: {aid}, 新增 {fetched} 条, 共 {state['count']} 条"
+                    + (" (尚有较早评论未获取)" if state['backlog'] or state['gaps'] else ""))
+        return fetched
+
+    def _crawl(self, aid, state, writer, span, limit, progress_callback, stop_event):
+        """
+        从 span['cursor'] 开始向较早的评论翻页，直到遇到 rpid <= span['floor']
+        span['min_rpid'] 不为空时跳过 rpid 不小于它的评论 (续传时新评论会使页面整体后移)
+        未能到达 floor 时把进度写回 state['backlog']
+        """
+        cursor = span['cursor']
+        floor = span['floor'] or 0
+        min_rpid = span['min_rpid']
+        fetched = 0
+        reached = False
+        while True:
+            if stop_event and stop_event.is_set():
+                break
+            data = self.api.get_comments_cursor(aid, cursor)
+            if data is None:
+                logger.warning(f"获取评论失败: {aid}, cursor={cursor}")
+                break
+            for reply in data.get('replies') or []:
+                rpid = reply.get('rpid', 0)
+                if rpid <= floor:
+                    reached = True
+                    break
+                if min_rpid is not None and rpid >= min_rpid:
+                    continue
+                writer.write(reply)
+                fetched += 1
+                min_rpid = rpid
+                state['max_rpid'] = max(state['max_rpid'], rpid)
+            page = data.get('cursor') or {}
+            cursor = page.get('next', cursor)
+            if reached or page.get('is_end') or not data.get('replies'):
+                reached = True
+                break
+            if progress_callback:
+                total = page.get('all_count') or 0
+                progress_callback(min(fetched, total) if total else fetched, total or 0)
+            if limit and fetched >= limit:
+                break
+
+        if reached:
+            state['backlog'] = None
+        else:
+            # 本次获取的评论与 floor 之间还有空缺，记录下来以便下次补齐
+            state['backlog'] = {'cursor': cursor, 'min_rpid': min_rpid, 'floor': floor}
+        return fetched
+
+    def fetch_replies(self, aid, root, progress_callback=None, stop_event=None):
+        """
+        按需获取某条评论下的全部回复：先取第一页得到总数，其余页并行获取
+        回复数没有变化时直接读取本地缓存
+        :return: 回复列表 (按页顺序)
+        """
+        store = self.store
+        path = store.thread_path(aid, root)
+        first = self.api.get_comment_replies(aid, root, 1)
+        if first is None:
+            return list(ArchiveReader(path)) if os.path.exists(path) else []
+        page_info = first.get('page') or {}
+        total = page_info.get('count', 0)
+        size = page_info.get('size') or 20
+
+        with store.lock(aid):
+            state = store.state(aid)
+            if os.path.exists(path) and state['threads'].get(str(root)) == total:
+                return list(ArchiveReader(path))
+
+        pages = {1: first.get('replies') or []}
+        page_count = (total + size - 1) // size
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.api.get_comment_replies, aid, root, page): page
+                       for page in range(2, page_count + 1)}
+            for future in as_completed(futures):
+                if stop_event and stop_event.is_set():
+                    for f in futures:
+                        f.cancel()
+                    return []
+                data = future.result()
+                pages[futures[future]] = (data or {}).get('replies') or []
+                if progress_callback:
+                    progress_callback(len(pages), page_count)
+
+        replies = []
+        seen = set()
+        for page in sorted(pages):
+            for reply in pages[page]:
+                if reply.get('rpid') not in seen:
+                    seen.add(reply.get('rpid'))
+                    replies.append(reply)
+
+        with store.lock(aid):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_archive(path, 'comments', replies, meta={'aid': aid, 'root': root})
+            state = store.state(aid)
+            state['threads'][str(root)] = total
+            store.save_state(aid, state)
+        return replies
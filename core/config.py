@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+import threading
 
 logger = logging.getLogger('bilibili_core')
 
@@ -8,6 +9,7 @@ APP_VERSION = 'v5.7.5'
 
 class ConfigManager:
     _instance = None
+    _save_lock = threading.Lock()
     
     DEFAULT_CONFIG = {
        "max_retries": 3,
@@ -19,6 +21,8 @@ class ConfigManager:
        "video_quality": "1080P 高清",
        "video_codec": "H.264/AVC",
        "audio_quality": "高音质 (Hi-Res/Dolby)",
+       "selection_policy": "preference",
+       "size_budget_gb": 2.0,
        "always_lock_account": False,
        "hardware_acceleration": True,
        "tab_order": [
@@ -43,6 +47,20 @@ class ConfigManager:
        },
        "timeout": 30,
        "retry_interval": 2,
+       "download_threads": 4,
+       "download_speed": 0,
+       "prefetch_count": 2,
+       "encode_workers": 0,
+       "reverse_chunk_seconds": 5,
+       "reverse_workers": 2,
+       "ffmpeg_timeout": 0,
+       "batch_workers": 0,
+       "frame_cache_mb": 256,
+       "comment_fetch_limit": 5000,
+       "download_comment_replies": True,
+       "analysis_comment_limit": 400,
+       "nlp_workers": 0,
+       "analysis_danmaku_ttl": 3600,
        "floating_window": True
     }
 
@@ -73,17 +91,22 @@ class ConfigManager:
                 logger.error(f"Failed to load config: {e}")
 
     def save(self):
-        try:
-            if not os.path.exists(self.config_dir):
-                os.makedirs(self.config_dir)
-            
-            # Ensure data_dir is saved
-            self.config['data_dir'] = self.data_dir
-            
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save config: {e}")
+        # 下载线程和界面线程都可能保存配置：加锁后写入临时文件再替换，不会写出不完整的配置文件
+        with self._save_lock:
+            try:
+                if not os.path.exists(self.config_dir):
+                    os.makedirs(self.config_dir)
+
+                # Ensure data_dir is saved
+                self.config['data_dir'] = self.data_dir
+
+                content = json.dumps(dict(self.config), ensure_ascii=False, indent=2)
+                tmp = self.config_path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp, self.config_path)
+            except Exception as e:
+                logger.error(f"Failed to save config: {e}")
 
     def get(self, key, default=None):
         return self.config.get(key, default)
@@ -1,15 +1,24 @@
 import os
 import re
 import shutil
+import threading
 import logging
 import xml.etree.ElementTree as ET
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from .network import NetworkManager
 from .api import BilibiliAPI
 from .downloader import Downloader
 from .processor import MediaProcessor
-from .utils import parse_danmaku_xml
+from .utils import format_size
+from .dash import parse_sidx, select_fragments
+from .preview_server import PreviewServer
+from .danmaku import DanmakuStore, SEGMENT_SECONDS
+from .archive import write_archive, ARCHIVE_EXT
+from .comments import CommentStore, CommentCrawler
+from .analysis_cache import AnalysisCache
+from .config import ConfigManager
 
 # 配置日志
 logger = logging.getLogger('bilibili_crawler') # 保持旧名称以便兼容日志配置
@@ -27,6 +36,8 @@ class BilibiliCrawler:
         self.network = NetworkManager(use_proxy, cookies)
         self.api = BilibiliAPI(self.network)
         self.downloader = Downloader(self.network)
+        self.comments = CommentCrawler(self.api, CommentStore(os.path.join(self.data_dir, 'comments')))
+        self.analysis_cache = AnalysisCache(os.path.join(self.data_dir, 'analysis'))
         self._processor = None
         
     @property
@@ -84,9 +95,75 @@ class BilibiliCrawler:
     def get_video_comments(self, aid, page=1):
         return self.api.get_video_comments(aid, page)
         
-    def get_video_danmaku(self, cid):
-        xml_bytes = self.api.get_video_danmaku(cid)
-        return parse_danmaku_xml(xml_bytes)
+    def refresh_comments(self, aid, max_comments=None, progress_callback=None, stop_event=None, backfill=True):
+        """
+        增量获取评论并返回本地保存的全部根评论 (按时间倒序)
+        :param max_comments: 本次最多获取的新评论数，默认取配置 comment_fetch_limit
+        :param backfill: 是否补齐上次未获取完的较早评论，为 False 时只获取新评论
+        """
+        if max_comments is None:
+            max_comments = ConfigManager().get('comment_fetch_limit', 5000) or None
+        try:
+            self.comments.refresh(aid, max_comments, progress_callback, stop_event, backfill=backfill)
+        except Exception as e:
+            logger.error(f"增量获取评论失败: {e}")
+        return self.comments.store.load(aid)
+
+    def get_comment_replies(self, aid, root, progress_callback=None, stop_event=None):
+        """按需获取某条评论下的全部回复"""
+        return self.comments.fetch_replies(aid, root, progress_callback, stop_event)
+
+    def get_video_danmaku(self, cid, duration=None, aid=None, progress_callback=None, stop_event=None):
+        """
+        获取完整弹幕：优先并行获取分段protobuf弹幕，失败时退回 list.so (条数有上限)
+        :param duration: 视频时长(秒)，用于确定分段数；为空时逐段获取直到没有数据
+        :return: DanmakuStore
+        """
+        store = self._fetch_danmaku_segments(cid, duration, aid, progress_callback, stop_event)
+        if not store:
+            store = DanmakuStore.from_xml(self.api.get_video_danmaku(cid))
+        logger.info(f"获取弹幕 {len(store)} 条")
+        return store
+
+    def _fetch_danmaku_segments(self, cid, duration, aid, progress_callback=None, stop_event=None):
+        store = DanmakuStore()
+        lock = threading.Lock()
+
+        def fetch(index):
+            if stop_event and stop_event.is_set():
+                return None
+            try:
+                return self.api.get_danmaku_segment(cid, index, aid)
+            except Exception as e:
+                logger.warning(f"获取第 {index} 段弹幕失败: {e}")
+                return None
+
+        def add(data):
+            if data:
+                try:
+                    with lock:
+                        store.add_segment(data)
+                except (ValueError, IndexError) as e:
+                    logger.warning(f"解析分段弹幕失败: {e}")
+
+        if duration:
+            count = max(1, int(-(-duration // SEGMENT_SECONDS)))
+            done = 0
+            with ThreadPoolExecutor(max_workers=min(4, count)) as executor:
+                # 各段到达后立即解码，不必等待全部完成
+                for future in as_completed([executor.submit(fetch, i) for i in range(1, count + 1)]):
+                    add(future.result())
+                    done += 1
+                    if progress_callback:
+                        progress_callback(int(done * 100 / count), 100)
+        else:
+            for index in range(1, 200):
+                data = fetch(index)
+                if not data:
+                    break
+                add(data)
+        store.sort()
+        return store
 
     def get_history(self, page=1):
         return self.api.get_history(page)
@@ -103,81 +180,360 @@ class BilibiliCrawler:
                       comments_progress_callback=None, should_merge=True, delete_original=True,
                       download_danmaku=False, download_comments=False,
                       video_quality='1080p', video_codec='H.264/AVC', audio_quality='高音质 (Hi-Res/Dolby)',
-                      stop_event=None):
-        """下载视频主流程"""
+                      selection_policy='preference', size_budget=None, stop_event=None,
+                      download_info=None, preview_callback=None):
+        """
+        下载视频主流程
+        :param download_info: 预先解析好的下载信息 (如队列预取)，为空时实时获取
+        :param preview_callback: 边下边播回调，下载开始时传入本地播放地址
+        """
         
-        # 1. 获取下载链接
-        print(f"正在获取视频 {bvid} 的下载链接 (画质: {video_quality}, 编码: {video_codec})...")
-        if self._check_stop(stop_event): return self._get_cancel_result()
+        try:
+            # 1. 获取下载链接
+            if self._check_stop(stop_event): return self._get_cancel_result()
             
-        download_info = self.api.get_video_download_url(bvid, video_quality, video_codec, audio_quality)
-        if not download_info:
-            return {"download_success": False, "message": "无法获取下载地址"}
+            if not download_info:
+                print(f"正在获取视频 {bvid} 的下载链接 (画质: {video_quality}, 编码: {video_codec})...")
+                download_info = self.api.get_video_download_url(bvid, video_quality, video_codec, audio_quality,
+                                                                selection_policy, size_budget)
+            if not download_info:
+                return {"download_success": False, "message": "无法获取下载地址"}
+            if download_info.get('estimated_size'):
+                print(f"已选择 {download_info['quality_desc']} / {download_info['codec_desc']}，"
+                      f"预估大小 {format_size(download_info['estimated_size'])}")
             
-        # 2. 准备目录和路径
-        title = download_info['title']
-        safe_title = re.sub(r'[\\/:*?"<>|]', '_', title)
-        video_dir = os.path.join(self.download_dir, safe_title)
-        if not os.path.exists(video_dir): os.makedirs(video_dir)
+            # 2. 准备目录和路径
+            title = download_info['title']
+            safe_title = re.sub(r'[\\/:*?"<>|]', '_', title)
+            video_dir = os.path.join(self.download_dir, safe_title)
+            if not os.path.exists(video_dir): os.makedirs(video_dir)
         
-        output_path = os.path.join(video_dir, f"{safe_title}.mp4")
+            output_path = os.path.join(video_dir, f"{safe_title}.mp4")
         
-        # 3. 检查是否已存在
-        if self._is_file_exists(output_path):
-            logger.info(f"视频已存在: {output_path}")
-            return {
-                "download_success": True, "merge_success": True,
-                "output_path": output_path, "download_dir": video_dir,
-                "message": "视频已存在，跳过下载",
-                "title": title,
-                "bvid": bvid
-            }
+            # 3. 检查是否已存在
+            if self._is_file_exists(output_path):
+                logger.info(f"视频已存在: {output_path}")
+                return {
+                    "download_success": True, "merge_success": True,
+                    "output_path": output_path, "download_dir": video_dir,
+                    "message": "视频已存在，跳过下载",
+                    "title": title,
+                    "bvid": bvid
+                }
         
-        # 4. 下载流媒体 (视频和音频)
-        video_url = download_info['video_url']
-        video_path = os.path.join(video_dir, f"{safe_title}_video.mp4")
-        audio_url = download_info.get('audio_url')
-        audio_path = os.path.join(video_dir, f"{safe_title}_audio.m4a") if audio_url else None
+            # durl 格式 (老视频/部分PGC): 分段并发下载后无损拼接
+            if download_info.get('format') == 'durl':
+                return self._download_durl(download_info, bvid, video_dir, safe_title, output_path,
+                                           video_progress_callback, merge_progress_callback,
+                                           should_merge, delete_original, stop_event)
+
+            # 4. 下载流媒体 (视频和音频)
+            video_url = download_info['video_url']
+            video_path = os.path.join(video_dir, f"{safe_title}_video.mp4")
+            audio_url = download_info.get('audio_url')
+            audio_path = os.path.join(video_dir, f"{safe_title}_audio.m4a") if audio_url else None
+
+            preview = None
+            if preview_callback:
+                preview = PreviewServer.instance(self.ffmpeg_path)
+                if audio_path:
+                    preview_url = preview.register_pair(video_path, audio_path)
+                else:
+                    preview_url = preview.url_for(preview.register(video_path))
+                video_progress_callback = preview.progress_hook(video_path, video_progress_callback)
+                if audio_path:
+                    audio_progress_callback = preview.progress_hook(audio_path, audio_progress_callback)
+                preview_callback(preview_url)
+
+            streams_ok = self._download_streams(video_url, video_path, audio_url, audio_path, safe_title,
+                                                video_progress_callback, audio_progress_callback, stop_event,
+                                                parallel=preview is not None)
+            if preview:
+                preview.mark_complete(video_path)
+                if audio_path:
+                    preview.mark_complete(audio_path)
+
+            if not streams_ok:
+                self._close_preview(preview, video_path, audio_path, abort=True)
+                if self._check_stop(stop_event):
+                    self._cleanup_dir(video_dir)
+                    return self._get_cancel_result(message="下载已取消")
+                return self._get_cancel_result(message="流媒体下载失败")
+
+            if preview and audio_path:
+                # 预览改用已封装好的文件，源文件交给合并流程
+                preview.release_pair(video_path, audio_path)
+                self._close_preview(preview, video_path, audio_path)
+
+            # 5. 下载弹幕和评论
+            if not self._download_metadata(download_info, video_dir, safe_title, download_danmaku, 
+                                           download_comments, danmaku_progress_callback, 
+                                           comments_progress_callback, stop_event):
+                if self._check_stop(stop_event):
+                    self._close_preview(preview, video_path, audio_path, abort=True)
+                    self._cleanup_dir(video_dir)
+                    return self._get_cancel_result(message="下载已取消")
+                return self._get_cancel_result(message="弹幕和评论下载失败")
+        
+            # 6. 合并/处理
+            merge_success = self._process_media(video_path, audio_path, output_path, should_merge, 
+                                                delete_original, merge_progress_callback, stop_event)
         
-        if not self._download_streams(video_url, video_path, audio_url, audio_path, safe_title, 
-                                      video_progress_callback, audio_progress_callback, stop_event):
             if self._check_stop(stop_event):
+                self._close_preview(preview, video_path, audio_path, abort=True)
                 self._cleanup_dir(video_dir)
                 return self._get_cancel_result(message="下载已取消")
-            return self._get_cancel_result(message="流媒体下载失败")
+            
+            if not should_merge:
+                output_path = None
+            
+            return {
+                "download_success": True,
+                "merge_success": merge_success,
+                "video_path": video_path,
+                "audio_path": audio_path,
+                "output_path": output_path,
+                "download_dir": video_dir,
+                "ffmpeg_available": self.processor.ffmpeg_available,
+                "title": title,
+                "bvid": bvid
+            }
+        finally:
+            # 测速结果在任务结束时由本线程写入配置一次，避免下载线程并发保存配置文件
+            self.downloader.save_speed()
 
-        # 5. 下载弹幕和评论
-        if not self._download_metadata(download_info, video_dir, safe_title, download_danmaku, 
-                                       download_comments, danmaku_progress_callback, 
-                                       comments_progress_callback, stop_event):
+    def _download_durl(self, download_info, bvid, video_dir, safe_title, output_path,
+                       progress_callback, merge_callback, should_merge, delete_original, stop_event):
+        """下载 durl 分段并使用 concat demuxer 拼接"""
+        title = download_info['title']
+        ext = download_info.get('container', 'flv')
+        segments = []
+        for i, seg in enumerate(download_info['segments']):
+            segments.append({
+                'url': seg['url'],
+                'backup_url': seg.get('backup_url', []),
+                'size': seg.get('size', 0),
+                'path': os.path.join(video_dir, f"{safe_title}_part{i + 1:03d}.{ext}")
+            })
+
+        if not self.downloader.download_segments(segments, progress_callback, stop_event=stop_event):
             if self._check_stop(stop_event):
                 self._cleanup_dir(video_dir)
                 return self._get_cancel_result(message="下载已取消")
-            return self._get_cancel_result(message="弹幕和评论下载失败")
-        
-        # 6. 合并/处理
-        merge_success = self._process_media(video_path, audio_path, output_path, should_merge, 
-                                            delete_original, merge_progress_callback, stop_event)
-        
+            # 保留已完成的分段，下次下载时跳过
+            return self._get_cancel_result(message="分段下载失败")
+
+        segment_paths = [seg['path'] for seg in segments]
+        merge_success = False
+        if should_merge and self.processor.ffmpeg_available:
+            print(f"开始拼接 {len(segment_paths)} 个分段...")
+            merge_success = self.processor.concat_files(segment_paths, output_path, progress_callback=merge_callback)
+            if merge_success and delete_original:
+                for path in segment_paths:
+                    try: os.remove(path)
+                    except Exception as e: logger.error(f"删除分段失败: {e}")
+
         if self._check_stop(stop_event):
             self._cleanup_dir(video_dir)
             return self._get_cancel_result(message="下载已取消")
-            
-        if not should_merge:
-            output_path = None
-            
+
         return {
             "download_success": True,
             "merge_success": merge_success,
-            "video_path": video_path,
-            "audio_path": audio_path,
-            "output_path": output_path,
+            "video_path": segment_paths[0] if len(segment_paths) == 1 else None,
+            "segment_paths": segment_paths,
+            "audio_path": None,
+            "output_path": output_path if merge_success else None,
             "download_dir": video_dir,
             "ffmpeg_available": self.processor.ffmpeg_available,
             "title": title,
             "bvid": bvid
         }
 
+    def download_video_clip(self, bvid, start_time, end_time, video_progress_callback=None,
+                            audio_progress_callback=None, merge_progress_callback=None,
+                            video_quality='1080p', video_codec='H.264/AVC', audio_quality='高音质 (Hi-Res/Dolby)',
+                            stop_event=None):
+        """
+        按时间范围下载视频片段
+        通过DASH的sidx索引只下载覆盖 [start_time, end_time] 的分片，再合并并精确裁剪
+        """
+        if end_time <= start_time:
+            return {"download_success": False, "message": "无效的时间范围"}
+
+        print(f"正在获取视频 {bvid} 的下载链接 (片段: {start_time}s - {end_time}s)...")
+        if self._check_stop(stop_event): return self._get_cancel_result()
+
+        download_info = self.api.get_video_download_url(bvid, video_quality, video_codec, audio_quality)
+        if not download_info:
+            return {"download_success": False, "message": "无法获取下载地址"}
+
+        if download_info.get('format') == 'durl':
+            return {"download_success": False, "message": "durl分段格式不支持按时间范围下载"}
+
+        video_base = download_info.get('video_segment_base')
+        audio_url = download_info.get('audio_url')
+        audio_base = download_info.get('audio_segment_base')
+        if not video_base or (audio_url and not audio_base):
+            return {"download_success": False, "message": "该视频流不包含分片索引，无法按时间范围下载"}
+
+        title = download_info['title']
+        safe_title = re.sub(r'[\\/:*?"<>|]', '_', title)
+        video_dir = os.path.join(self.download_dir, safe_title)
+        if not os.path.exists(video_dir): os.makedirs(video_dir)
+
+        clip_tag = f"clip_{int(start_time)}-{int(end_time)}"
+        output_path = os.path.join(video_dir, f"{safe_title}_{clip_tag}.mp4")
+        if self._is_file_exists(output_path):
+            return {
+                "download_success": True, "merge_success": True,
+                "output_path": output_path, "download_dir": video_dir,
+                "message": "片段已存在，跳过下载",
+                "title": title, "bvid": bvid
+            }
+
+        video_path = os.path.join(video_dir, f"{safe_title}_{clip_tag}_video.mp4")
+        audio_path = os.path.join(video_dir, f"{safe_title}_{clip_tag}_audio.m4a") if audio_url else None
+
+        video_start = self._download_stream_range(download_info['video_url'], video_base, video_path,
+                                                  start_time, end_time, f"{safe_title} - 视频片段",
+                                                  video_progress_callback, stop_event)
+        if video_start is None:
+            return self._get_cancel_result(message="下载已取消" if self._check_stop(stop_event) else "视频片段下载失败")
+
+        clip_origin = video_start
+        if audio_url:
+            audio_start = self._download_stream_range(audio_url, audio_base, audio_path,
+                                                      start_time, end_time, f"{safe_title} - 音频片段",
+                                                      audio_progress_callback, stop_event)
+            if audio_start is None:
+                return self._get_cancel_result(message="下载已取消" if self._check_stop(stop_event) else "音频片段下载失败")
+            clip_origin = min(video_start, audio_start)
+
+        if not self.processor.ffmpeg_available:
+            return {
+                "download_success": True, "merge_success": False,
+                "video_path": video_path, "audio_path": audio_path,
+                "output_path": None, "download_dir": video_dir,
+                "ffmpeg_available": False, "title": title, "bvid": bvid
+            }
+
+        # 分片对齐到关键帧，先无损合并再按相对时间精确裁剪
+        raw_path = os.path.join(video_dir, f"{safe_title}_{clip_tag}_raw.mp4")
+        if audio_path:
+            merged = self.processor.merge_video_audio(video_path, audio_path, raw_path)
+        else:
+            shutil.copyfile(video_path, raw_path)
+            merged = True
+
+        merge_success = False
+        if merged:
+            offset = max(0.0, start_time - clip_origin)
+            merge_success, _ = self.processor.cut_video(
+                raw_path, offset, offset + (end_time - start_time),
+                output_path=output_path, progress_callback=merge_progress_callback
+            )
+
+        for path in (video_path, audio_path, raw_path):
+            if path and os.path.exists(path):
+                try: os.remove(path)
+                except: pass
+
+        return {
+            "download_success": True,
+            "merge_success": merge_success,
+            "output_path": output_path if merge_success else None,
+            "download_dir": video_dir,
+            "ffmpeg_available": True,
+            "title": title,
+            "bvid": bvid
+        }
+
+    def _download_stream_range(self, url, segment_base, path, start_time, end_time, desc,
+                               progress_callback, stop_event):
+        """
+        下载单个DASH流在时间范围内的分片 (init段 + 选中的分片)
+        :return: 首个分片的起始时间(秒)，失败返回 None
+        """
+        if self._check_stop(stop_event): return None
+
+        init_start, init_end = segment_base['init']
+        index_start, index_end = segment_base['index']
+
+        init_data = self.downloader.fetch_range(url, init_start, init_end)
+        index_data = self.downloader.fetch_range(url, index_start, index_end)
+        if not init_data or not index_data:
+            return None
+
+        fragments = parse_sidx(index_data, index_start)
+        selection = select_fragments(fragments, start_time, end_time)
+        if not selection:
+            logger.error(f"时间范围 {start_time}-{end_time} 超出视频长度")
+            return None
+        byte_start, byte_end, fragment_start = selection
+        logger.info(f"{desc}: 需下载 {(byte_end - byte_start + 1) / 1024 / 1024:.2f} MB (分片起点 {fragment_start:.2f}s)")
+
+        with open(path, 'wb') as f:
+            f.write(init_data)
+
+        if not self.downloader.download_range(url, path, byte_start, byte_end, desc,
+                                              progress_callback, stop_event=stop_event):
+            return None
+        return fragment_start
+
+    def estimate_batch(self, bvids, video_quality='1080p', video_codec='H.264/AVC',
+                       audio_quality='高音质 (Hi-Res/Dolby)', selection_policy='preference',
+                       size_budget=None, speed=None):
+        """
+        批量下载前预估总大小和耗时
+        :param speed: 预估下载速度 (字节/秒)，默认使用最近的实测速度 (已保存在配置中)，
+                      从未下载过时对第一个视频的流做一次小范围测速
+        :return: {'items': [...], 'total_bytes': int, 'eta_seconds': float|None, 'speed': float}
+        """
+        items = []
+        total_bytes = 0
+        probe_url = None
+        for bvid in bvids:
+            info = self.api.get_video_download_url(bvid, video_quality, video_codec, audio_quality,
+                                                   selection_policy, size_budget)
+            if not info:
+                items.append({'bvid': bvid, 'title': None, 'estimated_size': 0, 'error': '无法获取下载地址'})
+                continue
+            size = info.get('estimated_size', 0)
+            total_bytes += size
+            if probe_url is None:
+                probe_url = info.get('video_url') or (info.get('segments') or [{}])[0].get('url')
+            items.append({
+                'bvid': bvid,
+                'title': info['title'],
+                'quality_desc': info['quality_desc'],
+                'codec_desc': info['codec_desc'],
+                'estimated_size': size
+            })
+
+        speed = speed or self.downloader.average_speed
+        if not speed and probe_url and total_bytes:
+            speed = self.downloader.probe_speed(probe_url)
+            if speed:
+                logger.info(f"没有历史下载速度，测速结果: {format_size(speed)}/s")
+        eta = total_bytes / speed if speed else None
+        logger.info(f"批量预估: {len(bvids)} 个视频, 共 {format_size(total_bytes)}"
+                    + (f", 预计 {eta:.0f} 秒" if eta else ""))
+        return {'items': items, 'total_bytes': total_bytes, 'eta_seconds': eta, 'speed': speed or 0}
+
+    def _close_preview(self, preview, video_path, audio_path, abort=False):
+        """
+        停止对源文件的边下边播，并等待正在进行的连接结束 (文件打开时在Windows下无法删除)
+        :param abort: 中断正在进行的传输 (取消或失败时使用)
+        """
+        if not preview:
+            return
+        paths = [p for p in (video_path, audio_path) if p]
+        for path in paths:
+            preview.unregister(path, abort=abort)
+        if not preview.wait_idle(paths):
+            logger.warning("边下边播的连接未能及时结束")
+
     def _cleanup_dir(self, dir_path):
         """清理目录"""
         if os.path.exists(dir_path):
@@ -197,7 +553,10 @@ class BilibiliCrawler:
         return os.path.exists(path) and os.path.getsize(path) > 1024 * 1024
 
     def _download_streams(self, video_url, video_path, audio_url, audio_path, safe_title, 
-                          video_cb, audio_cb, stop_event):
+                          video_cb, audio_cb, stop_event, parallel=False):
+        if parallel and audio_url:
+            return self._download_streams_parallel(video_url, video_path, audio_url, audio_path,
+                                                   safe_title, video_cb, audio_cb, stop_event)
         # 下载视频
         if not self._download_stream(video_url, video_path, f"{safe_title} - 视频", video_cb, stop_event):
             return False
@@ -212,13 +571,32 @@ class BilibiliCrawler:
                 return False
         return True
 
+    def _download_streams_parallel(self, video_url, video_path, audio_url, audio_path, safe_title,
+                                   video_cb, audio_cb, stop_event):
+        """边下边播时音视频同时下载，保证两条流的开头都尽快可读"""
+        results = {}
+
+        def worker(key, url, path, desc, cb):
+            results[key] = self._download_stream(url, path, desc, cb, stop_event)
+
+        threads = [
+            threading.Thread(target=worker, args=('video', video_url, video_path, f"{safe_title} - 视频", video_cb)),
+            threading.Thread(target=worker, args=('audio', audio_url, audio_path, f"{safe_title} - 音频", audio_cb))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results.get('video', False) and results.get('audio', False)
+
     def _download_metadata(self, download_info, video_dir, safe_title, download_danmaku, 
                            download_comments, danmaku_cb, comments_cb, stop_event):
         cid = download_info['video_info'].get('cid')
         aid = download_info['video_info'].get('aid')
         
         if download_danmaku and cid:
-            if not self._save_danmaku(cid, video_dir, safe_title, danmaku_cb, stop_event):
+            duration = download_info['video_info'].get('duration')
+            if not self._save_danmaku(cid, video_dir, safe_title, danmaku_cb, stop_event, duration, aid):
                 return False
             
         if download_comments and aid:
@@ -258,19 +636,19 @@ class BilibiliCrawler:
                 except: pass
         return success
 
-    def _save_danmaku(self, cid, video_dir, safe_title, progress_callback, stop_event):
+    def _save_danmaku(self, cid, video_dir, safe_title, progress_callback, stop_event, duration=None, aid=None):
         """保存弹幕"""
         if stop_event and stop_event.is_set(): return False
         
         logger.info("正在获取视频弹幕...")
         if progress_callback: progress_callback(0, 100)
-        danmaku_list = self.get_video_danmaku(cid)
+        danmaku_list = self.get_video_danmaku(cid, duration, aid, progress_callback, stop_event)
+        if stop_event and stop_event.is_set(): return False
         if danmaku_list:
-            danmaku_path = os.path.join(video_dir, f"{safe_title}_danmaku.json")
+            danmaku_path = os.path.join(video_dir, f"{safe_title}_danmaku{ARCHIVE_EXT}")
             try:
-
-                with open(danmaku_path, 'w', encoding='utf-8') as f:
-                    json.dump(danmaku_list, f, ensure_ascii=False, indent=2)
+                # 分段获取后已按时间排序，块索引的时间范围互不重叠
+                write_archive(danmaku_path, 'danmaku', danmaku_list, meta={'cid': cid, 'aid': aid})
                 logger.info(f"弹幕已保存到: {danmaku_path}")
             except Exception as e:
                 logger.error(f"保存弹幕失败: {e}")
@@ -283,26 +661,55 @@ class BilibiliCrawler:
         
         logger.info("正在获取视频评论...")
         if progress_callback: progress_callback(0, 100)
-        
-        all_comments = []
-        for page in range(1, 6):
-            if stop_event and stop_event.is_set(): return False
-            comments = self.get_video_comments(aid, page)
-            if comments: all_comments.extend(comments)
-            else: break
-            if progress_callback: progress_callback(page*20, 100)
-            
+
+        def on_progress(current, total):
+            if progress_callback and total:
+                progress_callback(min(current * 90 // total, 89), 100)
+
+        all_comments = self.refresh_comments(aid, progress_callback=on_progress, stop_event=stop_event)
+        if stop_event and stop_event.is_set(): return False
+
         if all_comments:
-            comments_path = os.path.join(video_dir, f"{safe_title}_comments.json")
+            comments_path = os.path.join(video_dir, f"{safe_title}_comments{ARCHIVE_EXT}")
             try:
-                with open(comments_path, 'w', encoding='utf-8') as f:
-                    json.dump(all_comments, f, ensure_ascii=False, indent=2)
+                write_archive(comments_path, 'comments', all_comments, meta={'aid': aid})
                 logger.info(f"评论已保存到: {comments_path}")
             except Exception as e:
                 logger.error(f"保存评论失败: {e}")
+
+            if ConfigManager().get('download_comment_replies', True):
+                if not self._save_comment_replies(aid, all_comments, video_dir, safe_title,
+                                                  progress_callback, stop_event):
+                    return False
         if progress_callback: progress_callback(100, 100)
         return True
 
+    def _save_comment_replies(self, aid, comments, video_dir, safe_title, progress_callback, stop_event):
+        """保存楼中楼回复：只获取有回复的评论，回复数没有变化的楼层直接读取本地缓存"""
+        roots = [c.get('rpid') for c in comments if c.get('rcount')]
+        if not roots:
+            return True
+        logger.info(f"正在获取 {len(roots)} 条评论的回复...")
+        replies = []
+        for i, root in enumerate(roots):
+            if stop_event and stop_event.is_set(): return False
+            try:
+                replies.extend(self.get_comment_replies(aid, root, stop_event=stop_event))
+            except Exception as e:
+                logger.error(f"获取评论 {root} 的回复失败: {e}")
+            if progress_callback:
+                progress_callback(min(99, 90 + (i + 1) * 10 // len(roots)), 100)
+        if stop_event and stop_event.is_set(): return False
+
+        if replies:
+            replies_path = os.path.join(video_dir, f"{safe_title}_replies{ARCHIVE_EXT}")
+            try:
+                write_archive(replies_path, 'comments', replies, meta={'aid': aid})
+                logger.info(f"评论回复已保存到: {replies_path}")
+            except Exception as e:
+                logger.error(f"保存评论回复失败: {e}")
+        return True
+
     def save_to_json(self, data, filename):
         path = os.path.join(self.data_dir, f"{filename}.json")
         with open(path, 'w', encoding='utf-8') as f:
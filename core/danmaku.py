@@ -0,0 +1,263 @@
+import io
+import logging
+from array import array
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+logger = logging.getLogger('bilibili_core.danmaku')
+
+# 分段弹幕接口每段覆盖的时长 (秒)
+SEGMENT_SECONDS = 360
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _skip_field(data, pos, wire_type):
+    if wire_type == 0:
+        _, pos = _read_varint(data, pos)
+    elif wire_type == 1:
+        pos += 8
+    elif wire_type == 2:
+        length, pos = _read_varint(data, pos)
+        pos += length
+    elif wire_type == 5:
+        pos += 4
+    else:
+        raise ValueError(f"不支持的protobuf字段类型: {wire_type}")
+    return pos
+
+
+def iter_segment(data):
+    """
+    逐条解码分段弹幕 (DmSegMobileReply)，不依赖protobuf库
+    DanmakuElem 字段: 1 id, 2 progress(毫秒), 3 mode, 4 fontsize, 5 color, 6 midHash,
+                      7 content, 8 ctime, 11 pool
+    :return: 生成 (id, time, mode, fontsize, color, user_hash, text_bytes, ctime, pool)
+    """
+    data = memoryview(data)
+    pos, end = 0, len(data)
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        if key >> 3 != 1 or key & 7 != 2:
+            pos = _skip_field(data, pos, key & 7)
+            continue
+        length, pos = _read_varint(data, pos)
+        elem_end = pos + length
+
+        dmid = progress = mode = fontsize = color = ctime = pool = 0
+        user_hash = b''
+        text = b''
+        while pos < elem_end:
+            key, pos = _read_varint(data, pos)
+            field, wire_type = key >> 3, key & 7
+            if wire_type == 0:
+                value, pos = _read_varint(data, pos)
+                if field == 1: dmid = value
+                elif field == 2: progress = value
+                elif field == 3: mode = value
+                elif field == 4: fontsize = value
+                elif field == 5: color = value
+                elif field == 8: ctime = value
+                elif field == 11: pool = value
+            elif wire_type == 2:
+                length, pos = _read_varint(data, pos)
+                if field == 7: text = bytes(data[pos:pos + length])
+                elif field == 6: user_hash = bytes(data[pos:pos + length])
+                pos += length
+            else:
+                pos = _skip_field(data, pos, wire_type)
+        pos = elem_end
+        if text:
+            yield dmid, progress / 1000.0, mode, fontsize, color, user_hash, text, ctime, pool
+
+
+class DanmakuStore:
+    """
+    负责以列式结构保存弹幕：每个字段一个定长数组，文本统一存放在一个UTF-8缓冲区中按偏移读取
+    相比每条弹幕一个字典，内存占用约为十分之一，时间、颜色等列可直接交给NumPy/图表使用
+    重复的弹幕id直接在 ids 列上去重 (sort/dedupe)，不额外保存id集合
+    """
+    __slots__ = ('ids', 'times', 'modes', 'fontsizes', 'colors', 'user_hashes', 'ctimes', 'pools',
+                 '_text', '_offsets')
+    COLUMNS = ('ids', 'times', 'modes', 'fontsizes', 'colors', 'user_hashes', 'ctimes', 'pools')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.times = array('f')       # 出现时间 (秒)
+        self.modes = array('B')
+        self.fontsizes = array('B')
+        self.colors = array('I')
+        self.user_hashes = array('I')  # 发送者 midHash (crc32)
+        self.ctimes = array('q')      # 发送时间戳
+        self.pools = array('B')
+        self._text = bytearray()
+        self._offsets = array('I', [0])
+
+    def __len__(self):
+        return len(self.times)
+
+    def __bool__(self):
+        return len(self.times) > 0
+
+    def append(self, dmid, time, mode, fontsize, color, user_hash, text, ctime, pool):
+        """
+        :param user_hash: midHash 十六进制字符串或字节
+        :param text: 弹幕文本 (str 或 UTF-8 字节)
+        不检查重复，重复的弹幕id在 sort()/dedupe() 时去掉
+        """
+        if isinstance(text, str):
+            text = text.encode('utf-8')
+        if isinstance(user_hash, bytes):
+            user_hash = user_hash.decode('ascii', errors='ignore')
+        try:
+            user_hash = int(user_hash, 16) & 0xffffffff if user_hash else 0
+        except ValueError:
+            user_hash = 0
+        self.ids.append(dmid)
+        self.times.append(time)
+        self.modes.append(min(mode, 255))
+        self.fontsizes.append(min(fontsize, 255))
+        self.colors.append(color & 0xffffffff)
+        self.user_hashes.append(user_hash)
+        self.ctimes.append(ctime)
+        self.pools.append(min(pool, 255))
+        self._text += text
+        self._offsets.append(len(self._text))
+
+    def add_segment(self, data):
+        """解码一段protobuf弹幕并追加 (各段之间的重复在 sort() 时去掉)，返回追加条数"""
+        added = 0
+        for row in iter_segment(data):
+            self.append(*row)
+            added += 1
+        return added
+
+    def extend(self, other):
+        """追加 other 中id尚未出现过的弹幕"""
+        theirs = np.frombuffer(other.ids, dtype=np.int64)
+        new = ~np.isin(theirs, np.frombuffer(self.ids, dtype=np.int64)) | (theirs == 0)
+        for i in np.flatnonzero(new).tolist():
+            self.append(other.ids[i], other.times[i], other.modes[i], other.fontsizes[i], other.colors[i],
+                        f"{other.user_hashes[i]:08x}", other.text_bytes(i), other.ctimes[i], other.pools[i])
+
+    def text_bytes(self, index):
+        return bytes(self._text[self._offsets[index]:self._offsets[index + 1]])
+
+    def text(self, index):
+        return self._text[self._offsets[index]:self._offsets[index + 1]].decode('utf-8', errors='replace')
+
+    def texts(self):
+        for i in range(len(self)):
+            yield self.text(i)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return {
+            'time': round(self.times[index], 3),
+            'mode': self.modes[index],
+            'fontsize': self.fontsizes[index],
+            'color': self.colors[index],
+            'timestamp': self.ctimes[index],
+            'pool': self.pools[index],
+            'user_id': f"{self.user_hashes[index]:08x}",
+            'dmid': str(self.ids[index]),
+            'text': self.text(index)
+        }
+
+    def __iter__(self):
+        """按旧的字典格式逐条返回，兼容原有代码"""
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self):
+        return list(self)
+
+    def sort(self):
+        """去掉重复的弹幕后按出现时间排序 (分段并行获取后调用)"""
+        self.dedupe()
+        order = sorted(range(len(self)), key=self.times.__getitem__)
+        if all(order[i] <= order[i + 1] for i in range(len(order) - 1)):
+            return
+        self._take(order)
+
+    def dedupe(self):
+        """按 ids 列去掉重复的弹幕 (保留最先出现的一条，id为0的不参与)，返回去掉的条数"""
+        ids = np.frombuffer(self.ids, dtype=np.int64)
+        keep = ids == 0
+        keep[np.unique(ids, return_index=True)[1]] = True
+        removed = len(ids) - int(keep.sum())
+        if removed:
+            self._take(np.flatnonzero(keep).tolist())
+        return removed
+
+    def _take(self, order):
+        """按行号列表 order 重建所有列"""
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+        text = bytearray()
+        offsets = array('I', [0])
+        for i in order:
+            text += self._text[self._offsets[i]:self._offsets[i + 1]]
+            offsets.append(len(text))
+        self._text, self._offsets = text, offsets
+
+    @property
+    def nbytes(self):
+        columns = (self.ids, self.times, self.modes, self.fontsizes, self.colors, self.user_hashes,
+                   self.ctimes, self.pools, self._offsets)
+        return sum(c.itemsize * len(c) for c in columns) + len(self._text)
+
+    @classmethod
+    def from_list(cls, danmaku_list):
+        """从旧的字典列表 (parse_danmaku_xml / _danmaku.json) 构造"""
+        store = cls()
+        for d in danmaku_list:
+            try:
+                dmid = int(d.get('dmid') or 0)
+            except (TypeError, ValueError):
+                dmid = 0
+            store.append(dmid, float(d.get('time', 0)), int(d.get('mode', 1)), int(d.get('fontsize', 25)),
+                         int(d.get('color', 0xffffff)), d.get('user_id', ''), d.get('text', ''),
+                         int(d.get('timestamp', 0)), int(d.get('pool', 0)))
+        store.dedupe()
+        return store
+
+    @classmethod
+    def from_xml(cls, xml_bytes):
+        """增量解析 list.so 返回的XML弹幕，不构造整棵树"""
+        store = cls()
+        if not xml_bytes:
+            return store
+        try:
+            for _, elem in ET.iterparse(io.BytesIO(xml_bytes), events=('end',)):
+                if elem.tag != 'd':
+                    continue
+                parts = (elem.get('p') or '').split(',')
+                text = elem.text or ''
+                if len(parts) >= 8 and text:
+                    try:
+                        dmid = int(parts[7])
+                    except ValueError:
+                        dmid = 0
+                    store.append(dmid, float(parts[0]), int(parts[1]), int(parts[2]), int(parts[3]),
+                                 parts[6], text, int(parts[4]), int(parts[5]))
+                elem.clear()
+        except ET.ParseError as e:
+            logger.error(f"解析弹幕失败: {e}")
+        store.dedupe()
+        return store
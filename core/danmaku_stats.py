@@ -0,0 +1,174 @@
+import logging
+
+import numpy as np
+
+from .danmaku import DanmakuStore
+
+logger = logging.getLogger('bilibili_core.danmaku_stats')
+
+
+def as_store(danmaku):
+    """把旧的字典列表转换为 DanmakuStore，已是 DanmakuStore 时原样返回"""
+    if isinstance(danmaku, DanmakuStore):
+        return danmaku
+    return DanmakuStore.from_list(danmaku or [])
+
+
+def column(store, name):
+    """以NumPy数组的形式读取一列 (不复制数据)"""
+    data = getattr(store, name)
+    if not len(data):
+        return np.empty(0, dtype=np.dtype(data.typecode))
+    return np.frombuffer(data, dtype=np.dtype(data.typecode))
+
+
+def default_bin_size(span):
+    return 30 if span < 600 else 60
+
+
+def density(store, duration=None, bin_size=None):
+    """
+    弹幕时间分布
+    :return: (edges, counts)，edges 比 counts 多一个元素
+    """
+    times = column(store, 'times')
+    span = max(float(times.max()) if len(times) else 0.0, float(duration or 0))
+    bin_size = bin_size or default_bin_size(span)
+    n_bins = int(span // bin_size) + 1
+    index = np.minimum((np.clip(times, 0, None) // bin_size).astype(np.int64), n_bins - 1)
+    counts = np.bincount(index, minlength=n_bins)
+    edges = np.arange(n_bins + 1, dtype=np.float64) * bin_size
+    return edges, counts
+
+
+def find_peaks(store, duration=None, bin_size=10, min_gap=30, top=10, sensitivity=2.0):
+    """
+    检测"高能"时刻：平滑后的弹幕密度中高于 均值 + sensitivity 倍标准差 的局部极大值
+    :param min_gap: 两个高能时刻之间的最小间隔 (秒)
+    :return: {'time': 区间开始时间, 'count': 区间弹幕数, 'score': 相对平均密度的倍数}，按时间排序
+    """
+    edges, counts = density(store, duration, bin_size)
+    empty = {'time': np.empty(0), 'count': np.empty(0, dtype=np.int64), 'score': np.empty(0)}
+    if len(counts) < 3 or not counts.sum():
+        return empty
+
+    smooth = np.convolve(counts, np.ones(3) / 3, mode='same')
+    threshold = smooth.mean() + sensitivity * smooth.std()
+    left = np.r_[-np.inf, smooth[:-1]]
+    right = np.r_[smooth[1:], -np.inf]
+    candidates = np.flatnonzero((smooth >= left) & (smooth > right) & (smooth > threshold))
+    if not len(candidates):
+        return empty
+
+    # 从最高的峰开始选取，与已选峰距离过近的跳过
+    gap_bins = max(1, int(np.ceil(min_gap / bin_size)))
+    chosen = []
+    for i in candidates[np.argsort(smooth[candidates])[::-1]]:
+        if all(abs(i - j) >= gap_bins for j in chosen):
+            chosen.append(i)
+            if len(chosen) >= top:
+                break
+    chosen = np.sort(np.array(chosen, dtype=np.int64))
+    mean = counts.mean() or 1.0
+    return {'time': edges[chosen], 'count': counts[chosen], 'score': smooth[chosen] / mean}
+
+
+def distribution(store, name, exclude=None):
+    """
+    某一列的取值分布，按数量从多到少排序
+    :param name: colors / modes / fontsizes / pools
+    :return: (values, counts)
+    """
+    data = column(store, name)
+    if exclude is not None:
+        data = data[data != exclude]
+    values, counts = np.unique(data, return_counts=True)
+    order = np.argsort(counts, kind='stable')[::-1]
+    return values[order], counts[order]
+
+
+def keyword_bursts(store, bin_seconds=60, top=3, min_count=5, min_lift=3.0, min_z=5.0,
+                   min_share=0.02):
+    """
+    按分钟统计刷屏弹幕：同一内容在某一分钟内的出现次数明显高于它在全片的平均水平
+    弹幕很短，直接以去掉空白后的整条文本为关键词
+    :param min_z: 按泊松分布计算的显著性下限，过滤常见弹幕的随机波动
+    :param min_share: 在该分钟全部弹幕中至少占的比例
+    :return: {'minute': 分钟序号, 'text': 文本列表, 'count': 该分钟出现次数, 'lift': 相对平均水平的倍数}
+    """
+    n = len(store)
+    empty = {'minute': np.empty(0, dtype=np.int64), 'text': [], 'count': np.empty(0, dtype=np.int64),
+             'lift': np.empty(0)}
+    if not n:
+        return empty
+
+    # 文本映射为整数编号，之后的计数全部在数组上完成
+    vocab = {}
+    ids = np.fromiter((vocab.setdefault(store.text_bytes(i).strip().lower(), len(vocab)) for i in range(n)),
+                      dtype=np.int64, count=n)
+    minutes = (np.clip(column(store, 'times'), 0, None) // bin_seconds).astype(np.int64)
+    n_vocab, n_minutes = len(vocab), int(minutes.max()) + 1
+
+    keys, counts = np.unique(minutes * n_vocab + ids, return_counts=True)
+    key_minutes, key_ids = keys // n_vocab, keys % n_vocab
+    total_per_text = np.bincount(ids, minlength=n_vocab)
+    per_minute = np.bincount(minutes, minlength=n_minutes)
+    # 期望次数 = 该文本总数 × 该分钟弹幕占全部弹幕的比例
+    expected = total_per_text[key_ids] * per_minute[key_minutes] / n
+    expected = np.maximum(expected, 1e-9)
+    lift = counts / expected
+    z = (counts - expected) / np.sqrt(expected)
+
+    mask = ((counts >= min_count) & (lift >= min_lift) & (z >= min_z)
+            & (counts >= min_share * per_minute[key_minutes]))
+    key_minutes, key_ids, counts, lift = key_minutes[mask], key_ids[mask], counts[mask], lift[mask]
+    if not len(counts):
+        return empty
+
+    # 每分钟只保留出现次数最多的 top 条
+    order = np.lexsort((-counts, key_minutes))
+    key_minutes, key_ids, counts, lift = key_minutes[order], key_ids[order], counts[order], lift[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(key_minutes)) + 1]
+    rank = np.arange(len(key_minutes)) - np.repeat(starts, np.diff(np.r_[starts, len(key_minutes)]))
+    keep = rank < top
+
+    words = list(vocab)
+    return {
+        'minute': key_minutes[keep],
+        'text': [words[i].decode('utf-8', errors='replace') for i in key_ids[keep]],
+        'count': counts[keep],
+        'lift': lift[keep],
+    }
+
+
+def summarize(danmaku, duration=None):
+    """
+    计算全部弹幕统计，返回的数组可直接用于图表或导出
+    """
+    store = as_store(danmaku)
+    edges, counts = density(store, duration)
+    colors, color_counts = distribution(store, 'colors', exclude=0)
+    modes, mode_counts = distribution(store, 'modes')
+    fontsizes, fontsize_counts = distribution(store, 'fontsizes')
+    return {
+        'total': len(store),
+        'density': {'edges': edges, 'counts': counts},
+        'peaks': find_peaks(store, duration),
+        'colors': {'values': colors, 'counts': color_counts},
+        'modes': {'values': modes, 'counts': mode_counts},
+        'fontsizes': {'values': fontsizes, 'counts': fontsize_counts},
+        'bursts': keyword_bursts(store),
+    }
+
+
+def to_jsonable(stats):
+    """把统计结果中的NumPy数组转换为列表，用于导出JSON"""
+    if isinstance(stats, dict):
+        return {k: to_jsonable(v) for k, v in stats.items()}
+    if isinstance(stats, np.ndarray):
+        return stats.tolist()
+    if isinstance(stats, np.generic):
+        return stats.item()
+    if isinstance(stats, (list, tuple)):
+        return [to_jsonable(v) for v in stats]
+    return stats
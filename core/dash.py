@@ -0,0 +1,127 @@
+import struct
+import logging
+
+logger = logging.getLogger('bilibili_core.dash')
+
+
+def parse_byte_range(range_str):
+    """
+    解析 "start-end" 形式的字节范围
+    :return: (start, end) 闭区间，解析失败返回 None
+    """
+    if not range_str:
+        return None
+    try:
+        start, end = str(range_str).split('-', 1)
+        return int(start), int(end)
+    except (ValueError, TypeError):
+        logger.warning(f"无效的字节范围: {range_str}")
+        return None
+
+
+def get_segment_base(stream):
+    """
+    从playurl返回的DASH流中提取SegmentBase信息
+    B站同时返回 SegmentBase (Initialization/indexRange) 和 segment_base (initialization/index_range)
+    :return: {'init': (start, end), 'index': (start, end)} 或 None
+    """
+    if not stream:
+        return None
+
+    base = stream.get('SegmentBase') or {}
+    init_range = base.get('Initialization')
+    index_range = base.get('indexRange')
+
+    if not init_range or not index_range:
+        base = stream.get('segment_base') or {}
+        init_range = base.get('initialization')
+        index_range = base.get('index_range')
+
+    init = parse_byte_range(init_range)
+    index = parse_byte_range(index_range)
+    if not init or not index:
+        return None
+    return {'init': init, 'index': index}
+
+
+def parse_sidx(data, index_offset):
+    """
+    解析 sidx (Segment Index) box
+    :param data: 包含完整sidx box的字节数据
+    :param index_offset: sidx box 在文件中的起始偏移 (即 indexRange 的起点)
+    :return: 分片列表 [{'start': 秒, 'end': 秒, 'offset': 字节, 'size': 字节}, ...]
+    """
+    pos = 0
+    while pos + 8 <= len(data):
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        if size < header:
+            break
+        if box_type == b'sidx':
+            return _parse_sidx_body(data, pos, size, header, index_offset)
+        pos += size
+
+    logger.error("未在索引数据中找到sidx box")
+    return []
+
+
+def _parse_sidx_body(data, box_start, box_size, header, index_offset):
+    pos = box_start + header
+    version = data[pos]
+    pos += 4  # version + flags
+
+    _reference_id, timescale = struct.unpack_from('>II', data, pos)
+    pos += 8
+
+    if version == 0:
+        earliest_pts, first_offset = struct.unpack_from('>II', data, pos)
+        pos += 8
+    else:
+        earliest_pts, first_offset = struct.unpack_from('>QQ', data, pos)
+        pos += 16
+
+    _reserved, reference_count = struct.unpack_from('>HH', data, pos)
+    pos += 4
+
+    if not timescale:
+        logger.error("sidx timescale为0")
+        return []
+
+    # 第一个分片的偏移以 sidx box 结束位置为锚点
+    offset = index_offset + box_start + box_size + first_offset
+    current_pts = earliest_pts
+
+    fragments = []
+    for _ in range(reference_count):
+        if pos + 12 > len(data):
+            logger.warning("sidx数据不完整，分片列表被截断")
+            break
+        ref, duration, _sap = struct.unpack_from('>III', data, pos)
+        pos += 12
+
+        ref_size = ref & 0x7FFFFFFF
+        fragments.append({
+            'start': current_pts / timescale,
+            'end': (current_pts + duration) / timescale,
+            'offset': offset,
+            'size': ref_size
+        })
+        offset += ref_size
+        current_pts += duration
+
+    return fragments
+
+
+def select_fragments(fragments, start_time, end_time):
+    """
+    选出覆盖 [start_time, end_time] 的最小连续分片区间
+    :return: (字节起点, 字节终点(闭区间), 首个分片起始时间) 或 None
+    """
+    selected = [f for f in fragments if f['end'] > start_time and f['start'] < end_time]
+    if not selected:
+        return None
+    first, last = selected[0], selected[-1]
+    return first['offset'], last['offset'] + last['size'] - 1, first['start']
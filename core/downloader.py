@@ -2,7 +2,10 @@ import os
 import sys
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from .network import NetworkManager
+from .config import ConfigManager
 
 logger = logging.getLogger('bilibili_core.downloader')
 
@@ -12,6 +15,97 @@ class Downloader:
     """
     def __init__(self, network_manager: NetworkManager):
         self.network = network_manager
+        # 最近下载速度 (字节/秒, 指数滑动平均)，用于预估批量下载耗时；
+        # 保存在配置中，新进程中没有下载记录时使用上次的测速结果
+        self.average_speed = ConfigManager().get('download_speed', 0) or 0
+        self._speed_lock = threading.Lock()
+        self._speed_changed = False
+
+    def _record_speed(self, size, elapsed):
+        # 过小的文件主要反映连接建立的耗时，不计入；各下载线程只更新内存中的平均值
+        if size < 1024 * 1024 or elapsed <= 0:
+            return
+        speed = size / elapsed
+        with self._speed_lock:
+            self.average_speed = speed if not self.average_speed else self.average_speed * 0.7 + speed * 0.3
+            self._speed_changed = True
+
+    def save_speed(self):
+        """把测速结果写入配置，由下载任务结束时在任务所在线程调用"""
+        with self._speed_lock:
+            if not self._speed_changed:
+                return
+            self._speed_changed = False
+            speed = int(self.average_speed)
+        config = ConfigManager()
+        config.set('download_speed', speed)
+        config.save()
+
+    def probe_speed(self, url, size=2 * 1024 * 1024):
+        """
+        下载一小段数据粗略测速 (字节/秒)，没有历史测速结果时用于预估耗时
+        :return: 测速失败返回 0
+        """
+        start_time = time.time()
+        data = self.fetch_range(url, 0, size - 1)
+        elapsed = time.time() - start_time
+        if not data or elapsed <= 0:
+            return 0
+        return len(data) / elapsed
+
+    def download_segments(self, segments, progress_callback=None, stop_event=None, max_workers=None) -> bool:
+        """
+        并发下载多个分段文件
+        :param segments: [{'url': str, 'path': str, 'size': int, 'backup_url': [str]}, ...]
+        :param progress_callback: 汇总进度回调 (已下载字节, 总字节)
+        :return: 全部成功返回 True
+        """
+        if not segments:
+            return True
+
+        if max_workers is None:
+            max_workers = self.network.config.get('download_threads', 4)
+        max_workers = max(1, min(max_workers, len(segments)))
+
+        total_size = sum(seg.get('size', 0) for seg in segments)
+        progress = {}
+        lock = threading.Lock()
+
+        def report():
+            if progress_callback:
+                with lock:
+                    done = sum(progress.values())
+                progress_callback(done, total_size if total_size > 0 else -1)
+
+        def download_one(index, seg):
+            path = seg['path']
+            expected = seg.get('size', 0)
+            # 分段级断点续传：已完整下载的分段直接跳过
+            if expected and os.path.exists(path) and os.path.getsize(path) == expected:
+                progress[index] = expected
+                report()
+                return True
+
+            def seg_cb(current, total):
+                progress[index] = current
+                report()
+
+            for url in [seg['url']] + list(seg.get('backup_url') or []):
+                if stop_event and stop_event.is_set():
+                    return False
+                if self.download_file(url, path, os.path.basename(path), seg_cb, stop_event=stop_event):
+                    return True
+                logger.warning(f"分段 {index + 1} 下载失败，尝试备用地址")
+            return False
+
+        logger.info(f"开始并发下载 {len(segments)} 个分段 (线程数: {max_workers})")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(download_one, i, seg) for i, seg in enumerate(segments)]
+            results = [f.result() for f in futures]
+
+        if progress_callback and all(results):
+            progress_callback(total_size, total_size)
+        return all(results)
 
     def download_file(self, url: str, filepath: str, filename: str = None, progress_callback=None, stop_event=None) -> bool:
         """下载单个文件"""
@@ -39,6 +133,16 @@ class Downloader:
                 stream=True, 
                 timeout=(5, timeout)
             )
+            # 续传起点已到达文件末尾: 本地文件已完整 (分段未提供大小时会走到这里)
+            if file_size > 0 and response.status_code == 416:
+                remote_size = self._content_range_total(response)
+                if remote_size is None or remote_size == file_size:
+                    response.close()
+                    logger.info(f"文件已完整下载，跳过: {filename or filepath}")
+                    if progress_callback:
+                        progress_callback(file_size, file_size)
+                    return True
+                logger.warning(f"本地文件大小 {file_size} 与远端 {remote_size} 不一致")
             response.raise_for_status()
 
         except Exception as e:
@@ -99,9 +203,124 @@ class Downloader:
                 progress_callback(downloaded_size, downloaded_size) # 100%
                 
             elapsed = time.time() - start_time
+            self._record_speed(downloaded_size - file_size, elapsed)
             logger.info(f"下载完成: {filename or filepath}, 用时: {elapsed:.2f}s")
             return True
             
         except Exception as e:
             logger.error(f"下载过程中断: {e}")
             return False
+
+    @staticmethod
+    def _content_range_total(response):
+        """解析 Content-Range 中的文件总大小 (如 "bytes */12345")，没有时返回 None"""
+        value = response.headers.get('content-range', '')
+        total = value.rsplit('/', 1)[-1].strip() if '/' in value else ''
+        return int(total) if total.isdigit() else None
+
+    def fetch_range(self, url: str, start: int, end: int):
+        """获取指定字节范围的数据 (用于init段和sidx索引等小块数据)"""
+        headers = self.network.headers.copy()
+        headers['User-Agent'] = self.network._get_random_ua()
+        headers['Range'] = f'bytes={start}-{end}'
+
+        try:
+            timeout = self.network.config.get('timeout', 30)
+            response = self.network.session.get(
+                url,
+                headers=headers,
+                cookies=self.network.cookies,
+                timeout=(5, timeout)
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"范围请求失败 ({start}-{end}): {e}")
+            return None
+
+        expected = end - start + 1
+        if response.status_code != 206 and len(response.content) != expected:
+            logger.error(f"服务器不支持Range请求，状态码: {response.status_code}")
+            return None
+        return response.content
+
+    def download_range(self, url: str, filepath: str, start: int, end: int, filename: str = None,
+                       progress_callback=None, stop_event=None) -> bool:
+        """
+        下载指定字节范围并追加到文件末尾 (支持断点续传)
+        :param start: 起始字节 (相对于远端文件)
+        :param end: 结束字节 (闭区间)
+        """
+        total_size = end - start + 1
+        written = 0
+        partial_path = filepath + '.part'
+        if os.path.exists(partial_path):
+            written = os.path.getsize(partial_path)
+            if written >= total_size:
+                return self._commit_range(partial_path, filepath, progress_callback, total_size)
+            logger.info(f"范围下载断点续传，已完成 {written}/{total_size} 字节")
+
+        headers = self.network.headers.copy()
+        headers['User-Agent'] = self.network._get_random_ua()
+        headers['Range'] = f'bytes={start + written}-{end}'
+
+        try:
+            timeout = self.network.config.get('timeout', 30)
+            response = self.network.session.get(
+                url,
+                headers=headers,
+                cookies=self.network.cookies,
+                stream=True,
+                timeout=(5, timeout)
+            )
+            response.raise_for_status()
+            if response.status_code != 206:
+                logger.error(f"服务器不支持Range请求，状态码: {response.status_code}")
+                return False
+        except Exception as e:
+            logger.error(f"范围下载请求失败: {e}")
+            return False
+
+        if filename:
+            logger.info(f"正在下载片段: {filename} ({total_size / 1024 / 1024:.2f} MB)")
+
+        last_update_time = time.time()
+        try:
+            with open(partial_path, 'ab') as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    if stop_event and stop_event.is_set():
+                        logger.info("检测到停止信号，中断下载")
+                        return False
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+                        current_time = time.time()
+                        if progress_callback and current_time - last_update_time >= 0.5:
+                            progress_callback(written, total_size)
+                            last_update_time = current_time
+        except Exception as e:
+            logger.error(f"范围下载中断: {e}")
+            return False
+
+        if written != total_size:
+            logger.warning(f"片段大小不匹配: 预期 {total_size}, 实际 {written}")
+            return False
+
+        return self._commit_range(partial_path, filepath, progress_callback, total_size)
+
+    def _commit_range(self, partial_path, filepath, progress_callback, total_size):
+        """将已完成的片段追加到目标文件"""
+        try:
+            with open(filepath, 'ab') as dst, open(partial_path, 'rb') as src:
+                while True:
+                    block = src.read(4 * 1024 * 1024)
+                    if not block:
+                        break
+                    dst.write(block)
+            os.remove(partial_path)
+        except Exception as e:
+            logger.error(f"写入片段失败: {e}")
+            return False
+
+        if progress_callback:
+            progress_callback(total_size, total_size)
+        return True
@@ -0,0 +1,167 @@
+import os
+import json
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger('bilibili_core.encoders')
+
+# 各编码格式的候选编码器，按速度从快到慢排列，最后一个为软件编码兜底
+CANDIDATES = {
+    'h264': ['h264_nvenc', 'h264_qsv', 'h264_amf', 'h264_videotoolbox', 'libx264'],
+    'hevc': ['hevc_nvenc', 'hevc_qsv', 'hevc_amf', 'hevc_videotoolbox', 'libx265'],
+    'av1': ['av1_nvenc', 'av1_qsv', 'av1_amf', 'libsvtav1', 'libaom-av1'],
+}
+
+SOFTWARE_ENCODERS = ('libx264', 'libx265', 'libsvtav1', 'libaom-av1')
+
+# 硬件编码器对应的硬件解码方式
+HWACCEL_FOR = {'nvenc': 'cuda', 'qsv': 'qsv', 'videotoolbox': 'videotoolbox'}
+
+
+def encoder_params(encoder, crf=23, preset='medium'):
+    """
+    生成等效画质的编码参数
+    以 libx264 的 crf/preset 为基准，换算到各编码器自己的质量参数
+    """
+    if encoder.endswith('_nvenc'):
+        # -cq 与 crf 数值接近; p4 为中等预设 (p1-p7, p7最慢)
+        return ['-c:v', encoder, '-rc', 'vbr', '-cq', str(crf), '-b:v', '0', '-preset', 'p4']
+    if encoder.endswith('_qsv'):
+        return ['-c:v', encoder, '-global_quality', str(crf), '-preset', preset]
+    if encoder.endswith('_amf'):
+        return ['-c:v', encoder, '-rc', 'cqp', '-qp_i', str(crf), '-qp_p', str(crf), '-quality', 'balanced']
+    if encoder.endswith('_videotoolbox'):
+        # -q:v 取值 1-100，越大画质越好
+        return ['-c:v', encoder, '-q:v', str(max(1, min(100, 100 - crf * 2)))]
+    if encoder == 'libx265':
+        # 同等画质下 x265 的 crf 约比 x264 高 5
+        return ['-c:v', encoder, '-crf', str(crf + 5), '-preset', preset]
+    if encoder == 'libsvtav1':
+        return ['-c:v', encoder, '-crf', str(crf + 10), '-preset', '8']
+    if encoder == 'libaom-av1':
+        return ['-c:v', encoder, '-crf', str(crf + 10), '-b:v', '0', '-cpu-used', '6']
+    return ['-c:v', encoder, '-crf', str(crf), '-preset', preset]
+
+
+class EncoderCapabilities:
+    """
+    负责检测当前ffmpeg实际可用的编码器 (编译进ffmpeg且能完成一次测试编码)
+    结果按ffmpeg文件缓存到磁盘，更换ffmpeg后自动重新检测
+    """
+    def __init__(self, ffmpeg_path, cache_path=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.working = None
+        self.hwaccels = []
+        self.broken = set()  # 本次运行中实际任务失败的编码器
+
+    def _binary_key(self):
+        stat = os.stat(self.ffmpeg_path)
+        return f"{os.path.abspath(self.ffmpeg_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def detect(self):
+        """检测可用编码器 (只执行一次)"""
+        with self.lock:
+            if self.working is not None:
+                return self.working
+
+            key = self._binary_key()
+            cached = self._load_cache()
+            if cached.get('key') == key:
+                self.working = cached.get('working', [])
+                self.hwaccels = cached.get('hwaccels', [])
+                return self.working
+
+            compiled = self._list('-encoders')
+            self.hwaccels = self._list('-hwaccels')
+            self.working = []
+            for candidates in CANDIDATES.values():
+                for encoder in candidates:
+                    if encoder in compiled and self._test_encode(encoder):
+                        self.working.append(encoder)
+            logger.info(f"可用编码器: {', '.join(self.working) or '无'}")
+            self._save_cache({'key': key, 'working': self.working, 'hwaccels': self.hwaccels})
+            return self.working
+
+    def _run(self, args, timeout=20):
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        return subprocess.run([self.ffmpeg_path, '-hide_banner'] + args, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, encoding='utf-8', errors='replace',
+                              timeout=timeout, startupinfo=startupinfo)
+
+    def _list(self, option):
+        """解析 -encoders / -hwaccels 的输出，返回名称集合"""
+        try:
+            output = self._run([option]).stdout
+        except Exception as e:
+            logger.warning(f"ffmpeg {option} 执行失败: {e}")
+            return []
+        names = []
+        for line in output.splitlines():
+            parts = line.split()
+            if option == '-encoders':
+                # " V....D libx264  libx264 H.264 ..."
+                if len(parts) >= 2 and len(parts[0]) == 6 and parts[0].startswith('V'):
+                    names.append(parts[1])
+            elif len(parts) == 1 and not line.endswith(':'):
+                names.append(parts[0])
+        return names
+
+    def _test_encode(self, encoder):
+        """用极短的测试画面实际编码一次，排除编译了但没有对应硬件/驱动的编码器"""
+        args = ['-v', 'error', '-f', 'lavfi', '-i', 'color=black:s=256x256:r=25:d=0.2',
+                '-frames:v', '3'] + encoder_params(encoder) + ['-f', 'null', '-']
+        try:
+            ok = self._run(args).returncode == 0
+        except Exception:
+            ok = False
+        logger.debug(f"测试编码 {encoder}: {'可用' if ok else '不可用'}")
+        return ok
+
+    def select(self, codec='h264', hardware=True):
+        """选择可用的最快编码器，不允许硬件时直接选软件编码器"""
+        working = self.detect()
+        for encoder in CANDIDATES.get(codec, CANDIDATES['h264']):
+            if encoder in self.broken or encoder not in working:
+                continue
+            if not hardware and encoder not in SOFTWARE_ENCODERS:
+                continue
+            return encoder
+        return next(e for e in CANDIDATES.get(codec, CANDIDATES['h264']) if e in SOFTWARE_ENCODERS)
+
+    def hwaccel_for(self, encoder):
+        """与硬件编码器配套的硬件解码方式，不可用时返回 None"""
+        for suffix, hwaccel in HWACCEL_FOR.items():
+            if encoder.endswith(suffix) and hwaccel in self.hwaccels:
+                return hwaccel
+        return None
+
+    def mark_broken(self, encoder):
+        """实际任务失败的硬件编码器在本次运行中不再使用"""
+        if encoder not in SOFTWARE_ENCODERS:
+            logger.warning(f"编码器 {encoder} 执行失败，后续任务改用其他编码器")
+            self.broken.add(encoder)
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_cache(self, data):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"保存编码器检测结果失败: {e}")
@@ -0,0 +1,130 @@
+import os
+import hashlib
+import logging
+import threading
+import subprocess
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger('bilibili_core.filmstrip')
+
+
+class FilmstripGenerator:
+    """
+    负责生成视频缩略图条：一次解码得到均匀分布的N张缩略图，横向拼成一张图片缓存到磁盘
+    缓存按文件身份 (路径、大小、修改时间) 命名，文件未变时各页面直接复用
+    """
+    def __init__(self, ffmpeg_path, probe, cache_dir):
+        """
+        :param ffmpeg_path: ffmpeg路径，为空时使用OpenCV逐个跳转截取
+        :param probe: MediaProbe 实例 (用于获取时长)，可为空
+        :param cache_dir: 缩略图条缓存目录
+        """
+        self.ffmpeg_path = ffmpeg_path
+        self.probe = probe
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.pending = {}  # 正在生成的缓存路径 -> Event，避免多个页面重复生成同一个文件
+
+    def cache_path(self, video_path, count, height):
+        stat = os.stat(video_path)
+        key = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}|{count}|{height}"
+        return os.path.join(self.cache_dir, hashlib.md5(key.encode('utf-8')).hexdigest() + '.jpg')
+
+    def get(self, video_path, count=12, height=72):
+        """
+        获取缩略图条，不存在时生成
+        :return: 图片路径 (count 张高为 height 的缩略图从左到右排列)，失败返回 None
+        """
+        try:
+            path = self.cache_path(video_path, count, height)
+        except OSError:
+            return None
+        if os.path.exists(path):
+            return path
+
+        with self.lock:
+            event = self.pending.get(path)
+            owner = event is None
+            if owner:
+                event = self.pending[path] = threading.Event()
+        if not owner:
+            event.wait()
+            return path if os.path.exists(path) else None
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path[:-4] + '.tmp.jpg'
+            ok = self._generate_ffmpeg(video_path, tmp_path, count, height) if self.ffmpeg_path else False
+            if not ok:
+                ok = self._generate_cv2(video_path, tmp_path, count, height)
+            if not ok:
+                logger.warning(f"生成缩略图失败: {video_path}")
+                return None
+            os.replace(tmp_path, path)
+            return path
+        finally:
+            with self.lock:
+                self.pending.pop(path, None)
+            event.set()
+
+    def _duration(self, video_path):
+        info = self.probe.probe(video_path) if self.probe else None
+        return info.duration if info else 0
+
+    def _generate_ffmpeg(self, video_path, output_path, count, height):
+        """
+        只解码关键帧 (-skip_frame nokey)，由 fps 滤镜均匀取 count 帧，tile 滤镜拼成一行
+        关键帧间隔大于取样间隔时相邻缩略图会重复，但不需要解码整个视频
+        """
+        duration = self._duration(video_path)
+        if duration <= 0:
+            return False
+        vf = f"fps={count}/{duration:.3f},scale=-2:{height},tile={count}x1"
+        cmd = [self.ffmpeg_path, '-v', 'error', '-skip_frame', 'nokey', '-i', video_path,
+               '-an', '-vf', vf, '-frames:v', '1', '-q:v', '4', '-y', output_path]
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        try:
+            p = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, encoding='utf-8',
+                               errors='replace', timeout=120, startupinfo=startupinfo)
+        except Exception as e:
+            logger.warning(f"ffmpeg生成缩略图失败: {e}")
+            return False
+        if p.returncode != 0:
+            logger.warning(f"ffmpeg生成缩略图失败: {p.stderr.strip()[-200:]}")
+            return False
+        return os.path.exists(output_path)
+
+    def _generate_cv2(self, video_path, output_path, count, height):
+        """没有ffmpeg时用OpenCV逐个跳转截取"""
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return False
+        try:
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if total <= 0:
+                return False
+            tiles = []
+            for i in range(count):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(total * (i + 0.5) / count))
+                ok, frame = cap.read()
+                if not ok:
+                    if not tiles:
+                        return False
+                    frame = None
+                if frame is not None:
+                    h, w = frame.shape[:2]
+                    width = max(2, int(round(w * height / h / 2)) * 2)
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                tiles.append(frame)
+            # 读取失败的位置用前一张补齐
+            for i, tile in enumerate(tiles):
+                if tile is None:
+                    tiles[i] = tiles[i - 1]
+            return cv2.imwrite(output_path, np.hstack(tiles))
+        finally:
+            cap.release()
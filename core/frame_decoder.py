@@ -0,0 +1,231 @@
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+
+import cv2
+
+logger = logging.getLogger('bilibili_core.frame_decoder')
+
+
+class FrameCache:
+    """
+    负责缓存已解码的帧 (LRU)，按占用内存而不是帧数限制容量
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, index):
+        with self.lock:
+            frame = self.frames.get(index)
+            if frame is not None:
+                self.frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame):
+        with self.lock:
+            old = self.frames.pop(index, None)
+            if old is not None:
+                self.size -= old.nbytes
+            self.frames[index] = frame
+            self.size += frame.nbytes
+            # 至少保留刚放入的一帧
+            while self.size > self.max_bytes and len(self.frames) > 1:
+                _, evicted = self.frames.popitem(last=False)
+                self.size -= evicted.nbytes
+
+    def __contains__(self, index):
+        with self.lock:
+            return index in self.frames
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+
+
+class FrameDecoder:
+    """
+    负责在后台线程中按帧号解码视频：
+    利用关键帧索引决定是顺序读取还是跳转，解码过的帧放入LRU缓存，
+    空闲时沿拖动方向预读，新的请求会让尚未完成的旧请求作废
+    """
+    def __init__(self, video_path, frame_callback, probe=None, fps=None, cache_mb=256,
+                 read_ahead=8, max_forward=None):
+        """
+        :param frame_callback: 解码完成回调 (frame_index, rgb_frame)，在解码线程中调用
+        :param probe: MediaProbe 实例，用于在解码线程中建立关键帧索引；为空时每次都交给OpenCV跳转
+        :param cache_mb: 解码帧缓存上限(MB)
+        :param read_ahead: 空闲时沿拖动方向预读的帧数
+        :param max_forward: 目标在当前位置之后多少帧以内时顺序读取而不跳转，默认为 2 x read_ahead
+        """
+        self.video_path = video_path
+        self.frame_callback = frame_callback
+        self.cache = FrameCache(cache_mb * 1024 * 1024)
+        self.read_ahead = read_ahead
+        self.max_forward = max_forward or read_ahead * 2
+
+        self.cap = None
+        self.fps = fps or 30
+        self.total_frames = 0
+        self.keyframes = []
+        self.probe = probe
+        self.position = 0  # 下一次 read() 返回的帧号
+
+        self.condition = threading.Condition()
+        self.target = None
+        self.generation = 0  # 每次新请求递增，用于判断正在进行的解码是否已过期
+        self.direction = 1
+        self.last_request = None
+        self.running = False
+        self.thread = None
+
+    def open(self):
+        """打开视频并启动解码线程，失败返回 False"""
+        self.cap = cv2.VideoCapture(self.video_path)
+        if not self.cap.isOpened():
+            self.cap = None
+            return False
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if fps > 0:
+            self.fps = fps
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        if self.probe:
+            threading.Thread(target=self._load_keyframes, daemon=True).start()
+        return True
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.generation += 1
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2)
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self.cache.clear()
+
+    def request(self, frame_index):
+        """请求显示某一帧 (只保留最新的请求)"""
+        frame_index = max(0, min(frame_index, self.total_frames - 1))
+        if self.total_frames <= 0:
+            return
+        cached = self.cache.get(frame_index)
+        with self.condition:
+            if self.last_request is not None and frame_index != self.last_request:
+                self.direction = 1 if frame_index > self.last_request else -1
+            self.last_request = frame_index
+            self.generation += 1
+            self.target = None if cached is not None else frame_index
+            self.condition.notify_all()
+        if cached is not None:
+            self.frame_callback(frame_index, cached)
+
+    def get_cached(self, frame_index):
+        return self.cache.get(frame_index)
+
+    def _stale(self, generation):
+        return not self.running or self.generation != generation
+
+    def _keyframe_before(self, frame_index):
+        pos = bisect.bisect_right(self.keyframes, frame_index)
+        return self.keyframes[pos - 1] if pos else 0
+
+    def _needs_seek(self, frame_index):
+        """目标在当前位置之后且中间没有关键帧 (同一GOP内) 或距离很近时顺序读取更快"""
+        if frame_index < self.position:
+            return True
+        if frame_index - self.position <= self.max_forward:
+            return False
+        if not self.keyframes:
+            return True
+        return self._keyframe_before(frame_index) > self.position
+
+    def _decode_to(self, frame_index, generation):
+        """
+        解码到指定帧，途经的帧都放入缓存
+        :return: 目标帧，被新请求打断或读取失败时返回 None
+        """
+        if self._needs_seek(frame_index):
+            # 有关键帧索引时从所在GOP的关键帧开始，中间各帧一并缓存，往回拖动时可直接命中
+            start = self._keyframe_before(frame_index) if self.keyframes else frame_index
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self.position = start
+
+        while self.position <= frame_index:
+            if self._stale(generation):
+                return None
+            index = self.position
+            cached = self.cache.get(index)
+            if cached is not None and index < frame_index:
+                # 已缓存的帧仍需读取以推进解码位置，但不必再做颜色转换
+                if not self.cap.grab():
+                    return None
+                self.position += 1
+                continue
+            ok, frame = self.cap.read()
+            if not ok:
+                return None
+            self.position += 1
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            self.cache.put(index, frame)
+            if index == frame_index:
+                return frame
+        return self.cache.get(frame_index)
+
+    def _read_ahead(self, generation):
+        """空闲时沿拖动方向预读，有新请求立即停止"""
+        anchor = self.last_request
+        if anchor is None:
+            return
+        if self.direction > 0:
+            indices = range(anchor + 1, min(anchor + 1 + self.read_ahead, self.total_frames))
+        else:
+            indices = range(anchor - 1, max(anchor - 1 - self.read_ahead, -1), -1)
+        for index in indices:
+            if self._stale(generation):
+                return
+            if index in self.cache:
+                continue
+            if self._decode_to(index, generation) is None:
+                return
+
+    def _load_keyframes(self):
+        """建立关键帧索引 (帧号)，索引完成前的请求直接交给OpenCV跳转"""
+        try:
+            times = self.probe.keyframes(self.video_path)
+        except Exception as e:
+            logger.warning(f"获取关键帧索引失败: {e}")
+            return
+        self.keyframes = sorted({int(round(t * self.fps)) for t in times})
+        logger.debug(f"关键帧索引: {len(self.keyframes)} 个关键帧")
+
+    def _run(self):
+        prefetched = -1
+        while True:
+            with self.condition:
+                while self.running and self.target is None and prefetched == self.generation:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                target, generation = self.target, self.generation
+                self.target = None
+
+            try:
+                if target is not None:
+                    frame = self._decode_to(target, generation)
+                    if frame is not None and not self._stale(generation):
+                        self.frame_callback(target, frame)
+                if not self._stale(generation):
+                    self._read_ahead(generation)
+            except Exception as e:
+                logger.error(f"解码帧失败: {e}")
+            prefetched = generation
@@ -0,0 +1,252 @@
+import os
+import re
+import queue
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger('bilibili_core.frame_export')
+
+EXPORT_MODES = ('interval', 'timestamps', 'scene')
+
+
+class FrameExporter:
+    """
+    负责批量导出视频帧：ffmpeg只解码一次，按条件选出的帧以 rawvideo 写入管道，
+    直接读入预先分配的NumPy缓冲区，图片编码和写盘交给线程池完成
+    """
+    showinfo_pattern = re.compile(r'Parsed_showinfo.*?\bn:\s*(\d+).*?pts_time:\s*([-\d.]+)')
+
+    def __init__(self, ffmpeg_path, probe=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.probe = probe
+
+    def _select_filter(self, mode, interval, timestamps, scene_threshold, fps):
+        if mode == 'interval':
+            return f"select='not(mod(n\\,{interval}))'"
+        if mode == 'timestamps':
+            # 每个时间点取落在 [t, t + 一帧) 内的那一帧
+            frame = 1.0 / fps if fps else 0.04
+            terms = '+'.join(f"between(t\\,{t:.3f}\\,{t + frame * 0.999:.3f})" for t in timestamps)
+            return f"select='{terms}'"
+        return f"select='gt(scene\\,{scene_threshold})'"
+
+    def export(self, input_path, output_dir, mode='interval', interval=30, timestamps=None,
+               scene_threshold=0.3, image_format='jpg', quality=95, max_workers=None,
+               progress_callback=None, stop_event=None):
+        """
+        :param mode: interval 每 interval 帧一张 / timestamps 指定时间点(秒) / scene 场景变化处
+        :param scene_threshold: 场景变化阈值 (0-1)，越小导出越多
+        :param image_format: jpg / png / bmp
+        :return: 成功/失败, 导出数量说明/错误信息
+        """
+        if mode not in EXPORT_MODES:
+            return False, f"未知的导出方式: {mode}"
+        if mode == 'timestamps':
+            timestamps = sorted(t for t in (timestamps or []) if t >= 0)
+            if not timestamps:
+                return False, "没有指定导出的时间点"
+        if mode == 'interval' and interval < 1:
+            return False, "间隔帧数必须大于0"
+
+        info = self.probe.probe(input_path) if self.probe else None
+        os.makedirs(output_dir, exist_ok=True)
+        workers = max_workers or min(8, os.cpu_count() or 1)
+
+        if self.ffmpeg_path and info and info.width and info.height:
+            count = self._export_pipe(input_path, output_dir, info, mode, interval, timestamps,
+                                      scene_threshold, image_format, quality, workers,
+                                      progress_callback, stop_event)
+        elif mode == 'scene':
+            return False, "场景检测需要ffmpeg"
+        else:
+            count = self._export_cv2(input_path, output_dir, mode, interval, timestamps,
+                                     image_format, quality, workers, progress_callback, stop_event)
+
+        if stop_event and stop_event.is_set():
+            return False, "已取消"
+        if count is None:
+            return False, "导出失败"
+        if progress_callback:
+            progress_callback(100, 100)
+        logger.info(f"已导出 {count} 帧到 {output_dir}")
+        return True, f"已导出 {count} 帧到 {output_dir}"
+
+    def _encode_params(self, image_format, quality):
+        if image_format == 'jpg':
+            return [cv2.IMWRITE_JPEG_QUALITY, quality]
+        if image_format == 'png':
+            # 压缩级别越高越慢，批量导出时取较快的级别
+            return [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        return []
+
+    def _frame_name(self, output_dir, seq, seconds, image_format):
+        """seconds 为 None (时间未知) 时文件名中不带时间"""
+        if seconds is None:
+            return os.path.join(output_dir, f"frame_{seq:05d}.{image_format}")
+        return os.path.join(output_dir, f"frame_{seq:05d}_{seconds:09.3f}s.{image_format}")
+
+    def _export_pipe(self, input_path, output_dir, info, mode, interval, timestamps, scene_threshold,
+                     image_format, quality, workers, progress_callback, stop_event):
+        # ffmpeg默认按旋转信息自动旋转画面，竖拍视频输出帧的宽高与容器中记录的相反
+        width, height = info.display_size
+        frame_size = width * height * 3
+        vf = self._select_filter(mode, interval, timestamps, scene_threshold, info.fps) + ',showinfo'
+        cmd = [self.ffmpeg_path, '-hide_banner', '-i', input_path, '-an', '-vf', vf, '-vsync', 'vfr',
+               '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+        if mode == 'timestamps':
+            # 从第一个时间点附近开始解码
+            cmd[2:2] = ['-ss', str(max(0.0, timestamps[0] - 1))]
+            cmd.insert(cmd.index('-vf'), '-copyts')
+
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        try:
+            process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, bufsize=frame_size, startupinfo=startupinfo)
+        except Exception as e:
+            logger.error(f"ffmpeg启动失败: {e}")
+            return None
+
+        # showinfo 在 stderr 中给出每个输出帧的时间戳，用于命名
+        times = []
+        times_ready = threading.Condition()
+        log_tail = []
+
+        def read_log():
+            for raw in process.stderr:
+                line = raw.decode('utf-8', errors='replace')
+                match = self.showinfo_pattern.search(line)
+                if match:
+                    with times_ready:
+                        times.append(float(match.group(2)))
+                        times_ready.notify_all()
+                else:
+                    log_tail.append(line.rstrip())
+                    del log_tail[:-20]
+            with times_ready:
+                times.append(None)  # 结束标记
+                times_ready.notify_all()
+
+        log_thread = threading.Thread(target=read_log, daemon=True)
+        log_thread.start()
+
+        def frame_time(seq):
+            """第 seq 个输出帧的时间；showinfo 没有给出时按导出方式推算，场景模式无法推算时返回 None"""
+            with times_ready:
+                times_ready.wait_for(lambda: len(times) > seq or (times and times[-1] is None), timeout=2)
+                value = times[seq] if len(times) > seq else None
+            if value is not None:
+                return value
+            if mode == 'interval':
+                return seq * interval / (info.fps or 25)
+            if mode == 'timestamps' and seq < len(timestamps):
+                return timestamps[seq]
+            return None
+
+        # 缓冲区数量限定为线程数的2倍：编码跟不上时读取自然阻塞，内存占用固定
+        free_buffers = queue.Queue()
+        for _ in range(workers * 2):
+            free_buffers.put(np.empty((height, width, 3), dtype=np.uint8))
+        params = self._encode_params(image_format, quality)
+        failed = []
+
+        def write_frame(buffer, path):
+            try:
+                if not cv2.imwrite(path, buffer, params):
+                    failed.append(path)
+            except Exception as e:
+                logger.error(f"保存帧失败: {path}: {e}")
+                failed.append(path)
+            finally:
+                free_buffers.put(buffer)
+
+        count = 0
+        duration = info.duration
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                if stop_event and stop_event.is_set():
+                    process.kill()
+                    break
+                buffer = free_buffers.get()
+                view = memoryview(buffer).cast('B')
+                filled = 0
+                while filled < frame_size:
+                    n = process.stdout.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+                if filled < frame_size:
+                    free_buffers.put(buffer)
+                    break
+
+                seconds = frame_time(count)
+                executor.submit(write_frame, buffer, self._frame_name(output_dir, count, seconds, image_format))
+                count += 1
+                if progress_callback and duration and seconds is not None:
+                    progress_callback(min(int(seconds * 100 / duration), 99), 100)
+
+        process.stdout.close()
+        process.wait()
+        log_thread.join(timeout=5)
+        if stop_event and stop_event.is_set():
+            return count
+        if process.returncode != 0:
+            logger.error(f"ffmpeg导出帧失败，返回码: {process.returncode}")
+            logger.error("FFmpeg最后输出:\n" + "\n".join(log_tail))
+            return None
+        if failed:
+            logger.warning(f"{len(failed)} 帧保存失败")
+        return count - len(failed)
+
+    def _export_cv2(self, input_path, output_dir, mode, interval, timestamps, image_format, quality,
+                    workers, progress_callback, stop_event):
+        """没有ffmpeg时用OpenCV顺序读取：跳过的帧只 grab 不解码为图像"""
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if mode == 'interval':
+            wanted = set(range(0, total, interval))
+        else:
+            wanted = {int(t * fps) for t in timestamps}
+        last = max(wanted) if wanted else -1
+        params = self._encode_params(image_format, quality)
+        # 限制已解码未写盘的帧数，避免编码跟不上时帧堆积在内存中
+        slots = threading.BoundedSemaphore(workers * 2)
+
+        def write_frame(path, frame):
+            try:
+                cv2.imwrite(path, frame, params)
+            finally:
+                slots.release()
+
+        count = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for index in range(last + 1):
+                    if stop_event and stop_event.is_set():
+                        break
+                    if not cap.grab():
+                        break
+                    if index not in wanted:
+                        continue
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        continue
+                    path = self._frame_name(output_dir, count, index / fps, image_format)
+                    slots.acquire()
+                    executor.submit(write_frame, path, frame)
+                    count += 1
+                    if progress_callback and last > 0:
+                        progress_callback(min(int(index * 100 / last), 99), 100)
+        finally:
+            cap.release()
+        return count
@@ -0,0 +1,177 @@
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+import subprocess
+from collections import deque
+
+logger = logging.getLogger('bilibili_core.jobs')
+
+
+class FFmpegJob:
+    """
+    负责执行单个ffmpeg任务：解析 -progress 输出、支持取消和超时、保留本任务的日志
+    """
+    duration_pattern = re.compile(r'Duration: (\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)')
+
+    def __init__(self, cmd, progress_callback=None, stop_event=None, timeout=None,
+                 duration=None, stats_callback=None, log_dir=None, log_lines=200):
+        """
+        :param cmd: ffmpeg命令列表 (第一个元素为ffmpeg路径)
+        :param progress_callback: 进度回调 (current, total)，total 固定为100
+        :param stop_event: 置位后终止ffmpeg进程
+        :param timeout: 无输出超时(秒)，ffmpeg 超过该时间没有输出任何进度/日志时终止，None/0 表示不限制
+        :param duration: 输出时长(秒)，为空时从ffmpeg输出的输入时长推断
+        :param stats_callback: 统计回调，参数为 stats 字典 (fps/speed/bitrate/out_time/out_time_us/eta)
+        :param log_dir: 失败时将完整日志写入该目录
+        """
+        self.id = uuid.uuid4().hex[:8]
+        self.cmd = [cmd[0], '-nostats', '-progress', 'pipe:1'] + list(cmd[1:])
+        self.progress_callback = progress_callback
+        self.stop_event = stop_event
+        self.timeout = timeout
+        self.duration = duration
+        self.stats_callback = stats_callback
+        self.log_dir = log_dir
+        self.log = deque(maxlen=log_lines)
+        self.stats = {}
+        self.returncode = None
+        self.cancelled = False
+        self.timed_out = False
+        self.log_path = None
+        self.last_activity = None
+
+    @property
+    def success(self):
+        return self.returncode == 0 and not self.cancelled and not self.timed_out
+
+    def run(self):
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        try:
+            process = subprocess.Popen(
+                self.cmd, shell=False, stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                universal_newlines=True, bufsize=1, encoding='utf-8', errors='replace',
+                startupinfo=startupinfo
+            )
+        except Exception as e:
+            logger.error(f"[{self.id}] ffmpeg启动失败: {e}")
+            self.log.append(str(e))
+            return False
+
+        readers = [
+            threading.Thread(target=self._read_progress, args=(process.stdout,), daemon=True),
+            threading.Thread(target=self._read_log, args=(process.stderr,), daemon=True)
+        ]
+        for t in readers:
+            t.start()
+
+        self.last_activity = time.time()
+        while process.poll() is None:
+            if self.stop_event and self.stop_event.is_set():
+                logger.info(f"[{self.id}] 任务已取消")
+                self.cancelled = True
+                self._terminate(process)
+                break
+            if self.timeout and time.time() - self.last_activity > self.timeout:
+                logger.error(f"[{self.id}] 任务超时 ({self.timeout} 秒无输出)")
+                self.timed_out = True
+                self._terminate(process)
+                break
+            time.sleep(0.2)
+
+        process.wait()
+        for t in readers:
+            t.join(timeout=5)
+        self.returncode = process.returncode
+
+        if self.success:
+            if self.progress_callback:
+                self.progress_callback(100, 100)
+        elif not self.cancelled:
+            logger.error(f"[{self.id}] ffmpeg执行失败，返回码: {process.returncode}")
+            logger.error("FFmpeg最后输出:\n" + "\n".join(list(self.log)[-20:]))
+            self._save_log()
+        return self.success
+
+    def _terminate(self, process):
+        """先请求ffmpeg正常退出，超时后强制结束"""
+        try:
+            process.terminate()
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        except Exception:
+            pass
+
+    def _read_log(self, stream):
+        for line in stream:
+            self.last_activity = time.time()
+            line = line.rstrip()
+            self.log.append(line)
+            if not self.duration:
+                match = self.duration_pattern.search(line)
+                if match:
+                    h, m, s = int(match.group(1)), int(match.group(2)), float(match.group(3))
+                    self.duration = h * 3600 + m * 60 + s
+
+    def _read_progress(self, stream):
+        block = {}
+        for line in stream:
+            self.last_activity = time.time()
+            key, _, value = line.strip().partition('=')
+            if not key:
+                continue
+            block[key] = value
+            if key == 'progress':
+                self._update_stats(block)
+                block = {}
+
+    def _update_stats(self, block):
+        out_time_us = block.get('out_time_us') or block.get('out_time_ms')
+        try:
+            out_time_us = int(out_time_us) if out_time_us not in (None, 'N/A') else 0
+        except ValueError:
+            out_time_us = 0
+        out_time = out_time_us / 1_000_000
+        try:
+            speed = float(block.get('speed', '0').rstrip('x') or 0)
+        except ValueError:
+            speed = 0
+        try:
+            fps = float(block.get('fps', 0))
+        except ValueError:
+            fps = 0
+
+        eta = None
+        if self.duration and speed > 0:
+            eta = max(0.0, (self.duration - out_time) / speed)
+        self.stats = {
+            'frame': block.get('frame'), 'fps': fps, 'speed': speed,
+            'bitrate': block.get('bitrate'), 'out_time': out_time, 'out_time_us': out_time_us, 'eta': eta,
+            'done': block.get('progress') == 'end'
+        }
+
+        if self.stats_callback:
+            self.stats_callback(dict(self.stats))
+        if self.progress_callback and self.duration:
+            self.progress_callback(min(int(out_time * 100 / self.duration), 99), 100)
+
+    def _save_log(self):
+        if not self.log_dir:
+            return
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self.log_path = os.path.join(self.log_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{self.id}.log")
+            with open(self.log_path, 'w', encoding='utf-8') as f:
+                f.write(' '.join(self.cmd) + '\n\n')
+                f.write('\n'.join(self.log))
+            logger.info(f"[{self.id}] 完整日志已保存: {self.log_path}")
+        except Exception as e:
+            logger.warning(f"保存ffmpeg日志失败: {e}")
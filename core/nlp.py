@@ -0,0 +1,270 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from .config import ConfigManager
+
+logger = logging.getLogger('bilibili_core.nlp')
+
+EMOJI_PATTERN = re.compile(r'\[(.*?)\]')
+SENTIMENT_CLEAN_PATTERN = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9]')
+
+# 工作进程中加载的模型
+_jieba = None
+_idf = None
+_SnowNLP = None
+
+
+def _init_worker():
+    """每个工作进程启动时加载一次分词词典、IDF表和情感模型"""
+    global _jieba, _idf, _SnowNLP
+    import jieba
+    import jieba.analyse
+    from snownlp import SnowNLP
+    jieba.setLogLevel(logging.WARNING)
+    jieba.initialize()
+    tfidf = jieba.analyse.default_tfidf
+    _jieba = jieba
+    _idf = (tfidf.idf_freq, tfidf.median_idf)
+    _SnowNLP = SnowNLP
+    # 触发情感模型的加载
+    SnowNLP('预热').sentiments
+
+
+def _ready():
+    return os.getpid()
+
+
+def _analyze_batch(texts):
+    """
+    分析一批文本，每条只分词一次
+    :return: [(tokens, sentiment, emojis)]，文本过短无法判断情感时 sentiment 为 None
+    """
+    if _jieba is None:
+        _init_worker()
+    results = []
+    for text in texts:
+        tokens = tuple(w for w in (t.strip() for t in _jieba.cut(text)) if w)
+        sentiment = None
+        clean = SENTIMENT_CLEAN_PATTERN.sub('', text)
+        if len(clean) > 1:
+            try:
+                sentiment = _SnowNLP(clean).sentiments
+            except Exception:
+                pass
+        results.append((tokens, sentiment, tuple(EMOJI_PATTERN.findall(text))))
+    return results
+
+
+def _score_keywords(term_counts, top_k):
+    """按 TF-IDF 给词频表打分 (与 jieba.analyse.extract_tags 的算法一致，但复用已有的分词结果)"""
+    if _jieba is None:
+        _init_worker()
+    idf_freq, median_idf = _idf
+    total = sum(term_counts.values()) or 1
+    weights = {w: c * idf_freq.get(w, median_idf) / total for w, c in term_counts.items()}
+    return sorted(weights.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+
+class NLPEngine:
+    """
+    负责评论的分词、情感分析、关键词和表情统计：
+    计算在常驻进程池中进行 (模型在每个工作进程中只加载一次)，不占用界面进程的GIL；
+    每条文本的结果按内容摘要缓存，重复分析同一批评论时不再计算
+    """
+    def __init__(self, max_workers=None, batch_size=200, memo_size=200000):
+        workers = max_workers or ConfigManager().get('nlp_workers', 0) or 0
+        if workers <= 0:
+            workers = max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.max_workers = workers
+        self.batch_size = batch_size
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.memo_lock = threading.Lock()
+        self.pool_lock = threading.Lock()
+        self.pool = None
+        self.in_process = False  # 进程池不可用时在当前进程中计算
+
+    def _get_pool(self):
+        with self.pool_lock:
+            if self.pool is None and not self.in_process:
+                try:
+                    self.pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+                except Exception as e:
+                    logger.warning(f"无法创建NLP进程池，改为在当前进程中计算: {e}")
+                    self.in_process = True
+            return self.pool
+
+    def _disable_pool(self, error):
+        logger.warning(f"NLP进程池不可用，改为在当前进程中计算: {error}")
+        with self.pool_lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+            self.in_process = True
+
+    def warm_up(self):
+        """提前启动全部工作进程并加载模型，不等待完成"""
+        pool = self._get_pool()
+        if pool is None:
+            return
+        try:
+            for _ in range(self.max_workers):
+                pool.submit(_ready)
+        except Exception as e:
+            self._disable_pool(e)
+
+    def _call(self, func, *args):
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                return pool.submit(func, *args).result()
+            except BrokenProcessPool as e:
+                self._disable_pool(e)
+        return func(*args)
+
+    @staticmethod
+    def _key(text):
+        return hashlib.md5(text.encode('utf-8')).digest()
+
+    def analyze(self, texts, progress_callback=None, stop_event=None):
+        """
+        :return: 与 texts 一一对应的 (tokens, sentiment, emojis)，被取消时返回 None
+        """
+        keys = [self._key(t) for t in texts]
+        results = [None] * len(texts)
+        pending = {}
+        with self.memo_lock:
+            for i, key in enumerate(keys):
+                cached = self.memo.get(key)
+                if cached is not None:
+                    self.memo.move_to_end(key)
+                    results[i] = cached
+                else:
+                    pending.setdefault(key, []).append(i)
+
+        todo = [texts[indexes[0]] for indexes in pending.values()]
+        todo_keys = list(pending)
+        batches = [(start, todo[start:start + self.batch_size]) for start in range(0, len(todo), self.batch_size)]
+        done = len(texts) - len(todo)
+        if progress_callback:
+            progress_callback(done, len(texts))
+
+        def store(start, batch_results):
+            nonlocal done
+            with self.memo_lock:
+                for offset, result in enumerate(batch_results):
+                    key = todo_keys[start + offset]
+                    for i in pending[key]:
+                        results[i] = result
+                    self.memo[key] = result
+                while len(self.memo) > self.memo_size:
+                    self.memo.popitem(last=False)
+            done += len(batch_results)
+            if progress_callback:
+                progress_callback(done, len(texts))
+
+        pool = self._get_pool() if batches else None
+        if pool is not None:
+            try:
+                futures = {pool.submit(_analyze_batch, batch): start for start, batch in batches}
+                for future in as_completed(futures):
+                    if stop_event and stop_event.is_set():
+                        for f in futures:
+                            f.cancel()
+                        return None
+                    store(futures[future], future.result())
+                return results
+            except BrokenProcessPool as e:
+                self._disable_pool(e)
+                batches = [(start, batch) for start, batch in batches if results[pending[todo_keys[start]][0]] is None]
+
+        for start, batch in batches:
+            if stop_event and stop_event.is_set():
+                return None
+            store(start, _analyze_batch(batch))
+        return results
+
+    def keywords(self, term_counts, top_k=20, stop_words=()):
+        """
+        :param term_counts: 词 -> 出现次数
+        :return: [(词, 权重)]，已去除停用词、单字和纯数字
+        """
+        counts = {w: c for w, c in term_counts.items()
+                  if len(w) > 1 and not w.isdigit() and w.lower() not in stop_words}
+        if not counts:
+            return []
+        return [(w, weight) for w, weight in self._call(_score_keywords, counts, top_k)]
+
+    @staticmethod
+    def new_state():
+        """可累加的汇总状态，保存后下次只需分析新增的评论"""
+        return {'sentiment_sum': 0.0, 'sentiment_count': 0, 'word_freq': {}, 'emojis': []}
+
+    def accumulate(self, state, texts, progress_callback=None, stop_event=None):
+        """
+        分析新增的评论并累加到 state 上
+        :return: 新的汇总状态，被取消时返回 None
+        """
+        results = self.analyze(texts, progress_callback, stop_event)
+        if results is None:
+            return None
+        word_freq = Counter(state['word_freq'])
+        emojis = list(state['emojis'])
+        total, count = state['sentiment_sum'], state['sentiment_count']
+        for tokens, sentiment, found in results:
+            word_freq.update(tokens)
+            emojis.extend(found)
+            if sentiment is not None:
+                total += sentiment
+                count += 1
+        return {'sentiment_sum': total, 'sentiment_count': count, 'word_freq': dict(word_freq), 'emojis': emojis}
+
+    def finish(self, state, stop_words=()):
+        """
+        由汇总状态得出分析结果
+        :return: {'sentiment_score', 'keywords', 'emojis', 'word_freq'}
+        word_freq 为全部评论的词频，供词云直接使用
+        """
+        word_freq = state['word_freq']
+        count = state['sentiment_count']
+        return {
+            'sentiment_score': state['sentiment_sum'] / count if count else 0.5,
+            'keywords': self.keywords(word_freq, 20, stop_words) if word_freq else [],
+            'emojis': state['emojis'],
+            'word_freq': word_freq,
+        }
+
+    def summarize(self, texts, stop_words=(), progress_callback=None, stop_event=None):
+        """
+        分析一组评论
+        :return: 同 finish，被取消时返回 None
+        """
+        state = self.accumulate(self.new_state(), texts, progress_callback, stop_event)
+        if state is None:
+            return None
+        return self.finish(state, stop_words)
+
+    def shutdown(self):
+        with self.pool_lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """全局共享的NLP引擎，进程池在多次分析之间保持运行"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = NLPEngine()
+        return _engine
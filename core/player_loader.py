@@ -123,6 +123,12 @@ def run_player(url, title="Bilibili Player", cookies_json=None):
         except Exception as e:
             print(f"Failed to inject fullscreen script: {e}")
 
+    # 边下边播: 本地预览服务的地址直接打开，无需登录态和网页全屏
+    if url.startswith("http://127.0.0.1"):
+        window = webview.create_window(title, url, width=1280, height=720)
+        webview.start()
+        return
+
     # Create a window
     # Start with bilibili homepage to allow cookie setting
     window = webview.create_window(title, "https://www.bilibili.com/", width=1280, height=720)
@@ -0,0 +1,99 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger('bilibili_core.prefetch')
+
+
+def get_url_deadline(url):
+    """从B站CDN地址中解析 deadline (Unix时间戳)，没有则返回 None"""
+    if not url:
+        return None
+    try:
+        values = parse_qs(urlparse(url).query).get('deadline')
+        return int(values[0]) if values else None
+    except (ValueError, TypeError):
+        return None
+
+
+def get_info_deadline(download_info):
+    """取下载信息中所有地址里最早的 deadline"""
+    urls = [download_info.get('video_url'), download_info.get('audio_url')]
+    urls.extend(seg.get('url') for seg in download_info.get('segments', []))
+    deadlines = [d for d in (get_url_deadline(u) for u in urls if u) if d]
+    return min(deadlines) if deadlines else None
+
+
+class PlayurlPrefetcher:
+    """
+    负责在当前任务下载时，后台预先解析队列中后续视频的下载地址
+    """
+    def __init__(self, api, max_workers=1, min_lifetime=600):
+        """
+        :param api: BilibiliAPI 实例
+        :param max_workers: 并发解析数 (受接口频率限制，通常为1即可)
+        :param min_lifetime: 地址剩余有效期低于该值(秒)时视为过期，不再使用
+        """
+        self.api = api
+        self.min_lifetime = min_lifetime
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.pending = {}  # (bvid, options) -> Future
+
+    def prefetch(self, bvids, **options):
+        """提交后台解析任务，options 与 get_video_download_url 的参数一致"""
+        key_options = tuple(sorted(options.items()))
+        with self.lock:
+            for bvid in bvids:
+                key = (bvid, key_options)
+                if not bvid or key in self.pending:
+                    continue
+                logger.info(f"预取下载地址: {bvid}")
+                self.pending[key] = self.executor.submit(self._resolve, bvid, options)
+
+    def _resolve(self, bvid, options):
+        try:
+            return self.api.get_video_download_url(bvid, **options), time.time()
+        except Exception as e:
+            logger.warning(f"预取 {bvid} 失败: {e}")
+            return None, time.time()
+
+    def take(self, bvid, timeout=None, **options):
+        """
+        取出预取结果
+        :param timeout: 解析仍在进行时的最长等待时间，None 表示一直等待
+        :return: 下载信息，未预取/失败/即将过期时返回 None
+        """
+        key = (bvid, tuple(sorted(options.items())))
+        with self.lock:
+            future = self.pending.pop(key, None)
+        if future is None:
+            return None
+
+        try:
+            info, resolved_at = future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            return None
+        if not info:
+            return None
+
+        deadline = get_info_deadline(info)
+        if deadline and deadline - time.time() < self.min_lifetime:
+            logger.info(f"{bvid} 的预取地址即将过期，重新解析")
+            return None
+        logger.info(f"使用预取的下载地址: {bvid} (解析于 {time.time() - resolved_at:.0f} 秒前)")
+        return info
+
+    def clear(self):
+        """取消所有未开始的预取任务"""
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,519 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import select
+import socket
+import logging
+import tempfile
+import threading
+import subprocess
+import mimetypes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('bilibili_core.preview')
+
+# 下载完成后，实时封装的预览文件继续保留的时间 (秒)，播放器在此期间仍可拖动进度
+PREVIEW_LINGER = 300
+CHUNK_SIZE = 256 * 1024
+
+
+class _PreviewEntry:
+    def __init__(self, path, expected_size=None, sized=True):
+        self.path = path
+        self.expected_size = expected_size
+        # False 表示实时封装的输出，完成前无法得知最终大小
+        self.sized = sized
+        self.complete = threading.Event()
+        self.aborted = False
+        self.released = False
+        self.delete_on_release = False
+        self.linger = 0
+        self.clients = 0
+        self.last_access = time.time()
+
+    def available(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def final_size(self):
+        """最终大小：已知预期大小或已完成时返回，否则返回 None"""
+        if self.sized and self.expected_size:
+            return self.expected_size
+        if self.complete.is_set():
+            return self.available()
+        return None
+
+
+class _RemuxJob:
+    """
+    负责把下载中的音视频流实时封装为分片MP4文件：
+    ffmpeg 的输出经管道顺序追加到预览文件，已写入的字节不再改变，播放器可以按Range访问这个不断增长的文件
+    """
+    def __init__(self, preview, video_token, audio_token, output_path):
+        self.preview = preview
+        self.video = video_token
+        self.audio = audio_token
+        self.entry = _PreviewEntry(output_path, sized=False)
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """首次有播放器访问时启动封装"""
+        with self.lock:
+            if self.process is not None or self.entry.complete.is_set():
+                return
+            cmd = [
+                self.preview.ffmpeg_path, '-loglevel', 'error',
+                '-i', self.preview.url_for(self.video), '-i', self.preview.url_for(self.audio),
+                '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy',
+                '-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov+default_base_moof', 'pipe:1'
+            ]
+            startupinfo = None
+            if os.name == 'nt':
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            try:
+                self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                                startupinfo=startupinfo)
+            except Exception as e:
+                logger.error(f"启动实时封装失败: {e}")
+                self.entry.complete.set()
+                return
+            threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        try:
+            with open(self.entry.path, 'wb') as f:
+                while True:
+                    data = self.process.stdout.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    f.write(data)
+                    f.flush()
+        except Exception as e:
+            if not self.entry.aborted:
+                logger.error(f"写入预览文件失败: {e}")
+        finally:
+            code = self.process.wait()
+            if code != 0 and not self.entry.aborted:
+                logger.warning(f"实时封装异常退出 (返回码 {code})")
+            self.entry.complete.set()
+
+    def stop(self):
+        with self.lock:
+            self.entry.aborted = True
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+            self.entry.complete.set()
+
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    server_version = 'BilibiliPreview/1.0'
+    range_pattern = re.compile(r'bytes=(\d*)-(\d*)')
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_HEAD(self):
+        self._dispatch(head_only=True)
+
+    def do_GET(self):
+        self._dispatch(head_only=False)
+
+    def _dispatch(self, head_only):
+        preview = self.server.preview
+        parts = self.path.strip('/').split('/')
+        entry = None
+        if len(parts) == 2 and parts[0] == 'file':
+            entry = preview.files.get(parts[1])
+        elif len(parts) == 2 and parts[0] == 'remux':
+            job = preview.pairs.get(parts[1])
+            if job:
+                job.start()
+                entry = job.entry
+        # 已释放的源文件不再接受新请求；实时封装的输出在保留期内仍可访问 (拖动进度)
+        if entry is None or entry.aborted or (entry.released and not entry.linger):
+            self.send_error(404)
+            return
+
+        preview.attach(entry)
+        try:
+            self._serve_file(entry, head_only)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            preview.detach(entry)
+
+    def _parse_range(self):
+        """:return: (start, end)，未指定时为 None；格式无效时返回 (None, None)"""
+        range_header = self.headers.get('Range')
+        if not range_header:
+            return None, None
+        match = self.range_pattern.match(range_header)
+        if not match or not (match.group(1) or match.group(2)):
+            return None, None
+        start = int(match.group(1)) if match.group(1) else None
+        end = int(match.group(2)) if match.group(2) else None
+        return start, end
+
+    def _content_type(self, entry):
+        if entry.path.endswith('.m4a'):
+            return 'audio/mp4'
+        return mimetypes.guess_type(entry.path)[0] or 'video/mp4'
+
+    def _serve_file(self, entry, head_only):
+        preview = self.server.preview
+        start, end = self._parse_range()
+        total = preview.wait_for_size(entry)
+        if total is None and start is None and end is not None:
+            # bytes=-N 需要知道总大小，实时封装短时间内没有完成时让播放器稍后重试
+            total = preview.wait_until_complete(entry)
+            if total is None:
+                return self._send_retry(entry)
+
+        if total is None:
+            return self._serve_growing(entry, start, end, head_only)
+
+        status = 200
+        if start is None and end is not None:
+            # bytes=-N 表示最后N个字节
+            start, end, status = max(0, total - end), total - 1, 206
+        elif start is not None:
+            end = min(end, total - 1) if end is not None else total - 1
+            status = 206
+        else:
+            start, end = 0, total - 1
+        if status == 206 and (start >= total or start > end):
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{total}')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', self._content_type(entry))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{total}')
+        self.end_headers()
+        if not head_only:
+            self._stream_range(entry, start, end)
+
+    def _serve_growing(self, entry, start, end, head_only):
+        """
+        最终大小未知的文件 (实时封装中)：
+        从头请求时持续输出直到封装完成；从中间请求时等待数据到达后，返回当前已有的部分，
+        Content-Range 的总大小为 "*"，播放器读完后会接着请求后续范围
+        """
+        preview = self.server.preview
+        if not start and end is None:
+            self.send_response(200)
+            self.send_header('Content-Type', self._content_type(entry))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            if not head_only:
+                self._stream_range(entry, 0)
+            return
+
+        start = start or 0
+        available = preview.wait_for_data(entry, start)
+        total = entry.final_size()
+        if available <= start and total is None:
+            return self._send_retry(entry)
+        if available <= start:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{total if total is not None else "*"}')
+            self.end_headers()
+            return
+        end = min(end, available - 1) if end is not None else available - 1
+        self.send_response(206)
+        self.send_header('Content-Type', self._content_type(entry))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{total if total is not None else "*"}')
+        self.end_headers()
+        if not head_only:
+            self._stream_range(entry, start, end)
+
+    def _send_retry(self, entry):
+        """请求的数据短时间内等不到 (下载停顿或实时封装未完成)：返回 503，播放器稍后重试"""
+        if entry.aborted:
+            self.send_error(404)
+            return
+        self.send_response(503)
+        self.send_header('Retry-After', '1')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _client_closed(self):
+        """播放器是否已断开连接 (可读且读到EOF)"""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+        except (OSError, ValueError):
+            return True
+
+    def _stream_range(self, entry, start, end=None):
+        """
+        发送 [start, end] 的数据 (end 为 None 时发送到文件结束)；
+        尚未下载到的部分阻塞等待，下载仍在进行时不会因为网络停顿而中断，播放器断开连接时结束
+        """
+        position = start
+        with open(entry.path, 'rb') as f:
+            while end is None or position <= end:
+                if entry.aborted:
+                    break
+                available = entry.available()
+                limit = available if end is None else min(available, end + 1)
+                if limit > position:
+                    f.seek(position)
+                    data = f.read(min(limit - position, CHUNK_SIZE))
+                    if data:
+                        self.wfile.write(data)
+                        position += len(data)
+                        entry.last_access = time.time()
+                        continue
+                if entry.complete.is_set() and entry.available() <= position:
+                    break
+                if self._client_closed():
+                    break
+                time.sleep(0.2)
+
+
+class PreviewServer:
+    """
+    边下边播的本地HTTP服务
+    对下载中的文件提供Range访问，未下载到的字节阻塞等待；
+    DASH音视频分离的文件实时封装为分片MP4文件后同样以Range方式提供
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, host='127.0.0.1', port=0, wait_timeout=15, ffmpeg_path=None, work_dir=None):
+        self.host = host
+        self.port = port
+        self.wait_timeout = wait_timeout
+        self.ffmpeg_path = ffmpeg_path
+        self.work_dir = work_dir or os.path.join(tempfile.gettempdir(), 'bilibili_preview')
+        self.files = {}
+        self.pairs = {}
+        self.lock = threading.RLock()
+        self.httpd = None
+        self.thread = None
+        self.janitor = None
+
+    @classmethod
+    def instance(cls, ffmpeg_path=None):
+        """获取全局共享的预览服务 (首次调用时启动)"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls(ffmpeg_path=ffmpeg_path)
+                cls._instance.start()
+            elif ffmpeg_path and not cls._instance.ffmpeg_path:
+                cls._instance.ffmpeg_path = ffmpeg_path
+            return cls._instance
+
+    def start(self):
+        if self.httpd:
+            return
+        # 清理上次运行遗留的预览文件
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.httpd = ThreadingHTTPServer((self.host, self.port), _PreviewHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.preview = self
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.janitor = threading.Thread(target=self._janitor_loop, daemon=True)
+        self.janitor.start()
+        logger.info(f"边下边播服务已启动: http://{self.host}:{self.port}")
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        with self.lock:
+            for job in self.pairs.values():
+                job.stop()
+
+    def register(self, path, expected_size=None):
+        """登记一个(可能仍在下载的)文件，返回访问地址的token"""
+        with self.lock:
+            for token, entry in self.files.items():
+                if entry.path == path and not entry.released:
+                    if expected_size:
+                        entry.expected_size = expected_size
+                    return token
+            token = uuid.uuid4().hex
+            self.files[token] = _PreviewEntry(path, expected_size)
+            return token
+
+    def register_pair(self, video_path, audio_path):
+        """登记音视频分离的DASH文件，返回实时封装后的访问地址"""
+        token = uuid.uuid4().hex
+        output_path = os.path.join(self.work_dir, f"{token}.mp4")
+        with self.lock:
+            self.pairs[token] = _RemuxJob(self, self.register(video_path), self.register(audio_path), output_path)
+        return f"http://{self.host}:{self.port}/remux/{token}"
+
+    def url_for(self, token):
+        return f"http://{self.host}:{self.port}/file/{token}"
+
+    def _entries(self, path):
+        return [e for e in self.files.values() if e.path == path]
+
+    def set_size(self, path, size):
+        """下载开始后更新文件的最终大小"""
+        for entry in self._entries(path):
+            if size and size > 0:
+                entry.expected_size = size
+
+    def mark_complete(self, path):
+        for entry in self._entries(path):
+            entry.complete.set()
+
+    def release_pair(self, video_path, audio_path):
+        """
+        下载完成后交接：等待读取源文件的实时封装结束 (源文件已完整，很快完成)，
+        之后预览继续使用已封装好的文件，源文件可以被合并和删除
+        """
+        with self.lock:
+            jobs = [(token, job) for token, job in self.pairs.items()
+                    if self.files.get(job.video) and self.files[job.video].path == video_path]
+        for token, job in jobs:
+            started = job.process is not None
+            if started and not job.entry.complete.wait(self.wait_timeout):
+                logger.warning("实时封装未能及时结束，停止封装")
+                job.stop()
+            self._release_entry(job.entry, delete=True, linger=PREVIEW_LINGER if started else 0)
+        for path in (video_path, audio_path):
+            if path:
+                self.unregister(path)
+
+    def unregister(self, path, delete=False, abort=False):
+        """
+        停止提供一个文件，之后的新请求返回404
+        :param delete: 最后一个连接结束后删除文件 (连接结束前文件仍被打开，Windows下无法删除)
+        :param abort: 立即中断正在进行的传输和读取该文件的实时封装 (取消或失败时使用)
+        """
+        with self.lock:
+            entries = self._entries(path)
+            tokens = {t for t, e in self.files.items() if e.path == path}
+            jobs = [(t, job) for t, job in self.pairs.items() if job.video in tokens or job.audio in tokens]
+        for token, job in jobs:
+            if abort:
+                job.stop()
+                self._release_entry(job.entry, delete=True)
+        for entry in entries:
+            if abort:
+                entry.aborted = True
+            entry.complete.set()
+            self._release_entry(entry, delete=delete)
+
+    def wait_idle(self, paths, timeout=5):
+        """等待这些文件上的连接全部结束 (删除目录前调用)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                busy = [e for e in self.files.values() if e.clients and e.path in paths]
+            if not busy:
+                return True
+            time.sleep(0.1)
+        return False
+
+    def _release_entry(self, entry, delete=False, linger=0):
+        with self.lock:
+            entry.released = True
+            entry.delete_on_release = entry.delete_on_release or delete
+            entry.linger = linger
+        self._sweep()
+
+    def attach(self, entry):
+        with self.lock:
+            entry.clients += 1
+            entry.last_access = time.time()
+
+    def detach(self, entry):
+        with self.lock:
+            entry.clients -= 1
+            entry.last_access = time.time()
+        self._sweep()
+
+    def _sweep(self):
+        """移除已释放且没有连接的文件 (实时封装的输出在最后一次访问后保留一段时间)"""
+        now = time.time()
+        removed = []
+        with self.lock:
+            for token, entry in list(self.files.items()):
+                if entry.released and not entry.clients and now - entry.last_access >= entry.linger:
+                    del self.files[token]
+                    removed.append(entry)
+            for token, job in list(self.pairs.items()):
+                entry = job.entry
+                if entry.released and not entry.clients and now - entry.last_access >= entry.linger:
+                    job.stop()
+                    del self.pairs[token]
+                    removed.append(entry)
+        for entry in removed:
+            if entry.delete_on_release and os.path.exists(entry.path):
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning(f"删除预览文件失败: {entry.path}: {e}")
+
+    def _janitor_loop(self):
+        while self.httpd:
+            time.sleep(10)
+            self._sweep()
+
+    def wait_for_size(self, entry):
+        """
+        等待文件大小可知 (下载已开始或已完成)
+        :return: 超时或实时封装中 (最终大小未知) 时返回 None
+        """
+        if not entry.sized:
+            return entry.final_size()
+        deadline = time.time() + self.wait_timeout
+        while time.time() < deadline:
+            size = entry.final_size()
+            if size:
+                return size
+            if entry.aborted:
+                return None
+            time.sleep(0.2)
+        return None
+
+    def wait_until_complete(self, entry):
+        """最多等待 wait_timeout 秒直到文件完成，返回最终大小，超时或已中止返回 None"""
+        deadline = time.time() + self.wait_timeout
+        while not entry.complete.wait(0.5):
+            if entry.aborted or time.time() >= deadline:
+                return None
+        return entry.final_size()
+
+    def wait_for_data(self, entry, position):
+        """最多等待 wait_timeout 秒直到文件增长到 position 之后，返回当前大小"""
+        deadline = time.time() + self.wait_timeout
+        while True:
+            available = entry.available()
+            if available > position or entry.complete.is_set() or entry.aborted:
+                return available
+            if time.time() >= deadline:
+                return available
+            time.sleep(0.2)
+
+    def progress_hook(self, path, callback=None):
+        """包装下载进度回调，同步文件总大小"""
+        def hook(current, total):
+            if total and total > 0:
+                self.set_size(path, total)
+            if callback:
+                callback(current, total)
+        return hook
@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import shutil
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('bilibili_core.probe')
+
+# 带有关键帧索引(可快速精确定位)的封装格式
+INDEXED_FORMATS = ('mov', 'mp4', 'matroska', 'webm')
+
+# ffmpeg -i 输出中的声道布局 -> 声道数
+CHANNEL_COUNTS = {'mono': 1, 'stereo': 2, '2.1': 3, '3.0': 3, 'quad': 4, '4.0': 4, '4.1': 5,
+                  '5.0': 5, '5.1': 6, '6.1': 7, '7.1': 8}
+
+
+def _parse_rate(rate):
+    """解析 "30000/1001" 形式的帧率"""
+    try:
+        num, den = str(rate).split('/')
+        return float(num) / float(den) if float(den) else 0.0
+    except (ValueError, TypeError):
+        try:
+            return float(rate)
+        except (ValueError, TypeError):
+            return 0.0
+
+
+class MediaInfo:
+    """
+    媒体文件信息 (ffprobe JSON 的封装)
+    """
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.format = data.get('format', {})
+        self.streams = data.get('streams', [])
+        self.video = next((s for s in self.streams if s.get('codec_type') == 'video'), None)
+        self.audio = next((s for s in self.streams if s.get('codec_type') == 'audio'), None)
+
+    @property
+    def duration(self):
+        try:
+            return float(self.format.get('duration') or (self.video or {}).get('duration') or 0)
+        except (ValueError, TypeError):
+            return 0.0
+
+    @property
+    def format_name(self):
+        return self.format.get('format_name', '')
+
+    @property
+    def has_video(self):
+        return self.video is not None
+
+    @property
+    def has_audio(self):
+        return self.audio is not None
+
+    @property
+    def video_codec(self):
+        return (self.video or {}).get('codec_name')
+
+    @property
+    def audio_codec(self):
+        return (self.audio or {}).get('codec_name')
+
+    @property
+    def width(self):
+        return int((self.video or {}).get('width') or 0)
+
+    @property
+    def height(self):
+        return int((self.video or {}).get('height') or 0)
+
+    @property
+    def resolution(self):
+        return self.width, self.height
+
+    @property
+    def rotation(self):
+        """视频的旋转角度 (手机竖拍视频常见 90/270)，来自 rotate 标签或显示矩阵"""
+        video = self.video or {}
+        value = (video.get('tags') or {}).get('rotate')
+        if value is None:
+            value = next((d.get('rotation') for d in video.get('side_data_list') or [] if 'rotation' in d), 0)
+        try:
+            return int(round(float(value))) % 360
+        except (ValueError, TypeError):
+            return 0
+
+    @property
+    def display_size(self):
+        """ffmpeg自动旋转后实际输出的画面尺寸 (宽, 高)"""
+        if self.rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    @property
+    def fps(self):
+        if not self.video:
+            return 0.0
+        return _parse_rate(self.video.get('avg_frame_rate')) or _parse_rate(self.video.get('r_frame_rate'))
+
+    @property
+    def nb_frames(self):
+        try:
+            return int((self.video or {}).get('nb_frames') or 0)
+        except (ValueError, TypeError):
+            return 0
+
+    @property
+    def has_keyframe_index(self):
+        """封装格式是否带关键帧索引 (mp4的stss、mkv的Cues)，决定能否快速精确定位"""
+        names = self.format_name.split(',')
+        return any(name in INDEXED_FORMATS for name in names)
+
+    def concat_signature(self):
+        """
+        拼接兼容性签名：签名相同的文件可用 concat demuxer 直接流复制拼接
+        信息不完整 (如 ffmpeg -i 解析不到 profile) 时返回 None，不能据此判断可以流复制
+        """
+        video = self.video or {}
+        audio = self.audio or {}
+        video_part = (
+            video.get('codec_name'), video.get('profile'), self.width, self.height,
+            video.get('pix_fmt'), video.get('time_base'), round(self.fps, 3),
+        )
+        audio_part = (
+            audio.get('codec_name'), audio.get('sample_rate'),
+            audio.get('channels'), audio.get('channel_layout'),
+        )
+        if any(value in (None, 0) for value in video_part):
+            return None
+        if self.audio is not None and any(value is None for value in audio_part):
+            return None
+        return video_part + audio_part
+
+    def to_dict(self):
+        return self.data
+
+
+class MediaProbe:
+    """
+    负责探测媒体文件信息，按 (路径, 大小, 修改时间) 缓存在内存和磁盘中
+    同一个缓存文件应通过 shared() 共用一个实例，避免各实例用各自的内存副本互相覆盖
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, ffmpeg_path, cache_path):
+        """获取使用该缓存文件的共享实例"""
+        key = os.path.abspath(cache_path)
+        with cls._shared_lock:
+            probe = cls._shared.get(key)
+            if probe is None or probe.ffmpeg_path != ffmpeg_path:
+                probe = cls._shared[key] = cls(ffmpeg_path, cache_path)
+            return probe
+
+    def __init__(self, ffmpeg_path, cache_path=None, max_entries=2000):
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = self._find_ffprobe(ffmpeg_path)
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.cache = self._load_cache()
+
+    def _find_ffprobe(self, ffmpeg_path):
+        """优先使用与ffmpeg同目录的ffprobe"""
+        if ffmpeg_path:
+            directory = os.path.dirname(ffmpeg_path)
+            name = 'ffprobe.exe' if ffmpeg_path.lower().endswith('.exe') else 'ffprobe'
+            candidate = os.path.join(directory, name)
+            if os.path.exists(candidate):
+                return candidate
+        found = shutil.which('ffprobe')
+        if not found:
+            logger.warning("未找到ffprobe，将解析ffmpeg输出获取媒体信息")
+        return found
+
+    def _file_key(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def probe(self, path):
+        """获取媒体信息，失败返回 None"""
+        key = self._file_key(path)
+        if key is None:
+            return None
+
+        with self.lock:
+            entry = self.cache.get(key[0])
+        if entry and entry['size'] == key[1] and entry['mtime'] == key[2]:
+            return MediaInfo(path, entry['data'])
+
+        data = self._run_ffprobe(path) if self.ffprobe_path else self._run_ffmpeg(path)
+        if not data:
+            return None
+
+        with self.lock:
+            self.cache[key[0]] = {'size': key[1], 'mtime': key[2], 'data': data}
+            self._save_cache()
+        return MediaInfo(path, data)
+
+    def probe_many(self, paths, max_workers=4):
+        """并行探测多个文件，返回与 paths 顺序一致的列表"""
+        if len(paths) <= 1:
+            return [self.probe(p) for p in paths]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+            return list(executor.map(self.probe, paths))
+
+    def keyframes(self, path, start=0, end=None):
+        """
+        获取 [start, end] 附近的关键帧时间 (秒)，只读取包信息不解码
+        没有ffprobe或失败时返回空列表
+        """
+        if not self.ffprobe_path:
+            return []
+        interval = f"{max(0, start - 10)}%{end + 10}" if end is not None else f"{max(0, start - 10)}"
+        cmd = [self.ffprobe_path, '-v', 'error', '-select_streams', 'v:0',
+               '-read_intervals', interval, '-show_entries', 'packet=pts_time,flags',
+               '-of', 'csv=p=0', path]
+        try:
+            p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               encoding='utf-8', errors='replace', startupinfo=self._startupinfo())
+        except Exception as e:
+            logger.error(f"获取关键帧失败: {e}")
+            return []
+
+        times = []
+        for line in p.stdout.splitlines():
+            parts = line.strip().split(',')
+            if len(parts) >= 2 and parts[1].startswith('K'):
+                try:
+                    times.append(float(parts[0]))
+                except ValueError:
+                    continue
+        return sorted(set(times))
+
+    def _startupinfo(self):
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            return startupinfo
+        return None
+
+    def _run_ffprobe(self, path):
+        cmd = [self.ffprobe_path, '-v', 'error', '-print_format', 'json',
+               '-show_format', '-show_streams', path]
+        try:
+            p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               encoding='utf-8', errors='replace', startupinfo=self._startupinfo())
+            if p.returncode != 0:
+                logger.error(f"ffprobe失败: {p.stderr.strip()}")
+                return None
+            return json.loads(p.stdout)
+        except Exception as e:
+            logger.error(f"获取媒体信息失败: {e}")
+            return None
+
+    def _run_ffmpeg(self, path):
+        """没有ffprobe时解析 ffmpeg -i 的输出，构造与ffprobe相同结构的数据"""
+        try:
+            p = subprocess.run([self.ffmpeg_path, '-i', path], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               encoding='utf-8', errors='replace', startupinfo=self._startupinfo())
+            stderr = p.stderr
+        except Exception as e:
+            logger.error(f"获取媒体信息失败: {e}")
+            return None
+
+        data = {'format': {}, 'streams': []}
+        match = re.search(r"Input #0, ([^,]+(?:,[^,\s]+)*), from", stderr)
+        if match:
+            data['format']['format_name'] = match.group(1)
+        match = re.search(r'Duration: (\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)', stderr)
+        if match:
+            h, m, s = int(match.group(1)), int(match.group(2)), float(match.group(3))
+            data['format']['duration'] = str(h * 3600 + m * 60 + s)
+
+        for line in stderr.splitlines():
+            stream = re.search(r'Stream #\d+:\d+.*?: (Video|Audio): (\w+)', line)
+            if not stream:
+                # 旋转信息在视频流之后的 Metadata / Side data 中
+                rotate = re.search(r'^\s+rotate\s*:\s*(-?\d+)', line)
+                matrix = re.search(r'rotation of (-?[\d.]+) degrees', line)
+                if data['streams'] and data['streams'][-1]['codec_type'] == 'video':
+                    if rotate:
+                        data['streams'][-1].setdefault('tags', {})['rotate'] = rotate.group(1)
+                    elif matrix:
+                        data['streams'][-1]['side_data_list'] = [{'rotation': float(matrix.group(1))}]
+                continue
+            info = {'codec_type': stream.group(1).lower(), 'codec_name': stream.group(2)}
+            # 如 "h264 (High 10) (avc1 / 0x31637661), yuv420p10le(progressive), 1920x1080 ..."
+            # 编码名后第一个括号是 profile (带 "/" 的是封装标签)，第一个逗号后是像素格式/采样率
+            detail = re.search(r': (?:Video|Audio): \w+((?: \([^()]*\))*), ([^,]+)', line)
+            if detail:
+                tags = re.findall(r'\(([^()]*)\)', detail.group(1))
+                if tags and '/' not in tags[0]:
+                    info['profile'] = tags[0]
+            if info['codec_type'] == 'video':
+                if detail:
+                    pix_fmt = re.match(r'\w+', detail.group(2).strip())
+                    if pix_fmt:
+                        info['pix_fmt'] = pix_fmt.group(0)
+                size = re.search(r' (\d{2,5})x(\d{2,5})', line)
+                if size:
+                    info['width'], info['height'] = int(size.group(1)), int(size.group(2))
+                fps = re.search(r', (\d+(?:\.\d+)?) fps', line)
+                if fps:
+                    info['avg_frame_rate'] = fps.group(1)
+                tbn = re.search(r', (\d+(?:\.\d+)?)(k?) tbn', line)
+                if tbn:
+                    scale = float(tbn.group(1)) * (1000 if tbn.group(2) else 1)
+                    info['time_base'] = f"1/{int(scale)}"
+            else:
+                rate = re.search(r'(\d+) Hz, ([^,]+)', line)
+                if rate:
+                    info['sample_rate'], info['channel_layout'] = rate.group(1), rate.group(2).strip()
+                    channels = CHANNEL_COUNTS.get(rate.group(2).split('(')[0])
+                    count = re.match(r'(\d+) channels', rate.group(2))
+                    if count:
+                        channels = int(count.group(1))
+                    if channels:
+                        info['channels'] = channels
+            data['streams'].append(info)
+
+        if not data['streams']:
+            return None
+        return data
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取媒体信息缓存失败: {e}")
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        # 先合并磁盘上的条目 (可能由其他进程写入)，同一路径保留修改时间较新的结果
+        merged = self._load_cache()
+        for path, entry in self.cache.items():
+            current = merged.get(path)
+            if current is None or entry['mtime'] >= current.get('mtime', 0):
+                merged[path] = entry
+        self.cache = merged
+        # 超出上限时丢弃最早写入的条目
+        while len(self.cache) > self.max_entries:
+            self.cache.pop(next(iter(self.cache)))
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"保存媒体信息缓存失败: {e}")
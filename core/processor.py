@@ -1,17 +1,33 @@
 import os
-import re
 import time
-import subprocess
 import logging
 import threading
 import shutil
 import tempfile
 import cv2
 
-from core.watermark import WatermarkRemover
+from core.watermark import WatermarkRemover, WatermarkDetector
+from core.probe import MediaProbe
+from core.chunked import ChunkedEncoder
+from core.jobs import FFmpegJob
+from core.encoders import EncoderCapabilities, encoder_params, SOFTWARE_ENCODERS
+from core.config import ConfigManager
+from core.filmstrip import FilmstripGenerator
+from core.frame_export import FrameExporter
 
 logger = logging.getLogger('bilibili_core.processor')
 
+# 智能剪辑重新编码首尾时，需与源视频一致的编码器和 profile (ffprobe 名称 -> -profile:v)
+SMART_CUT_CODECS = {
+    'h264': ('libx264', 'h264_mp4toannexb', {
+        'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high',
+        'High 10': 'high10', 'High 4:2:2': 'high422', 'High 4:4:4 Predictive': 'high444',
+    }),
+    'hevc': ('libx265', 'hevc_mp4toannexb', {
+        'Main': 'main', 'Main 10': 'main10',
+    }),
+}
+
 class MediaProcessor:
     """
     负责媒体处理：合并、去水印、格式转换、剪辑、反转、剪辑
@@ -19,30 +35,95 @@ class MediaProcessor:
     def __init__(self, hardware_acceleration=False):
         self.ffmpeg_path = self._find_ffmpeg()
         self.ffmpeg_available = self.ffmpeg_path is not None
-        self.watermark_remover = WatermarkRemover(self.ffmpeg_path, self._run_ffmpeg_with_progress) if self.ffmpeg_available else None
+        self._local = threading.local()
+        self.job_log_dir = os.path.join(ConfigManager().data_dir, 'logs', 'ffmpeg')
+        self.probe = None
+        self.encoders = None
+        self._issued_params = {}  # 已生成的编码参数 -> (codec, crf, preset)，用于失败后回退
+        if self.ffmpeg_available:
+            cache_dir = os.path.join(ConfigManager().data_dir, 'cache')
+            self.probe = MediaProbe.shared(self.ffmpeg_path, os.path.join(cache_dir, 'media_info.json'))
+            self.encoders = EncoderCapabilities(self.ffmpeg_path, os.path.join(cache_dir, 'encoders.json'))
+        self.chunked_encoder = None
+        if self.ffmpeg_available:
+            workers = ConfigManager().get('encode_workers', 0)
+            self.chunked_encoder = ChunkedEncoder(self.ffmpeg_path, self.probe, self._run_ffmpeg_with_progress, workers)
+        self.watermark_detector = WatermarkDetector(self.ffmpeg_path, self.get_media_info,
+                                                    os.path.join(ConfigManager().data_dir, 'cache', 'watermarks.json'))
+        self.watermark_remover = WatermarkRemover(self.ffmpeg_path, self._run_ffmpeg_with_progress, self.get_media_info,
+                                                  self._encode_chunked, self.watermark_detector) if self.ffmpeg_available else None
+        self.filmstrips = FilmstripGenerator(self.ffmpeg_path, self.probe,
+                                             os.path.join(ConfigManager().data_dir, 'cache', 'filmstrips'))
+        self.frame_exporter = FrameExporter(self.ffmpeg_path, self.probe)
         self.hardware_acceleration = hardware_acceleration
 
     def set_hardware_acceleration(self, enabled):
         self.hardware_acceleration = enabled
         logger.info(f"硬件加速已{'启用' if enabled else '禁用'}")
 
-    def _get_encoding_params(self, crf=23, preset='medium'):
-        """获取编码参数 (根据硬件加速设置)"""
-        if self.hardware_acceleration:
-            # NVIDIA NVENC 参数
-            # -cq 对应 -crf, 但数值范围略有不同，这里近似处理
-            # -preset p4 是中等预设 (p1-p7, p7最慢)
-            return ['-c:v', 'h264_nvenc', '-cq', str(crf), '-preset', 'p4']
-        else:
-            # CPU libx264 参数
-            return ['-c:v', 'libx264', '-crf', str(crf), '-preset', preset]
+    def _get_encoding_params(self, crf=23, preset='medium', codec='h264'):
+        """获取编码参数 (启用硬件加速时选择实际可用的最快编码器)"""
+        if not self.encoders:
+            return encoder_params('libx264', crf, preset)
+        encoder = self.encoders.select(codec, hardware=self.hardware_acceleration)
+        params = encoder_params(encoder, crf, preset)
+        self._issued_params[tuple(params)] = (codec, crf, preset)
+        return params
+
+    def _encode_chunked(self, input_path, output_path, video_args, audio_args, progress_callback=None,
+                        stop_event=None, stats_callback=None, timeout=None):
+        """
+        尝试分段并行编码 (仅CPU编码器，GPU编码器本身已能跑满硬件)
+        :return: 成功/失败，不适用时返回 None 由调用方按单进程编码
+        """
+        if not self.chunked_encoder:
+            return None
+        encoder = video_args[video_args.index('-c:v') + 1] if '-c:v' in video_args else ''
+        if not encoder.startswith('libx26'):
+            return None
+        if not self.chunked_encoder.can_encode(self.get_media_info(input_path)):
+            return None
+        return self.chunked_encoder.encode(input_path, output_path, video_args, audio_args, progress_callback,
+                                           stop_event=stop_event, stats_callback=stats_callback, timeout=timeout)
 
     def _get_input_flags(self):
-        """获取输入参数 (硬件解码)"""
-        if self.hardware_acceleration:
-            return ['-hwaccel', 'cuda']
+        """获取输入参数 (与所选硬件编码器配套的硬件解码)"""
+        if self.hardware_acceleration and self.encoders:
+            hwaccel = self.encoders.hwaccel_for(self.encoders.select('h264', hardware=True))
+            if hwaccel:
+                return ['-hwaccel', hwaccel]
         return []
 
+    def _fallback_command(self, cmd, log_lines):
+        """
+        硬件编码失败时，将命令中的硬件编码参数替换为下一个可用编码器，并去掉硬件解码参数
+        :param log_lines: 失败任务的日志，只有与编码器/硬件相关的错误才回退
+        :return: 新命令，没有可回退的编码器时返回 None
+        """
+        if not self.encoders:
+            return None
+        log_text = "\n".join(log_lines).lower()
+        for params, (codec, crf, preset) in list(self._issued_params.items()):
+            encoder = params[1]
+            if encoder in SOFTWARE_ENCODERS:
+                continue
+            size = len(params)
+            index = next((i for i in range(len(cmd) - size + 1) if tuple(cmd[i:i + size]) == params), None)
+            if index is None:
+                continue
+            hints = (encoder.split('_')[-1], 'hwaccel', 'device', 'driver', 'encoder')
+            if not any(hint in log_text for hint in hints):
+                continue
+            self.encoders.mark_broken(encoder)
+            replacement = self._get_encoding_params(crf, preset, codec)
+            new_cmd = list(cmd[:index]) + replacement + list(cmd[index + size:])
+            while '-hwaccel' in new_cmd:
+                i = new_cmd.index('-hwaccel')
+                del new_cmd[i:i + 2]
+            logger.info(f"编码器 {encoder} 失败，改用 {replacement[1]} 重试")
+            return new_cmd
+        return None
+
     def _find_ffmpeg(self):
         """查找ffmpeg路径"""
         # 1. 项目内 ffmpeg/ffmpeg.exe
@@ -66,12 +147,15 @@ class MediaProcessor:
         logger.warning("未找到ffmpeg")
         return None
 
-    def convert_video(self, input_path, output_format, progress_callback=None):
+    def convert_video(self, input_path, output_format, progress_callback=None, stop_event=None, output_path=None,
+                      stats_callback=None, timeout=None):
         """
         视频格式转换
         :param input_path: 输入文件路径
         :param output_format: 目标格式 (mp4, avi, mkv, mp3, etc.)
         :param progress_callback: 进度回调
+        :param stats_callback: 统计回调，参数为 fps/speed/bitrate/out_time_us/eta 等组成的字典
+        :param timeout: ffmpeg无输出超时 (秒)，为空时使用配置 ffmpeg_timeout
         :return: 成功/失败, 输出路径/错误信息
         """
         if not self.ffmpeg_available:
@@ -81,15 +165,16 @@ class MediaProcessor:
             return False, "输入文件不存在"
             
         # 生成输出路径
-        input_dir = os.path.dirname(input_path)
-        input_name = os.path.splitext(os.path.basename(input_path))[0]
-        output_path = os.path.join(input_dir, f"{input_name}_converted.{output_format}")
-        
-        # 如果输出文件已存在，自动重命名
-        counter = 1
-        while os.path.exists(output_path):
-            output_path = os.path.join(input_dir, f"{input_name}_converted_{counter}.{output_format}")
-            counter += 1
+        if not output_path:
+            input_dir = os.path.dirname(input_path)
+            input_name = os.path.splitext(os.path.basename(input_path))[0]
+            output_path = os.path.join(input_dir, f"{input_name}_converted.{output_format}")
+            
+            # 如果输出文件已存在，自动重命名
+            counter = 1
+            while os.path.exists(output_path):
+                output_path = os.path.join(input_dir, f"{input_name}_converted_{counter}.{output_format}")
+                counter += 1
             
         cmd = [self.ffmpeg_path] + self._get_input_flags() + ['-i', input_path]
         
@@ -102,6 +187,11 @@ class MediaProcessor:
             cmd.extend(['-vf', 'fps=10,scale=480:-1:flags=lanczos', '-c:v', 'gif'])
         else:
             # 视频转换
+            chunked = self._encode_chunked(input_path, output_path, self._get_encoding_params(),
+                                           ['-c:a', 'aac', '-b:a', '128k'], progress_callback, stop_event,
+                                           stats_callback, timeout)
+            if chunked is not None:
+                return (True, output_path) if chunked else (False, "转换失败")
             cmd.extend(self._get_encoding_params())
             cmd.extend(['-c:a', 'aac', '-b:a', '128k'])
             
@@ -111,18 +201,21 @@ class MediaProcessor:
         cmd_str = ' '.join([f'"{c}"' if ' ' in str(c) else str(c) for c in cmd])
         logger.info(f"执行转换命令: {cmd_str}")
         
-        success = self._run_ffmpeg_with_progress(cmd, progress_callback)
+        success = self._run_ffmpeg_with_progress(cmd, progress_callback, stop_event=stop_event, timeout=timeout,
+                                                 stats_callback=stats_callback)
         
         if success:
             return True, output_path
         else:
             return False, "转换失败"
 
-    def reverse_video(self, input_path, progress_callback=None):
+    def reverse_video(self, input_path, progress_callback=None, stop_event=None, stats_callback=None, timeout=None):
         """
         视频反转
         :param input_path: 输入文件路径
         :param progress_callback: 进度回调
+        :param stats_callback: 统计回调，并行阶段为各分段之和
+        :param timeout: 单个ffmpeg进程的无输出超时 (秒)
         :return: 成功/失败, 输出路径/错误信息
         """
         if not self.ffmpeg_available:
@@ -142,25 +235,26 @@ class MediaProcessor:
             counter += 1
             
         # 视频反转 + 音频反转
-        # -vf reverse 视频反转
-        # -af areverse 音频反转
-        # 注意: 反转操作非常耗时且占用内存，大视频可能会失败
-        cmd = [self.ffmpeg_path] + self._get_input_flags() + ['-i', input_path]
-        
-        cmd.extend(['-vf', 'reverse', '-af', 'areverse'])
-        cmd.extend(self._get_encoding_params())
-        cmd.extend(['-c:a', 'aac', '-b:a', '128k', output_path, '-y'])
-        
-        logger.info(f"执行视频反转: {' '.join(cmd)}")
-        
-        success = self._run_ffmpeg_with_progress(cmd, progress_callback)
+        # reverse/areverse 需要把整段画面缓存在内存中，因此按固定时长分段反转后倒序拼接，
+        # 峰值内存只与分段时长和并行数有关
+        config = ConfigManager()
+        chunk_seconds = config.get('reverse_chunk_seconds', 5)
+        max_workers = min(self.chunked_encoder.workers, config.get('reverse_workers', 2))
+        logger.info(f"执行分段视频反转: 每段 {chunk_seconds} 秒, 并行 {max_workers}")
+
+        success = self.chunked_encoder.reverse(
+            input_path, output_path, self._get_encoding_params(), ['-c:a', 'aac', '-b:a', '128k'],
+            chunk_seconds=chunk_seconds, max_workers=max_workers, progress_callback=progress_callback,
+            stop_event=stop_event, stats_callback=stats_callback, timeout=timeout
+        )
         
         if success:
             return True, output_path
         else:
             return False, "视频反转失败"
 
-    def merge_video_audio(self, video_path, audio_path, output_path, progress_callback=None):
+    def merge_video_audio(self, video_path, audio_path, output_path, progress_callback=None, stop_event=None,
+                          stats_callback=None, timeout=None):
         """
         合并视频和音频
         """
@@ -190,37 +284,112 @@ class MediaProcessor:
         cmd_str = ' '.join([f'"{c}"' if ' ' in str(c) else str(c) for c in full_cmd])
         logger.info(f"执行合并命令: {cmd_str}")
         
-        return self._run_ffmpeg_with_progress(full_cmd, progress_callback)
+        return self._run_ffmpeg_with_progress(full_cmd, progress_callback, stop_event=stop_event, timeout=timeout,
+                                              stats_callback=stats_callback)
 
-    def get_video_duration(self, video_path):
-        """获取视频时长(秒)"""
+    def concat_files(self, file_list, output_path, progress_callback=None, stop_event=None, stats_callback=None,
+                     timeout=None):
+        """
+        使用 concat demuxer 无损拼接多个分段 (要求编码参数一致，如durl分段)
+        :param file_list: 按顺序排列的文件路径列表
+        """
+        if not self.ffmpeg_available:
+            logger.error("ffmpeg不可用")
+            return False
+
+        missing = [p for p in file_list if not os.path.exists(p)]
+        if missing:
+            logger.error(f"输入文件不存在: {missing}")
+            return False
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        list_file = self._write_concat_list(file_list)
         try:
-            cmd = [self.ffmpeg_path, '-i', video_path]
-            # 必须使用shell=False并传入列表
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            else:
-                startupinfo = None
+            cmd = [self.ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', list_file,
+                   '-c', 'copy', '-movflags', '+faststart', output_path, '-y']
+            logger.info(f"执行分段拼接: {' '.join(cmd)}")
+            infos = self.get_media_infos(file_list)
+            total_duration = sum(info.duration for info in infos if info) or None
+            return self._run_ffmpeg_with_progress(cmd, progress_callback, stop_event=stop_event,
+                                                  duration=total_duration, timeout=timeout,
+                                                  stats_callback=stats_callback)
+        finally:
+            try: os.remove(list_file)
+            except: pass
+
+    def _can_stream_copy(self, media_infos, ranges):
+        """
+        判断能否跳过重新编码：所有片段编码参数一致 (编码、分辨率、时间基、音频布局)，
+        且都是完整片段 (未裁剪)：开始为 0，结束为空或与时长相差不到一帧，任何裁剪都需重新编码
+        """
+        if not media_infos or any(info is None or not info.has_video for info in media_infos):
+            return False
+        signatures = {info.concat_signature() for info in media_infos}
+        if len(signatures) != 1 or None in signatures:
+            return False
+        for info, (start, end) in zip(media_infos, ranges):
+            frame = 1.0 / info.fps if info.fps else 0.04
+            if start != 0 or (end is not None and end < info.duration - frame):
+                return False
+        return True
+
+    def _concat_copy(self, file_list, output_path, progress_callback=None, stop_event=None, stats_callback=None,
+                     timeout=None):
+        """流复制拼接，返回 (成功, 输出路径/错误信息)"""
+        logger.info(f"输入文件编码参数一致，使用流复制拼接 {len(file_list)} 个文件")
+        if self.concat_files(file_list, output_path, progress_callback, stop_event, stats_callback, timeout):
+            return True, output_path
+        return False, "合并失败"
+
+    def _write_concat_list(self, file_list):
+        """生成 concat demuxer 所需的列表文件"""
+        fd, list_file = tempfile.mkstemp(suffix='.txt', prefix='concat_')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for path in file_list:
+                escaped = os.path.abspath(path).replace('\\', '/').replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        return list_file
+
+    def export_frames(self, input_path, output_dir, mode='interval', interval=30, timestamps=None,
+                      scene_threshold=0.3, image_format='jpg', progress_callback=None, stop_event=None):
+        """
+        批量导出帧
+        :param mode: interval 每N帧 / timestamps 指定时间点 / scene 场景变化
+        :return: 成功/失败, 导出结果/错误信息
+        """
+        if not os.path.exists(input_path):
+            return False, "输入文件不存在"
+        return self.frame_exporter.export(input_path, output_dir, mode=mode, interval=interval,
+                                          timestamps=timestamps, scene_threshold=scene_threshold,
+                                          image_format=image_format, progress_callback=progress_callback,
+                                          stop_event=stop_event)
+
+    def get_media_info(self, video_path):
+        """获取媒体信息 (MediaInfo，带缓存)，失败返回 None"""
+        if not self.probe:
+            return None
+        return self.probe.probe(video_path)
+
+    def get_media_infos(self, paths):
+        """并行获取多个文件的媒体信息"""
+        if not self.probe:
+            return [None] * len(paths)
+        return self.probe.probe_many(paths)
 
-            # Explicitly use utf-8 encoding to avoid gbk decode error on Windows
-            p = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, 
-                               universal_newlines=True, startupinfo=startupinfo, 
-                               encoding='utf-8', errors='replace')
-            _, stderr = p.communicate()
-            
-            match = re.search(r'Duration: (\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)', stderr)
-            if match:
-                h = int(match.group(1))
-                m = int(match.group(2))
-                s = float(match.group(3))
-                return h * 3600 + m * 60 + s
-        except Exception as e:
-            logger.error(f"获取时长失败: {e}")
-        return 0
+    def get_video_duration(self, video_path):
+        """获取视频时长(秒)"""
+        info = self.get_media_info(video_path)
+        return info.duration if info else 0
 
     def get_total_frames(self, video_path):
-        """获取视频总帧数 (优先使用 OpenCV 精确获取)"""
+        """获取视频总帧数 (优先使用封装信息中的帧数，其次 OpenCV)"""
+        info = self.get_media_info(video_path)
+        if info and info.nb_frames:
+            return info.nb_frames
+
         try:
             cap = cv2.VideoCapture(video_path)
             if cap.isOpened():
@@ -231,64 +400,30 @@ class MediaProcessor:
             logger.warning(f"OpenCV获取帧数失败，尝试使用ffmpeg估算: {e}")
         
         # Fallback
-        fps = self.get_video_fps(video_path)
-        duration = self.get_video_duration(video_path)
-        if fps > 0:
-            return int(duration * fps)
+        if info and info.fps > 0:
+            return int(info.duration * info.fps)
         return 0
 
     def get_video_fps(self, video_path):
         """获取视频帧率"""
-        try:
-            cmd = [self.ffmpeg_path, '-i', video_path]
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            else:
-                startupinfo = None
-
-            p = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, 
-                               universal_newlines=True, startupinfo=startupinfo, 
-                               encoding='utf-8', errors='replace')
-            _, stderr = p.communicate()
-            
-            # Match 30 fps, 29.97 fps, etc.
-            match = re.search(r', (\d+(?:\.\d+)?) fps', stderr)
-            if match:
-                return float(match.group(1))
-        except Exception as e:
-            logger.error(f"获取帧率失败: {e}")
-        return 0
+        info = self.get_media_info(video_path)
+        return info.fps if info else 0
 
     def has_audio_stream(self, video_path):
         """Check if video has audio stream"""
-        try:
-            cmd = [self.ffmpeg_path, '-i', video_path]
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            else:
-                startupinfo = None
+        info = self.get_media_info(video_path)
+        return info.has_audio if info else False
 
-            p = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, 
-                               universal_newlines=True, startupinfo=startupinfo, 
-                               encoding='utf-8', errors='replace')
-            _, stderr = p.communicate()
-            
-            # Look for Audio stream info
-            # Stream #0:1(und): Audio: aac (LC) (mp4a / 0x6134706D), 44100 Hz, stereo, fltp, 83 kb/s (default)
-            return "Audio:" in stderr
-        except Exception as e:
-            logger.error(f"Failed to check audio stream: {e}")
-            return False
-
-    def av_merge(self, video_path, audio_path, output_path=None, progress_callback=None):
+    def av_merge(self, video_path, audio_path, output_path=None, progress_callback=None, stop_event=None,
+                 stats_callback=None, timeout=None):
         """
         音视频合并 (AV Merge)
         :param video_path: 视频文件路径
         :param audio_path: 音频文件路径
         :param output_path: 输出文件路径
         :param progress_callback: 进度回调
+        :param stats_callback: 统计回调
+        :param timeout: ffmpeg无输出超时 (秒)
         """
         if not self.ffmpeg_available:
             return False, "ffmpeg未安装"
@@ -319,17 +454,22 @@ class MediaProcessor:
         ]
         
         logger.info(f"AV合并: {cmd}")
-        if self._run_ffmpeg_with_progress(cmd, progress_callback):
+        if self._run_ffmpeg_with_progress(cmd, progress_callback, stop_event=stop_event, timeout=timeout,
+                                          stats_callback=stats_callback):
             return True, output_path
         else:
             return False, "合并失败"
 
-    def cut_video(self, input_path, start, end, unit='time', output_path=None, progress_callback=None):
+    def cut_video(self, input_path, start, end, unit='time', output_path=None, progress_callback=None,
+                  smart=True, stop_event=None, stats_callback=None, timeout=None):
         """
         剪辑视频
         :param start: 开始时间/帧
         :param end: 结束时间/帧
         :param unit: 'time' (秒) 或 'frame' (帧)
+        :param smart: 智能剪辑，只重新编码首尾不完整的GOP，中间部分流复制
+        :param stats_callback: 统计回调
+        :param timeout: ffmpeg无输出超时 (秒)
         """
         if not self.ffmpeg_available:
             return False, "ffmpeg未安装"
@@ -354,6 +494,12 @@ class MediaProcessor:
         if duration <= 0:
             return False, "无效的时间范围"
 
+        if smart:
+            result = self._smart_cut(input_path, start_time, start_time + duration, output_path, progress_callback,
+                                     stop_event, stats_callback, timeout)
+            if result is not None:
+                return result
+
         cmd = [self.ffmpeg_path] + self._get_input_flags()
         
         # 使用 -ss 在输入前快速定位
@@ -368,12 +514,153 @@ class MediaProcessor:
         cmd.extend(['-y', output_path])
         
         logger.info(f"剪辑视频: {cmd}")
-        if self._run_ffmpeg_with_progress(cmd, progress_callback):
+        if self._run_ffmpeg_with_progress(cmd, progress_callback, stop_event=stop_event, duration=duration,
+                                          timeout=timeout, stats_callback=stats_callback):
             return True, output_path
         else:
             return False, "剪辑失败"
 
-    def merge_video_files_complex(self, file_list, output_path, progress_callback=None):
+    def _smart_cut(self, input_path, start, end, output_path, progress_callback=None, stop_event=None,
+                   stats_callback=None, timeout=None):
+        """
+        智能剪辑: [start, k1) 和 [k2, end) 重新编码，[k1, k2) 关键帧对齐直接流复制
+        各段以 MPEG-TS 形式生成 (参数集随流携带)，无损拼接后再与重新编码的音频合并
+        :return: (成功, 输出路径/错误信息)，不适用时返回 None 由调用方完整重新编码
+        """
+        info = self.get_media_info(input_path)
+        if not info or not info.has_keyframe_index:
+            return None
+        matched = self._matching_encode_params(info)
+        if matched is None:
+            return None
+        reencode, bsf = matched
+
+        keyframes = self.probe.keyframes(input_path, start, end)
+        k1 = next((k for k in keyframes if k >= start), None)
+        k2 = next((k for k in reversed(keyframes) if k <= end), None)
+        if k1 is None or k2 is None or k2 - k1 < 1:
+            # 区间内没有完整的GOP，智能剪辑没有收益
+            return None
+
+        logger.info(f"智能剪辑: 重新编码 {start:.3f}-{k1:.3f} 和 {k2:.3f}-{end:.3f}，流复制 {k1:.3f}-{k2:.3f}")
+        work_dir = tempfile.mkdtemp(prefix='smartcut_')
+        try:
+            pieces = []
+            steps = []
+            if k1 - start > 0.001:
+                steps.append(('head', start, k1, reencode))
+            steps.append(('middle', k1, k2, ['-c:v', 'copy', '-bsf:v', bsf]))
+            if end - k2 > 0.001:
+                steps.append(('tail', k2, end, reencode))
+
+            for index, (name, seg_start, seg_end, params) in enumerate(steps):
+                piece = os.path.join(work_dir, f"{index}_{name}.ts")
+                cmd = [self.ffmpeg_path, '-ss', str(seg_start), '-i', input_path,
+                       '-t', str(seg_end - seg_start), '-an'] + params
+                cmd.extend(['-avoid_negative_ts', 'make_zero', '-f', 'mpegts', '-y', piece])
+                lo = int(index * 80 / len(steps))
+                hi = int((index + 1) * 80 / len(steps))
+                if not self._run_ffmpeg_with_progress(cmd, self._scaled_callback(progress_callback, lo, hi),
+                                                      stop_event=stop_event, duration=seg_end - seg_start,
+                                                      timeout=timeout, stats_callback=stats_callback):
+                    return False, "剪辑失败"
+                pieces.append(piece)
+
+            list_file = self._write_concat_list(pieces)
+            try:
+                cmd = [self.ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', list_file]
+                if info.has_audio:
+                    cmd.extend(['-ss', str(start), '-t', str(end - start), '-i', input_path,
+                                '-map', '0:v:0', '-map', '1:a:0', '-c:a', 'aac', '-b:a', '128k'])
+                cmd.extend(['-c:v', 'copy'])
+                if output_path.lower().endswith(('.mp4', '.mov', '.m4v')):
+                    cmd.extend(['-movflags', '+faststart'])
+                cmd.extend(['-y', output_path])
+                if not self._run_ffmpeg_with_progress(cmd, self._scaled_callback(progress_callback, 80, 100),
+                                                      stop_event=stop_event, duration=end - start,
+                                                      timeout=timeout, stats_callback=stats_callback):
+                    return False, "剪辑失败"
+            finally:
+                try: os.remove(list_file)
+                except: pass
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        if not self._check_smart_cut(info, output_path, end - start):
+            try: os.remove(output_path)
+            except OSError: pass
+            return None
+
+        if progress_callback:
+            progress_callback(100, 100)
+        return True, output_path
+
+    def _matching_encode_params(self, info):
+        """
+        智能剪辑首尾的编码参数：流复制的中间部分沿用源视频的参数集 (SPS/PPS)，
+        首尾必须用同一编码器家族、相同 profile/level/像素格式/参考帧数编码，
+        否则拼接后按首段参数集解码中间部分会花屏。无法匹配时返回 None 由调用方完整重新编码
+        :return: (编码参数, 码流转换滤镜) 或 None
+        """
+        video = info.video or {}
+        if info.video_codec not in SMART_CUT_CODECS:
+            return None
+        encoder, bsf, profiles = SMART_CUT_CODECS[info.video_codec]
+        profile = profiles.get(video.get('profile'))
+        pix_fmt = video.get('pix_fmt')
+        try:
+            level = int(video.get('level') or 0)
+        except (ValueError, TypeError):
+            level = 0
+        if not profile or not pix_fmt or level <= 0:
+            return None
+        if self.encoders and encoder not in self.encoders.detect():
+            return None
+
+        params = encoder_params(encoder, 18) + ['-profile:v', profile, '-pix_fmt', pix_fmt]
+        if encoder == 'libx264':
+            # ffprobe 中 H.264 的 level 为 level_idc (如 40 表示 4.0)
+            params += ['-level', f"{level // 10}.{level % 10}"]
+            refs = video.get('refs')
+            if refs:
+                params += ['-refs', str(refs)]
+        else:
+            # HEVC 的 level 为 general_level_idc = 30 x 级别 (如 123 表示 4.1)
+            params += ['-x265-params', f"level-idc={level / 30:g}"]
+        return params, bsf
+
+    def _check_smart_cut(self, info, output_path, duration, tolerance=1.0):
+        """检查智能剪辑的输出：编码参数与源视频一致、时长正确"""
+        if not self.probe:
+            return True
+        result = self.probe.probe(output_path)
+        source = info.video or {}
+        video = (result.video or {}) if result else {}
+        problems = []
+        if not result or not result.has_video:
+            problems.append("无视频流")
+        else:
+            for key in ('codec_name', 'profile', 'pix_fmt', 'width', 'height'):
+                if video.get(key) != source.get(key):
+                    problems.append(f"{key}: {source.get(key)} -> {video.get(key)}")
+            if abs(result.duration - duration) > tolerance:
+                problems.append(f"时长: {duration:.3f} -> {result.duration:.3f}")
+        if problems:
+            logger.warning(f"智能剪辑输出与源视频不一致，改为完整重新编码: {', '.join(problems)}")
+            return False
+        return True
+
+    def _scaled_callback(self, progress_callback, lo, hi):
+        """将子步骤的 0-100 进度映射到总进度的 [lo, hi] 区间"""
+        if not progress_callback:
+            return None
+        def callback(current, total):
+            if total > 0:
+                progress_callback(min(lo + int(current * (hi - lo) / total), 99), 100)
+        return callback
+
+    def merge_video_files_complex(self, file_list, output_path, progress_callback=None, stop_event=None,
+                                  stats_callback=None, timeout=None):
         """
         高级合并：支持每个片段的裁剪范围
         file_list: [{'path': str, 'start': float, 'end': float, 'unit': 'time'|'frame'}, ...]
@@ -396,9 +683,12 @@ class MediaProcessor:
         # 假设所有视频FPS一致，或者ffmpeg会自动处理。
         # 为了安全，先把所有时间转换为秒
         
+        media_infos = self.get_media_infos([clip['path'] for clip in file_list])
+
         processed_clips = []
         for i, clip in enumerate(file_list):
             path = clip['path']
+            info = media_infos[i]
             inputs.extend(self._get_input_flags())
             inputs.extend(['-i', path])
             
@@ -407,7 +697,7 @@ class MediaProcessor:
             unit = clip.get('unit', 'time')
             
             if unit == 'frame':
-                fps = self.get_video_fps(path)
+                fps = info.fps if info else 0
                 if fps > 0:
                     start = start / fps
                     if end is not None:
@@ -418,12 +708,18 @@ class MediaProcessor:
             
             # 如果 end 为 None，需要获取视频时长
             if end is None:
-                duration = self.get_video_duration(path)
-                end = duration
+                end = info.duration if info else 0
             
             duration = end - start
 
-            processed_clips.append({'index': i, 'start': start, 'end': end, 'duration': duration})
+            processed_clips.append({'index': i, 'start': start, 'end': end, 'duration': duration,
+                                    'has_audio': bool(info and info.has_audio)})
+
+        # 参数一致且未裁剪时直接流复制拼接
+        ranges = [(c['start'], c['end']) for c in processed_clips]
+        if self._can_stream_copy(media_infos, ranges):
+            return self._concat_copy([clip['path'] for clip in file_list], output_path, progress_callback, stop_event,
+                                     stats_callback, timeout)
 
         # 构建 Filter Graph
         # [0:v]trim=start=s:end=e,setpts=PTS-STARTPTS[v0];
@@ -440,26 +736,17 @@ class MediaProcessor:
             
             # Trim Audio
             a_tag = f"a{i}"
-            path = file_list[clip['index']]['path']
-            if self.has_audio_stream(path):
+            if clip['has_audio']:
                 filter_complex.append(f"[{i}:a]atrim=start={clip['start']}:end={clip['end']},asetpts=PTS-STARTPTS[{a_tag}]")
             else:
                  filter_complex.append(f"anullsrc=channel_layout=stereo:sample_rate=44100,atrim=duration={clip['duration']}[{a_tag}]")
             audio_streams.append(a_tag)
 
-        if not transition:
-            # 直接 concat
-            v_concat = "".join([f"[{v}]" for v in video_streams])
-            a_concat = "".join([f"[{a}]" for a in audio_streams])
-            filter_complex.append(f"{v_concat}concat=n={len(file_list)}:v=1:a=0[outv]")
-            filter_complex.append(f"{a_concat}concat=n={len(file_list)}:v=0:a=1[outa]")
-        else:
-            # Transition logic removed as requested
-            # Fallback to direct concat
-            v_concat = "".join([f"[{v}]" for v in video_streams])
-            a_concat = "".join([f"[{a}]" for a in audio_streams])
-            filter_complex.append(f"{v_concat}concat=n={len(file_list)}:v=1:a=0[outv]")
-            filter_complex.append(f"{a_concat}concat=n={len(file_list)}:v=0:a=1[outa]")
+        # 直接 concat
+        v_concat = "".join([f"[{v}]" for v in video_streams])
+        a_concat = "".join([f"[{a}]" for a in audio_streams])
+        filter_complex.append(f"{v_concat}concat=n={len(file_list)}:v=1:a=0[outv]")
+        filter_complex.append(f"{a_concat}concat=n={len(file_list)}:v=0:a=1[outa]")
 
         cmd = [self.ffmpeg_path] + inputs + ['-filter_complex', ";".join(filter_complex)]
         cmd.extend(['-map', '[outv]', '-map', '[outa]'])
@@ -468,12 +755,15 @@ class MediaProcessor:
         cmd.extend(['-y', output_path])
         
         logger.info(f"高级合并: {cmd}")
-        if self._run_ffmpeg_with_progress(cmd, progress_callback):
+        total_duration = sum(clip['duration'] for clip in processed_clips)
+        if self._run_ffmpeg_with_progress(cmd, progress_callback, stop_event=stop_event, duration=total_duration,
+                                          timeout=timeout, stats_callback=stats_callback):
             return True, output_path
         else:
             return False, "合并失败"
 
-    def merge_videos_with_range(self, file_list, output_path, progress_callback=None):
+    def merge_videos_with_range(self, file_list, output_path, progress_callback=None, stop_event=None,
+                                stats_callback=None, timeout=None):
         """
         合并多个视频文件，支持片段剪辑
         file_list: [{'path': str, 'start': float, 'end': float}, ...]
@@ -489,9 +779,12 @@ class MediaProcessor:
         
         video_streams = []
         audio_streams = []
+        media_infos = self.get_media_infos([clip['path'] for clip in file_list])
+        ranges = []
         
         for i, clip in enumerate(file_list):
             path = clip['path']
+            info = media_infos[i]
             inputs.extend(self._get_input_flags())
             inputs.extend(['-i', path])
             
@@ -500,10 +793,10 @@ class MediaProcessor:
             
             # 如果 end 为 None，需要获取视频时长
             if end is None:
-                duration_total = self.get_video_duration(path)
-                end = duration_total
+                end = info.duration if info else 0
             
             duration = end - start
+            ranges.append((start, end))
             
             # Trim Video
             v_tag = f"v{i}"
@@ -512,7 +805,7 @@ class MediaProcessor:
             
             # Trim Audio
             a_tag = f"a{i}"
-            if self.has_audio_stream(path):
+            if info and info.has_audio:
                 filter_complex.append(f"[{i}:a]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[{a_tag}]")
             else:
                 # 生成静音音频
@@ -520,6 +813,11 @@ class MediaProcessor:
             
             audio_streams.append(a_tag)
 
+        # 参数一致且未裁剪时直接流复制拼接
+        if self._can_stream_copy(media_infos, ranges):
+            return self._concat_copy([clip['path'] for clip in file_list], output_path, progress_callback, stop_event,
+                                     stats_callback, timeout)
+
         # Concat
         v_concat = "".join([f"[{v}]" for v in video_streams])
         a_concat = "".join([f"[{a}]" for a in audio_streams])
@@ -533,16 +831,21 @@ class MediaProcessor:
         cmd.extend(['-y', output_path])
         
         logger.info(f"合并视频 {cmd}")
-        if self._run_ffmpeg_with_progress(cmd, progress_callback):
+        total_duration = sum(end - start for start, end in ranges)
+        if self._run_ffmpeg_with_progress(cmd, progress_callback, stop_event=stop_event, duration=total_duration,
+                                          timeout=timeout, stats_callback=stats_callback):
             return True, output_path
         else:
             return False, "合并失败"
 
-    def compress_video(self, input_path, target_resolution, crf=23, output_path=None, progress_callback=None):
+    def compress_video(self, input_path, target_resolution, crf=23, output_path=None, progress_callback=None,
+                       stop_event=None, stats_callback=None, timeout=None):
         """
         压缩视频
         :param target_resolution: 目标分辨率 (e.g. "1280x720", "1920x1080")
         :param crf: 压缩质量 (18-28, 越小画质越好体积越大)
+        :param stats_callback: 统计回调
+        :param timeout: ffmpeg无输出超时 (秒)
         """
         if not self.ffmpeg_available:
             return False, "ffmpeg未安装"
@@ -556,6 +859,13 @@ class MediaProcessor:
         # Filters
         filters = [f'scale={target_resolution}:force_original_aspect_ratio=decrease']
         
+        chunked = self._encode_chunked(input_path, output_path,
+                                       ['-vf', ','.join(filters)] + self._get_encoding_params(crf=crf),
+                                       ['-c:a', 'aac', '-b:a', '128k'], progress_callback, stop_event,
+                                       stats_callback, timeout)
+        if chunked is not None:
+            return (True, output_path) if chunked else (False, "压缩失败")
+
         cmd = [self.ffmpeg_path] + self._get_input_flags() + ['-i', input_path]
         
         cmd.extend(['-vf', ','.join(filters)])
@@ -563,76 +873,36 @@ class MediaProcessor:
         cmd.extend(['-c:a', 'aac', '-b:a', '128k', '-y', output_path])
         
         logger.info(f"压缩视频: {cmd}")
-        if self._run_ffmpeg_with_progress(cmd, progress_callback):
+        if self._run_ffmpeg_with_progress(cmd, progress_callback, stop_event=stop_event, timeout=timeout,
+                                          stats_callback=stats_callback):
             return True, output_path
         else:
             return False, "压缩失败"
 
-    def _run_ffmpeg_with_progress(self, cmd, progress_callback):
-        """运行ffmpeg并解析进度"""
-        try:
-            # 使用shell=False, cmd为列表
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            process = subprocess.Popen(
-                cmd, 
-                shell=False, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1,
-                encoding='utf-8',
-                errors='replace',
-                startupinfo=startupinfo
-            )
-            
-            def read_stderr():
-                duration_seconds = 0
-                duration_pattern = re.compile(r'Duration: (\d{2}):(\d{2}):(\d{2})')
-                time_pattern = re.compile(r'time=(\d{2}):(\d{2}):(\d{2})')
-                
-                self.last_error_log = [] # 保存最后10行日志
-                
-                for line in process.stderr:
-                    line_str = line.strip()
-                    self.last_error_log.append(line_str)
-                    if len(self.last_error_log) > 20:
-                        self.last_error_log.pop(0)
-                        
-                    # logger.debug(line_str) # 调试用
-                    if not duration_seconds:
-                        match = duration_pattern.search(line)
-                        if match:
-                            h, m, s = map(int, match.groups())
-                            duration_seconds = h * 3600 + m * 60 + s
-                            
-                    if duration_seconds and progress_callback:
-                        match = time_pattern.search(line)
-                        if match:
-                            h, m, s = map(int, match.groups())
-                            current = h * 3600 + m * 60 + s
-                            progress = min(int(current * 100 / duration_seconds), 99)
-                            progress_callback(progress, 100)
-
-            t = threading.Thread(target=read_stderr)
-            t.start()
-            
-            process.wait()
-            t.join()
-            
-            if process.returncode != 0:
-                logger.error(f"ffmpeg执行失败，返回码: {process.returncode}")
-                if hasattr(self, 'last_error_log'):
-                    logger.error("FFmpeg最后输出:\n" + "\n".join(self.last_error_log))
-            
-            if progress_callback:
-                progress_callback(100, 100)
-                
-            return process.returncode == 0
-            
-        except Exception as e:
-            logger.error(f"ffmpeg执行出错: {e}")
-            return False
+    @property
+    def last_job(self):
+        """当前线程最近一次执行的ffmpeg任务"""
+        return getattr(self._local, 'last_job', None)
+
+    def _run_ffmpeg_with_progress(self, cmd, progress_callback, stop_event=None, timeout=None,
+                                  duration=None, stats_callback=None):
+        """
+        运行ffmpeg并解析 -progress 输出
+        :param stop_event: 置位后终止任务
+        :param timeout: 单个任务超时(秒)，为空时使用配置 ffmpeg_timeout (0 为不限制)
+        :param duration: 输出时长，用于计算进度，为空时取输入时长
+        :param stats_callback: 统计回调，参数为 fps/speed/bitrate/out_time_us/eta 等组成的字典
+        """
+        if timeout is None:
+            timeout = ConfigManager().get('ffmpeg_timeout', 0)
+        while True:
+            job = FFmpegJob(cmd, progress_callback, stop_event=stop_event, timeout=timeout,
+                            duration=duration, stats_callback=stats_callback, log_dir=self.job_log_dir)
+            self._local.last_job = job
+            if job.run():
+                return True
+            if job.cancelled or job.timed_out:
+                return False
+            cmd = self._fallback_command(cmd, job.log)
+            if cmd is None:
+                return False
@@ -0,0 +1,82 @@
+import logging
+
+logger = logging.getLogger('bilibili_core.selector')
+
+# 选择策略
+POLICY_PREFERENCE = 'preference'  # 按画质/编码偏好选择 (默认行为)
+POLICY_MIN_BYTES = 'min_bytes'    # 画质不低于目标时选择体积最小的流
+POLICY_BUDGET = 'budget'          # 在体积上限内选择画质最高的流
+
+POLICY_NAMES = {
+    '按偏好选择': POLICY_PREFERENCE,
+    '画质达标时最小体积': POLICY_MIN_BYTES,
+    '限制单个视频体积': POLICY_BUDGET,
+}
+
+
+def estimate_stream_size(stream, duration):
+    """
+    估算流的下载体积 (字节)
+    bandwidth 单位为 bit/s，体积 ≈ bandwidth × 时长 / 8
+    """
+    if not stream or not duration:
+        return 0
+    return int(stream.get('bandwidth', 0) * duration / 8)
+
+
+class StreamSelector:
+    """
+    基于预估体积的视频流选择
+    """
+    def __init__(self, policy=POLICY_PREFERENCE, size_budget=None):
+        self.policy = POLICY_NAMES.get(policy, policy) or POLICY_PREFERENCE
+        self.size_budget = size_budget
+
+    def select(self, video_streams, target_qn, duration, audio_size=0):
+        """
+        按策略选择视频流
+        :param video_streams: playurl 返回的 dash.video 列表
+        :param target_qn: 目标画质 qn
+        :param duration: 视频时长 (秒)
+        :param audio_size: 已选音频流的预估体积，预算策略下会一并计入
+        :return: 选中的流，策略不适用时返回 None (由调用方按偏好选择)
+        """
+        if self.policy == POLICY_PREFERENCE or not video_streams or not duration:
+            return None
+
+        candidates = [s for s in video_streams if s.get('bandwidth')]
+        if not candidates:
+            logger.warning("视频流缺少bandwidth信息，回退到偏好选择")
+            return None
+
+        if self.policy == POLICY_MIN_BYTES:
+            return self._select_min_bytes(candidates, target_qn, duration)
+        if self.policy == POLICY_BUDGET:
+            return self._select_budget(candidates, duration, audio_size)
+        return None
+
+    def _select_min_bytes(self, candidates, target_qn, duration):
+        qualified = [s for s in candidates if s.get('id', 0) >= target_qn]
+        if not qualified:
+            # 没有达到目标画质的流时，取可用的最高画质
+            top_qn = max(s.get('id', 0) for s in candidates)
+            qualified = [s for s in candidates if s.get('id', 0) == top_qn]
+        best = min(qualified, key=lambda s: (estimate_stream_size(s, duration), -s.get('id', 0)))
+        logger.info(f"最小体积策略: qn={best.get('id')} codec={best.get('codecid')} "
+                    f"预估 {estimate_stream_size(best, duration) / 1024 / 1024:.1f} MB")
+        return best
+
+    def _select_budget(self, candidates, duration, audio_size):
+        if not self.size_budget:
+            return None
+        budget = self.size_budget - audio_size
+        fitting = [s for s in candidates if estimate_stream_size(s, duration) <= budget]
+        if fitting:
+            # 预算内画质最高，同画质取体积最小
+            best = max(fitting, key=lambda s: (s.get('id', 0), -estimate_stream_size(s, duration)))
+        else:
+            best = min(candidates, key=lambda s: estimate_stream_size(s, duration))
+            logger.warning(f"没有视频流能放入体积上限 {self.size_budget / 1024 ** 3:.2f} GB，使用体积最小的流")
+        logger.info(f"体积预算策略: qn={best.get('id')} codec={best.get('codecid')} "
+                    f"预估 {estimate_stream_size(best, duration) / 1024 / 1024:.1f} MB")
+        return best
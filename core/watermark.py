@@ -2,15 +2,214 @@ import os
 import logging
 import json
 import re
+import time
+import threading
 import subprocess
+import cv2
+import numpy as np
 from core.config import ConfigManager
 
 logger = logging.getLogger('bilibili_core.watermark')
 
+
+class WatermarkDetector:
+    """
+    负责从采样帧中自动定位静态水印：
+    水印处的边缘在每一帧都存在且位置不变，而画面内容的边缘随时间变化，
+    统计各像素的边缘出现频率和亮度时间方差 (相对周围背景的方差)，在四个角落中找出最稳定的区域
+    结果按文件身份缓存，批量去水印时无需手动框选；未检测到的结果只缓存 miss_ttl 秒
+    """
+    analysis_width = 640  # 分析时缩小到的宽度
+    corner_w = 0.4        # 角落搜索区域占画面宽度的比例
+    corner_h = 0.3        # 角落搜索区域占画面高度的比例
+    miss_ttl = 24 * 3600  # 未检测到水印的结果的缓存有效期 (秒)
+
+    def __init__(self, ffmpeg_path, prober=None, cache_path=None, samples=30):
+        self.ffmpeg_path = ffmpeg_path
+        self.prober = prober  # path -> MediaInfo
+        self.cache_path = cache_path
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.cache = self._load_cache()
+
+    def _key(self, video_path):
+        stat = os.stat(video_path)
+        return f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def detect(self, video_path):
+        """
+        :return: 水印区域 (x, y, w, h)，未检测到时返回 None
+        """
+        try:
+            key = self._key(video_path)
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.cache.get(key)
+            if isinstance(cached, list):
+                return tuple(cached)
+            if isinstance(cached, dict) and time.time() - cached.get('miss', 0) < self.miss_ttl:
+                return None
+
+        info = self.prober(video_path) if self.prober else None
+        frames, scale = self._sample_frames(video_path, info)
+        if frames is None or len(frames) < 5:
+            # 采样失败不缓存，下次重新检测
+            logger.warning(f"水印检测采样失败: {os.path.basename(video_path)}")
+            return None
+        rect = self.locate(frames)
+        if rect:
+            rect = tuple(int(round(v / scale)) for v in rect)
+        logger.info(f"水印检测结果: {os.path.basename(video_path)} -> {rect}")
+
+        with self.lock:
+            self.cache[key] = list(rect) if rect else {'miss': time.time()}
+            self._save_cache()
+        return rect
+
+    def _sample_frames(self, video_path, info):
+        """
+        均匀采样灰度帧，返回 (frames[N, h, w] uint8, 缩放比例)
+        ffmpeg 只解码关键帧 (-skip_frame nokey)，一次调用取完所有样本
+        """
+        if self.ffmpeg_path and info and info.width and info.height and info.duration:
+            width = min(self.analysis_width, info.width)
+            height = int(round(info.height * width / info.width / 2)) * 2
+            vf = f"fps={self.samples}/{info.duration:.3f},scale={width}:{height}"
+            cmd = [self.ffmpeg_path, '-v', 'error', '-skip_frame', 'nokey', '-i', video_path, '-an',
+                   '-vf', vf, '-vsync', 'vfr', '-frames:v', str(self.samples),
+                   '-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1']
+            startupinfo = None
+            if os.name == 'nt':
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            try:
+                p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   timeout=120, startupinfo=startupinfo)
+                count = len(p.stdout) // (width * height)
+                if p.returncode == 0 and count:
+                    frames = np.frombuffer(p.stdout[:count * width * height], dtype=np.uint8)
+                    return frames.reshape(count, height, width), width / info.width
+            except Exception as e:
+                logger.warning(f"ffmpeg采样失败，改用OpenCV: {e}")
+        return self._sample_frames_cv2(video_path)
+
+    def _sample_frames_cv2(self, video_path):
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return None, 1.0
+        try:
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            frames = []
+            scale = 1.0
+            for i in range(self.samples):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(total * (i + 0.5) / self.samples))
+                ok, frame = cap.read()
+                if not ok:
+                    continue
+                h, w = frame.shape[:2]
+                scale = min(1.0, self.analysis_width / w)
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                if scale < 1.0:
+                    frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+                frames.append(frame)
+            return (np.stack(frames), scale) if frames else (None, 1.0)
+        finally:
+            cap.release()
+
+    def locate(self, frames):
+        """
+        在采样帧中定位静态叠加层
+        :param frames: [N, h, w] 灰度帧
+        :return: (x, y, w, h) (分析分辨率下)，未找到返回 None
+        """
+        data = frames.astype(np.float32)
+        n, h, w = data.shape
+
+        # 边缘强度 (水平和垂直梯度)，按每帧自身的分布确定阈值
+        grad = np.zeros_like(data)
+        grad[:, :, 1:] += np.abs(np.diff(data, axis=2))
+        grad[:, 1:, :] += np.abs(np.diff(data, axis=1))
+        threshold = np.maximum(np.percentile(grad.reshape(n, -1), 90, axis=1), 20)[:, None, None]
+        persistence = (grad > threshold).mean(axis=0)
+
+        # 水印像素的亮度波动明显小于周围背景：半透明水印按 (1 - 不透明度) 衰减背景的波动，
+        # 因此与邻域波动的中位数比较，而不是使用固定阈值；静止画面的背景本身不波动，只靠边缘持续性区分
+        std = data.std(axis=0)
+        ksize = max(3, (min(h, w) // 6) | 1)
+        background = cv2.medianBlur(np.clip(std, 0, 255).astype(np.uint8), ksize).astype(np.float32)
+        stable = std < np.maximum(background, 4) * 0.8
+        score = (persistence > 0.75) & stable
+
+        cw, ch = int(w * self.corner_w), int(h * self.corner_h)
+        corners = [(0, 0), (w - cw, 0), (0, h - ch), (w - cw, h - ch)]
+        best = None
+        for x0, y0 in corners:
+            region = self._main_component(score[y0:y0 + ch, x0:x0 + cw])
+            count = int(region.sum()) if region is not None else 0
+            if count < max(20, cw * ch * 0.002):
+                continue
+            if best is None or count > best[0]:
+                best = (count, x0, y0, region)
+        if best is None:
+            return None
+
+        _, x0, y0, region = best
+        rows, cols = np.nonzero(region)
+        pad = max(2, int(w * 0.005))
+        # delogo 要求区域不接触画面边缘
+        left = max(1, int(x0 + cols.min()) - pad)
+        top = max(1, int(y0 + rows.min()) - pad)
+        right = min(w - 1, int(x0 + cols.max()) + 1 + pad)
+        bottom = min(h - 1, int(y0 + rows.max()) + 1 + pad)
+        if right - left < 8 or bottom - top < 4:
+            return None
+        return left, top, right - left, bottom - top
+
+    def _main_component(self, region):
+        """
+        膨胀后把相邻的笔画/轮廓连成一块，返回包含稳定边缘最多的连通区域，去掉零散噪点
+        (半透明水印往往只有轮廓处有边缘)；横贯或纵贯整个搜索区域的是黑边、画框等的边界，不是水印
+        """
+        joined = cv2.dilate(region.astype(np.uint8), np.ones((5, 5), np.uint8))
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(joined)
+        if count < 2:
+            return None
+        rh, rw = region.shape
+        weights = np.bincount(labels[region], minlength=count)
+        weights[0] = 0
+        weights[(stats[:, cv2.CC_STAT_WIDTH] >= rw * 0.9) | (stats[:, cv2.CC_STAT_HEIGHT] >= rh * 0.9)] = 0
+        if not weights.any():
+            return None
+        return region & (labels == int(weights.argmax()))
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"保存水印检测缓存失败: {e}")
+
+
 class WatermarkRemover:
-    def __init__(self, ffmpeg_path, runner=None):
+    def __init__(self, ffmpeg_path, runner=None, prober=None, encoder=None, detector=None):
         self.ffmpeg_path = ffmpeg_path
         self.runner = runner
+        self.prober = prober  # path -> MediaInfo
+        self.encoder = encoder  # chunked parallel encoder, returns None when not applicable
+        self.detector = detector  # WatermarkDetector, tried before the resolution table
         self.strategies = {
             'delogo': self.remove_watermark_delogo,
             'external': self.remove_watermark_external
@@ -55,10 +254,12 @@ class WatermarkRemover:
         
         return wm_x, wm_y, wm_w, wm_h
 
-    def remove_watermark_delogo(self, input_path, output_path=None, rect=None, progress_callback=None):
+    def remove_watermark_delogo(self, input_path, output_path=None, rect=None, progress_callback=None, stop_event=None,
+                                stats_callback=None, timeout=None):
         """
         Use FFmpeg delogo filter.
         rect: (x, y, w, h) tuple. If None, auto-calculated.
+        stats_callback / timeout are passed through to the ffmpeg runner.
         """
         if not output_path:
             input_dir = os.path.dirname(input_path)
@@ -66,6 +267,11 @@ class WatermarkRemover:
             ext = os.path.splitext(input_path)[1]
             output_path = os.path.join(input_dir, f"{input_name}_clean{ext}")
 
+        if not rect and self.detector:
+            rect = self.detector.detect(input_path)
+            if rect:
+                logger.info(f"Detected watermark rect: {rect}")
+
         if not rect:
             # Need resolution
             w, h = self._get_resolution(input_path)
@@ -81,11 +287,17 @@ class WatermarkRemover:
         # Simplified filter string
         filter_str = f"delogo=x={x}:y={y}:w={w}:h={h}:show=0"
         
+        video_args = ['-vf', filter_str, '-c:v', 'libx264', '-preset', 'medium', '-crf', '18']
+        if self.encoder:
+            result = self.encoder(input_path, output_path, video_args, ['-c:a', 'copy'], progress_callback, stop_event,
+                                  stats_callback, timeout)
+            if result is not None:
+                return (True, output_path) if result else (False, "去水印失败")
+
         cmd = [
             self.ffmpeg_path,
             '-i', input_path,
-            '-vf', filter_str,
-            '-c:v', 'libx264', '-preset', 'medium', '-crf', '18',
+        ] + video_args + [
             '-c:a', 'copy',
             '-y', output_path
         ]
@@ -93,7 +305,8 @@ class WatermarkRemover:
         logger.info(f"Executing delogo: {cmd}")
         
         if self.runner:
-            success = self.runner(cmd, progress_callback)
+            success = self.runner(cmd, progress_callback, stop_event=stop_event, timeout=timeout,
+                                  stats_callback=stats_callback)
             if success:
                 return True, output_path
             else:
@@ -135,6 +348,12 @@ class WatermarkRemover:
             return False, f"External tool failed: {e}"
 
     def _get_resolution(self, video_path):
+        # Prefer the processor's cached probe
+        if self.prober:
+            info = self.prober(video_path)
+            if info and info.width and info.height:
+                return info.width, info.height
+
         # Helper to get resolution using ffprobe/ffmpeg
         # Re-implement simple version or rely on caller to pass it?
         # For independence, let's implement a simple probe using ffmpeg
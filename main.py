@@ -4,6 +4,7 @@
 bilibiliDownloader主程序入口
 """
 import ctypes
+import multiprocessing
 import sys
 import argparse
 import logging
@@ -101,6 +102,32 @@ def main():
                         help='下载指定BV号的视频')
     parser.add_argument('--pages', type=int, 
                         help='指定爬取的页数，用于热门视频')
+    parser.add_argument('--estimate', type=str, 
+                        help='预估多个视频的下载大小，BV号以逗号分隔')
+    parser.add_argument('--policy', type=str, choices=['preference', 'min_bytes', 'budget'],
+                        help='视频流选择策略')
+    parser.add_argument('--budget-gb', type=float, 
+                        help='单个视频体积上限(GB)，用于 budget 策略')
+    parser.add_argument('--start', type=float, 
+                        help='片段下载的开始时间(秒)，与 -d 配合使用')
+    parser.add_argument('--end', type=float, 
+                        help='片段下载的结束时间(秒)，与 -d 配合使用')
+    parser.add_argument('--batch', type=str, choices=['convert', 'compress', 'watermark', 'av_merge', 'cut'],
+                        help='对多个本地视频批量执行编辑操作')
+    parser.add_argument('--inputs', type=str, 
+                        help='批量处理的输入文件或文件夹，以逗号分隔 (av_merge 时每项为 视频+音频)')
+    parser.add_argument('--format', type=str, default='mp4', 
+                        help='批量格式转换的目标格式')
+    parser.add_argument('--resolution', type=str, default='1280x720', 
+                        help='批量压缩的目标分辨率')
+    parser.add_argument('--crf', type=int, default=23, 
+                        help='批量压缩的画质 (CRF)')
+    parser.add_argument('--workers', type=int, 
+                        help='批量处理的并行任务数，默认按操作类型自动选择')
+    parser.add_argument('--migrate-archives', type=str, metavar='DIR',
+                        help='把目录下旧的 _danmaku.json / _comments.json 转换为压缩归档')
+    parser.add_argument('--remove-json', action='store_true', 
+                        help='转换成功后删除原JSON文件，与 --migrate-archives 配合使用')
     parser.add_argument('-V', '--version', action='version', version=f'%(prog)s {APP_VERSION}')
     
     # 播放器模式参数 (用于子进程调用)
@@ -129,4 +156,6 @@ def main():
         start_cli(args)
 
 if __name__ == "__main__":
+    # 打包后的程序启动NLP进程池时需要
+    multiprocessing.freeze_support()
     main()
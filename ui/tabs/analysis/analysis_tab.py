@@ -9,8 +9,11 @@ from PyQt5.QtGui import QPixmap
 from ui.message_box import BilibiliMessageBox
 from ui.widgets.card_widget import CardWidget
 from ui.widgets.loading_bar import LoadingBar
-from .worker import AnalysisWorker
-from .charts import ChartGenerator
+from core.danmaku import DanmakuStore
+from core.danmaku_stats import to_jsonable
+from .worker import (AnalysisWorker, STAGE_INFO, STAGE_COVER, STAGE_DANMAKU, STAGE_COMMENTS,
+                     STAGE_NLP, STAGE_RELATED)
+from .renderer import ChartRenderer
 
 logger = logging.getLogger('bilibili_desktop')
 
@@ -19,6 +22,7 @@ class AnalysisTab(QWidget):
         super().__init__()
         self.main_window = main_window
         self.crawler = main_window.crawler
+        self.renderer = ChartRenderer(chart_dir=self.crawler.analysis_cache.chart_dir, parent=self)
         self.init_ui()
 
     def add_separator(self, layout):
@@ -241,12 +245,32 @@ class AnalysisTab(QWidget):
             
         self.analyze_btn.setEnabled(False)
         self.analyze_btn.setText("分析中...")
+        self.export_btn.setEnabled(False)
         self.loading_bar.start()
+        self.reset_results()
         
         self.worker = AnalysisWorker(self.crawler, bvid)
+        self.worker.partial_signal.connect(self.on_partial_result)
         self.worker.finished_signal.connect(self.on_analysis_finished)
         self.worker.start()
 
+    def reset_results(self):
+        """开始新的分析前隐藏上一次的结果，各卡片在对应数据到达后再显示"""
+        self.partial_result = {}
+        for sep in self.separators:
+            sep.hide()
+        for card in (self.info_card, self.charts_card, self.keyword_card, self.cloud_card, self.related_card):
+            card.hide()
+        self.cover_label.clear()
+        for label in (self.stats_label, self.ratio_label, self.danmaku_label, self.level_label,
+                      self.location_label, self.color_label, self.sentiment_label, self.emoji_label,
+                      self.cloud_label):
+            label.setText("加载中...")
+
+    def on_partial_result(self, stage, data):
+        self.partial_result.update(data)
+        self.show_stage(stage, self.partial_result)
+
     def on_analysis_finished(self, result, error):
         self.analyze_btn.setEnabled(True)
         self.analyze_btn.setText("开始分析")
@@ -258,78 +282,85 @@ class AnalysisTab(QWidget):
         
         self.last_result = result
         self.export_btn.setEnabled(True)
-        self.show_results(result)
 
     def show_results(self, result):
-        # Show all separators
-        for sep in self.separators:
-            sep.show()
+        """一次显示完整的分析结果"""
+        for stage in (STAGE_INFO, STAGE_COVER, STAGE_DANMAKU, STAGE_COMMENTS, STAGE_NLP, STAGE_RELATED):
+            self.show_stage(stage, result)
 
+    def show_stage(self, stage, result):
+        """显示某个分析阶段对应的卡片和图表，result 中只需包含已完成阶段的数据"""
         info = result.get('info', {})
-        comments = result.get('comments', [])
-        danmaku = result.get('danmaku', [])
-        cover_data = result.get('cover_data')
-        
-        # 1. Basic Info
-        title = info.get('title', '')
-        desc = info.get('desc', '')
-        owner = info.get('owner', {}).get('name', '')
-        tname = info.get('tname', '未知分区')
-        pubdate = info.get('pubdate', 0)
-        
-        pub_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(pubdate))
-        
-        self.title_label.setText(f"标题: {title}")
-        self.owner_label.setText(f"UP主: {owner}")
-        self.time_label.setText(f"发布时间: {pub_time}")
-        self.zone_label.setText(f"分区: {tname}")
-        self.desc_label.setText(f"简介: {desc[:100]}..." if len(desc) > 100 else f"简介: {desc}")
-        
-        if cover_data:
-            pixmap = QPixmap()
-            pixmap.loadFromData(cover_data)
-            self.cover_label.setPixmap(pixmap)
-        
-        self.info_card.show()
-        
-        # 2. Charts Grid
-        stat = info.get('stat', {})
-        ChartGenerator.generate_stats_chart(self.stats_label, stat)
-        ChartGenerator.generate_ratio_chart(self.ratio_label, stat)
-        
-        # Danmaku & Date
-        duration = info.get('duration', 0)
-        ChartGenerator.generate_danmaku_chart(self.danmaku_label, danmaku, duration)
-        ChartGenerator.generate_level_chart(self.level_label, result.get('user_levels', []))
+        bvid = info.get('bvid') or self.bvid_input.text().strip()
 
-        # Location & Danmaku Color
-        ChartGenerator.generate_location_chart(self.location_label, result.get('locations', []))
-        ChartGenerator.generate_danmaku_color_chart(self.color_label, result.get('danmaku', []))
+        if stage == STAGE_INFO:
+            # Show all separators
+            for sep in self.separators:
+                sep.show()
 
-        # Sentiment & Emoji
-        ChartGenerator.generate_sentiment_chart(self.sentiment_label, result.get('sentiment_score', 0.5))
-        ChartGenerator.generate_emoji_chart(self.emoji_label, result.get('emojis', []))
-        
-        # 5. Related Videos
-        related = result.get('related', [])
-        self.display_related_videos(related)
-        
-        self.charts_card.show()
-        
-        # 4. Keywords
-        keywords = result.get('keywords', [])
-        if keywords:
-            self.display_keywords(keywords)
-            self.keyword_card.show()
-        else:
-            self.keyword_card.hide()
+            # 1. Basic Info
+            title = info.get('title', '')
+            desc = info.get('desc', '')
+            owner = info.get('owner', {}).get('name', '')
+            tname = info.get('tname', '未知分区')
+            pubdate = info.get('pubdate', 0)
+            
+            pub_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(pubdate))
+            
+            self.title_label.setText(f"标题: {title}")
+            self.owner_label.setText(f"UP主: {owner}")
+            self.time_label.setText(f"发布时间: {pub_time}")
+            self.zone_label.setText(f"分区: {tname}")
+            self.desc_label.setText(f"简介: {desc[:100]}..." if len(desc) > 100 else f"简介: {desc}")
+            self.info_card.show()
             
-        # 5. Word Cloud
-        if comments:
-            ChartGenerator.generate_word_cloud(self.cloud_label, comments)
-            self.cloud_card.show()
-        else:
-            self.cloud_card.hide()
+            # 2. Charts Grid (在线程池中渲染，完成后各自显示)
+            stat = info.get('stat', {})
+            self.renderer.render(self.stats_label, 'stats', bvid, stat)
+            self.renderer.render(self.ratio_label, 'ratio', bvid, stat)
+            self.charts_card.show()
+
+        elif stage == STAGE_COVER:
+            cover_data = result.get('cover_data')
+            if cover_data:
+                pixmap = QPixmap()
+                pixmap.loadFromData(cover_data)
+                self.cover_label.setPixmap(pixmap)
+
+        elif stage == STAGE_DANMAKU:
+            danmaku_stats = result.get('danmaku_stats')
+            self.renderer.render(self.danmaku_label, 'danmaku', bvid, danmaku_stats)
+            self.renderer.render(self.color_label, 'danmaku_color', bvid, danmaku_stats)
+
+        elif stage == STAGE_COMMENTS:
+            self.renderer.render(self.level_label, 'level', bvid, result.get('user_levels', []))
+            self.renderer.render(self.location_label, 'location', bvid, result.get('locations', []))
+            if result.get('comments'):
+                self.cloud_label.setText("正在分析评论...")
+                self.cloud_card.show()
+
+        elif stage == STAGE_NLP:
+            # Sentiment & Emoji
+            self.renderer.render(self.sentiment_label, 'sentiment', bvid, result.get('sentiment_score', 0.5))
+            self.renderer.render(self.emoji_label, 'emoji', bvid, result.get('emojis', []))
+
+            # 4. Keywords
+            keywords = result.get('keywords', [])
+            if keywords:
+                self.display_keywords(keywords)
+                self.keyword_card.show()
+            else:
+                self.keyword_card.hide()
+                
+            # 5. Word Cloud
+            if result.get('comments'):
+                self.renderer.render(self.cloud_label, 'word_cloud', bvid, result.get('word_freq', {}))
+                self.cloud_card.show()
+            else:
+                self.cloud_card.hide()
+
+        elif stage == STAGE_RELATED:
+            self.display_related_videos(result.get('related', []))
 
     def display_keywords(self, keywords):
         # Clear previous
@@ -459,6 +490,10 @@ class AnalysisTab(QWidget):
                 data = self.last_result.copy()
                 if 'cover_data' in data:
                     del data['cover_data']
+                if isinstance(data.get('danmaku'), DanmakuStore):
+                    data['danmaku'] = data['danmaku'].to_list()
+                if data.get('danmaku_stats'):
+                    data['danmaku_stats'] = to_jsonable(data['danmaku_stats'])
                 if 'related' in data:
                      # Clean related data to be smaller if needed
                      pass
@@ -1,384 +1,296 @@
-import io
 import logging
-import matplotlib.pyplot as plt
-import datetime
-import jieba
 
-from PyQt5.QtGui import QPixmap, QImage
-from PyQt5.QtWidgets import QLabel
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PyQt5.QtGui import QImage
 from collections import Counter
 from wordcloud import WordCloud
 
+
 logger = logging.getLogger('bilibili_desktop')
 
+# 在导入时设置一次，渲染线程中只创建 Figure，不修改全局状态
+matplotlib.rcParams['font.sans-serif'] = ['SimHei'] # Support Chinese
+matplotlib.rcParams['axes.unicode_minus'] = False
+DPI = 100
+
+WORD_CLOUD_STOP_WORDS = {
+    "的", "了", "在", "是", "我", "有", "和", "就", "不", "人", "都", "一", "一个", "上", "也", "很", "到", "说", "要", "去", "你",
+    "会", "着", "没有", "看", "好", "自己", "这", "那", "有", "什么", "个", "因为", "所以", "但是", "如果", "我们", "你们", "他们",
+    "这个", "那个", "视频", "弹幕", "哈哈", "哈哈哈", "哈哈哈哈", "啊", "吧", "嘛", "呀", "呢", "哦", "嗯", "up", "UP", "怎么", "还是",
+    "真的", "就是", "觉得", "喜欢", "支持", "加油", "其实", "然后", "现在", "时候", "已经", "可以", "一下", "这里", "那里",
+    "doge", "call", "https", "com", "bilibili", "opus", "回复", "楼上", "转发", "点赞", "收藏", "关注", "投币",
+    "星星",  "滑稽", "打卡", "第一", "前排", "沙发", "板凳", "地板", "热乎", "来了", "更新", "辛苦",
+    "www", "http", "cn", "net", "org", "html", "htm", "感觉", "有没有", "是不是", "或者", "只是", "为了", "不过", "只要", "只有"
+}
+
+
+class ChartImage:
+    """
+    负责保存渲染好的图表像素 (RGBA8888)，可在任意线程创建，显示时再转为 QImage
+    """
+    __slots__ = ('data', 'width', 'height')
+
+    def __init__(self, data, width, height):
+        self.data = data
+        self.width = width
+        self.height = height
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def to_qimage(self):
+        # QImage 不复制数据，由本对象持有缓冲区
+        return QImage(self.data, self.width, self.height, self.width * 4, QImage.Format_RGBA8888)
+
+    @classmethod
+    def from_figure(cls, fig):
+        canvas = FigureCanvasAgg(fig)
+        canvas.draw()
+        width, height = canvas.get_width_height()
+        return cls(bytes(canvas.buffer_rgba()), width, height)
+
+
 class ChartGenerator:
+    """
+    负责绘制分析图表：每个方法只使用自己的 Figure，不依赖 pyplot 全局状态，可在线程池中并行调用
+    返回 ChartImage；没有数据时返回要显示的提示文字
+    """
     @staticmethod
-    def generate_stats_chart(label: QLabel, stat: dict):
-        try:
-            # Data
-            labels = ['播放', '点赞', '投币', '收藏', '转发']
-            values = [
-                stat.get('view', 0),
-                stat.get('like', 0),
-                stat.get('coin', 0),
-                stat.get('favorite', 0),
-                stat.get('share', 0)
-            ]
-            
-            # Matplotlib
-            plt.figure(figsize=(8, 4))
-            plt.rcParams['font.sans-serif'] = ['SimHei'] # Support Chinese
-            plt.rcParams['axes.unicode_minus'] = False
-            
-            colors = ['#409eff', '#fb7299', '#e6a23c', '#67c23a', '#909399']
-            bars = plt.bar(labels, values, color=colors)
-            
-            # Add value labels
-            for bar in bars:
-                height = bar.get_height()
-                plt.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{int(height)}',
-                        ha='center', va='bottom')
-            
-            plt.title('视频数据统计')
-            plt.grid(axis='y', linestyle='--', alpha=0.7)
-            
-            # Save to buffer
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            # Load to QPixmap
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-        except Exception as e:
-            logger.error(f"Generate word cloud error: {e}")
-            label.setText(f"词云生成失败: {e}")
-   
+    def stats_chart(stat: dict):
+        # Data
+        labels = ['播放', '点赞', '投币', '收藏', '转发']
+        values = [
+            stat.get('view', 0),
+            stat.get('like', 0),
+            stat.get('coin', 0),
+            stat.get('favorite', 0),
+            stat.get('share', 0)
+        ]
+
+        fig = Figure(figsize=(8, 4), dpi=DPI)
+        ax = fig.add_subplot()
+        colors = ['#409eff', '#fb7299', '#e6a23c', '#67c23a', '#909399']
+        bars = ax.bar(labels, values, color=colors)
+
+        # Add value labels
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height,
+                    f'{int(height)}',
+                    ha='center', va='bottom')
+
+        ax.set_title('视频数据统计')
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+        return ChartImage.from_figure(fig)
+
     @staticmethod
-    def generate_ratio_chart(label: QLabel, stat: dict):
-        try:
-            # Ratios
-            view = stat.get('view', 1) or 1 # Avoid division by zero
-            like = stat.get('like', 0)
-            coin = stat.get('coin', 0)
-            fav = stat.get('favorite', 0)
-            
-            ratios = [like/view, coin/view, fav/view]
-            labels = ['点赞/播放', '投币/播放', '收藏/播放']
-            
-            plt.figure(figsize=(8, 4))
-            plt.rcParams['font.sans-serif'] = ['SimHei']
-            
-            bars = plt.bar(labels, ratios, color=['#fb7299', '#e6a23c', '#67c23a'])
-            
-            # Add value labels
-            for bar in bars:
-                height = bar.get_height()
-                plt.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{height:.2%}',
-                        ha='center', va='bottom')
-                        
-            plt.title('互动率分析')
-            plt.grid(axis='y', linestyle='--', alpha=0.5)
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-        except Exception as e:
-            logger.error(f"Generate ratio chart error: {e}")
-            label.setText(f"图表生成失败: {e}")
+    def ratio_chart(stat: dict):
+        # Ratios
+        view = stat.get('view', 1) or 1 # Avoid division by zero
+        like = stat.get('like', 0)
+        coin = stat.get('coin', 0)
+        fav = stat.get('favorite', 0)
+
+        ratios = [like/view, coin/view, fav/view]
+        labels = ['点赞/播放', '投币/播放', '收藏/播放']
+
+        fig = Figure(figsize=(8, 4), dpi=DPI)
+        ax = fig.add_subplot()
+        bars = ax.bar(labels, ratios, color=['#fb7299', '#e6a23c', '#67c23a'])
+
+        # Add value labels
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height,
+                    f'{height:.2%}',
+                    ha='center', va='bottom')
+
+        ax.set_title('互动率分析')
+        ax.grid(axis='y', linestyle='--', alpha=0.5)
+        return ChartImage.from_figure(fig)
 
     @staticmethod
-    def generate_danmaku_chart(label: QLabel, danmaku_list: list, duration=None):
-        if not danmaku_list:
-            label.setText("无弹幕数据")
-            return
-            
-        try:
-            # danmaku_list items have 'time' (float, seconds from start)
-            times = [d.get('time', 0) for d in danmaku_list]
-            if not times:
-                label.setText("弹幕数据格式错误")
-                return
-                
-            max_time = max(times)
-            if duration and duration > max_time:
-                max_time = duration
-                
-            # Binning
-            bin_size = 30 if max_time < 600 else 60
-            bins = range(0, int(max_time) + bin_size, bin_size)
-            
-            plt.figure(figsize=(8, 4))
-            plt.rcParams['font.sans-serif'] = ['SimHei']
-            plt.rcParams['axes.unicode_minus'] = False
-            
-            plt.hist(times, bins=bins, color='#fb7299', alpha=0.7, edgecolor='white')
-            plt.title('弹幕时间分布 (密度)')
-            plt.xlabel('时间 (秒)')
-            plt.ylabel('弹幕数量')
-            plt.grid(axis='y', linestyle='--', alpha=0.5)
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-            
-        except Exception as e:
-            logger.error(f"Generate danmaku chart error: {e}")
-            label.setText(f"图表生成失败: {e}")
+    def danmaku_chart(stats: dict):
+        """:param stats: core.danmaku_stats.summarize 的结果"""
+        if not stats or not stats.get('total'):
+            return "无弹幕数据"
+
+        edges = stats['density']['edges']
+        counts = stats['density']['counts']
+        bin_size = edges[1] - edges[0]
+
+        fig = Figure(figsize=(8, 4), dpi=DPI)
+        ax = fig.add_subplot()
+        ax.bar(edges[:-1], counts, width=bin_size, align='edge', color='#fb7299', alpha=0.7, edgecolor='white')
+
+        # 标出"高能"时刻
+        peaks = stats.get('peaks') or {}
+        for t, c in zip(peaks.get('time', []), peaks.get('count', [])):
+            bin_index = min(int(t // bin_size), len(counts) - 1)
+            ax.annotate('高能', (t, counts[bin_index]), ha='center', va='bottom', fontsize=8, color='#f56c6c')
+
+        ax.set_title('弹幕时间分布 (密度)')
+        ax.set_xlabel('时间 (秒)')
+        ax.set_ylabel('弹幕数量')
+        ax.grid(axis='y', linestyle='--', alpha=0.5)
+        return ChartImage.from_figure(fig)
 
     @staticmethod
-    def generate_level_chart(label: QLabel, levels: list):
-        try:
-            if not levels:
-                label.setText("无用户等级数据")
-                return
-
-            # Count levels
-            counts = Counter(levels)
-            labels = sorted(counts.keys())
-            values = [counts[l] for l in labels]
-            labels_str = [f"Lv{l}" for l in labels]
-            
-            plt.figure(figsize=(6, 4))
-            plt.rcParams['font.sans-serif'] = ['SimHei']
-            
-            # Pie chart
-            plt.pie(values, labels=labels_str, autopct='%1.1f%%', startangle=90, 
-                   colors=['#c0c4cc', '#909399', '#67c23a', '#409eff', '#e6a23c', '#f56c6c', '#ff0000'])
-            plt.title('评论用户等级分布')
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-        except Exception as e:
-            logger.error(f"Generate level chart error: {e}")
-            label.setText(f"图表生成失败")
+    def level_chart(levels: list):
+        if not levels:
+            return "无用户等级数据"
+
+        # Count levels
+        counts = Counter(levels)
+        labels = sorted(counts.keys())
+        values = [counts[l] for l in labels]
+        labels_str = [f"Lv{l}" for l in labels]
+
+        fig = Figure(figsize=(6, 4), dpi=DPI)
+        ax = fig.add_subplot()
+        # Pie chart
+        ax.pie(values, labels=labels_str, autopct='%1.1f%%', startangle=90,
+               colors=['#c0c4cc', '#909399', '#67c23a', '#409eff', '#e6a23c', '#f56c6c', '#ff0000'])
+        ax.set_title('评论用户等级分布')
+        return ChartImage.from_figure(fig)
 
     @staticmethod
-    def generate_sentiment_chart(label: QLabel, score: float):
-        try:
-            # Gauge Chart (simulated with half-pie)
-            plt.figure(figsize=(6, 3))
-            plt.rcParams['font.sans-serif'] = ['SimHei']
-            
-            # Simple horizontal bar for sentiment
-            color = '#67c23a' if score > 0.6 else '#f56c6c' if score < 0.4 else '#e6a23c'
-            
-            plt.barh(['情感倾向'], [score], color=color, height=0.5)
-            plt.xlim(0, 1)
-            plt.axvline(x=0.5, color='gray', linestyle='--', alpha=0.5)
-            plt.title(f'评论情感得分: {score:.2f} (0=负面, 1=正面)')
-            
-            plt.tight_layout()
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-        except Exception as e:
-             logger.error(f"Generate sentiment chart error: {e}")
-             label.setText("情感分析图表生成失败")
+    def sentiment_chart(score: float):
+        # Gauge Chart (simulated with half-pie)
+        fig = Figure(figsize=(6, 3), dpi=DPI)
+        ax = fig.add_subplot()
+
+        # Simple horizontal bar for sentiment
+        color = '#67c23a' if score > 0.6 else '#f56c6c' if score < 0.4 else '#e6a23c'
+
+        ax.barh(['情感倾向'], [score], color=color, height=0.5)
+        ax.set_xlim(0, 1)
+        ax.axvline(x=0.5, color='gray', linestyle='--', alpha=0.5)
+        ax.set_title(f'评论情感得分: {score:.2f} (0=负面, 1=正面)')
+        fig.tight_layout()
+        return ChartImage.from_figure(fig)
 
     @staticmethod
-    def generate_location_chart(label: QLabel, locations: list):
-        try:
-            if not locations:
-                label.setText("无IP属地数据")
-                return
-
-            counts = Counter(locations)
-            # Top 10
-            top_locs = counts.most_common(10)
-            labels = [l[0] for l in top_locs]
-            values = [l[1] for l in top_locs]
-            
-            plt.figure(figsize=(6, 4))
-            plt.rcParams['font.sans-serif'] = ['SimHei']
-            
-            # Horizontal Bar
-            y_pos = range(len(labels))
-            plt.barh(y_pos, values, color='#409eff')
-            plt.yticks(y_pos, labels)
-            plt.title('评论用户IP属地分布 (Top 10)')
-            plt.xlabel('用户数量')
-            plt.grid(axis='x', linestyle='--', alpha=0.5)
-            plt.tight_layout()
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-        except Exception as e:
-            logger.error(f"Generate location chart error: {e}")
-            label.setText("图表生成失败")
+    def location_chart(locations: list):
+        if not locations:
+            return "无IP属地数据"
+
+        counts = Counter(locations)
+        # Top 10
+        top_locs = counts.most_common(10)
+        labels = [l[0] for l in top_locs]
+        values = [l[1] for l in top_locs]
+
+        fig = Figure(figsize=(6, 4), dpi=DPI)
+        ax = fig.add_subplot()
+        # Horizontal Bar
+        y_pos = range(len(labels))
+        ax.barh(y_pos, values, color='#409eff')
+        ax.set_yticks(y_pos)
+        ax.set_yticklabels(labels)
+        ax.set_title('评论用户IP属地分布 (Top 10)')
+        ax.set_xlabel('用户数量')
+        ax.grid(axis='x', linestyle='--', alpha=0.5)
+        fig.tight_layout()
+        return ChartImage.from_figure(fig)
 
     @staticmethod
-    def generate_danmaku_color_chart(label: QLabel, danmaku: list):
-        try:
-            if not danmaku:
-                label.setText("无弹幕颜色数据")
-                return
-            
-            # Extract colors
-            colors = [d.get('color') for d in danmaku if d.get('color')]
-            if not colors:
-                label.setText("无颜色数据")
-                return
-                
-            counts = Counter(colors)
-            
-            # Group by hex
-            hex_counts = {}
-            for color_int, count in counts.items():
-                hex_color = f"#{color_int:06x}"
-                hex_counts[hex_color] = hex_counts.get(hex_color, 0) + count
-            
-            # Top 10 colors
-            sorted_colors = sorted(hex_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-            
-            labels = [c[0] for c in sorted_colors]
-            values = [c[1] for c in sorted_colors]
-            chart_colors = [c[0] for c in sorted_colors]
-            
-            plt.figure(figsize=(6, 4))
-            plt.rcParams['font.sans-serif'] = ['SimHei']
-            
-            # Horizontal Bar Chart
-            y_pos = range(len(labels))
-            plt.barh(y_pos, values, color=chart_colors, edgecolor='black', linewidth=0.5)
-            plt.yticks(y_pos, labels)
-            plt.title('弹幕颜色分布 (Top 10)')
-            plt.xlabel('弹幕数量')
-            plt.gca().invert_yaxis() # Top to bottom
-            
-            # Add value labels
-            for i, v in enumerate(values):
-                plt.text(v, i, f' {v}', va='center')
-
-            plt.grid(axis='x', linestyle='--', alpha=0.5)
-            plt.tight_layout()
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-        except Exception as e:
-            logger.error(f"Generate color chart error: {e}")
-            label.setText("图表生成失败")
+    def danmaku_color_chart(stats: dict):
+        if not stats or not stats.get('total'):
+            return "无弹幕颜色数据"
+
+        colors = stats['colors']
+        if not len(colors['values']):
+            return "无颜色数据"
+
+        # Top 10 colors (统计结果已按数量排序)
+        sorted_colors = [(f"#{int(v) & 0xffffff:06x}", int(c))
+                         for v, c in zip(colors['values'][:10], colors['counts'][:10])]
+
+        labels = [c[0] for c in sorted_colors]
+        values = [c[1] for c in sorted_colors]
+        chart_colors = [c[0] for c in sorted_colors]
+
+        fig = Figure(figsize=(6, 4), dpi=DPI)
+        ax = fig.add_subplot()
+        # Horizontal Bar Chart
+        y_pos = range(len(labels))
+        ax.barh(y_pos, values, color=chart_colors, edgecolor='black', linewidth=0.5)
+        ax.set_yticks(y_pos)
+        ax.set_yticklabels(labels)
+        ax.set_title('弹幕颜色分布 (Top 10)')
+        ax.set_xlabel('弹幕数量')
+        ax.invert_yaxis() # Top to bottom
+
+        # Add value labels
+        for i, v in enumerate(values):
+            ax.text(v, i, f' {v}', va='center')
+
+        ax.grid(axis='x', linestyle='--', alpha=0.5)
+        fig.tight_layout()
+        return ChartImage.from_figure(fig)
 
     @staticmethod
-    def generate_emoji_chart(label: QLabel, emojis: list):
-        try:
-            if not emojis:
-                label.setText("无表情包使用数据")
-                return
-
-            counts = Counter(emojis)
-            # Top 10
-            top_emojis = counts.most_common(10)
-            labels = [e[0] for e in top_emojis]
-            values = [e[1] for e in top_emojis]
-            
-            plt.figure(figsize=(6, 4))
-            plt.rcParams['font.sans-serif'] = ['SimHei']
-            
-            # Vertical Bar Chart
-            x_pos = range(len(labels))
-            plt.bar(x_pos, values, color='#fb7299', alpha=0.7)
-            plt.xticks(x_pos, labels, rotation=45)
-            plt.title('评论表情包分布 (Top 10)')
-            plt.ylabel('使用次数')
-            plt.grid(axis='y', linestyle='--', alpha=0.5)
-            plt.tight_layout()
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100)
-            buf.seek(0)
-            plt.close()
-            
-            image = QImage.fromData(buf.getvalue())
-            pixmap = QPixmap.fromImage(image)
-            label.setPixmap(pixmap)
-        except Exception as e:
-            logger.error(f"Generate emoji chart error: {e}")
-            label.setText("图表生成失败")
+    def emoji_chart(emojis: list):
+        if not emojis:
+            return "无表情包使用数据"
+
+        counts = Counter(emojis)
+        # Top 10
+        top_emojis = counts.most_common(10)
+        labels = [e[0] for e in top_emojis]
+        values = [e[1] for e in top_emojis]
+
+        fig = Figure(figsize=(6, 4), dpi=DPI)
+        ax = fig.add_subplot()
+        # Vertical Bar Chart
+        x_pos = range(len(labels))
+        ax.bar(x_pos, values, color='#fb7299', alpha=0.7)
+        ax.set_xticks(x_pos)
+        ax.set_xticklabels(labels, rotation=45)
+        ax.set_title('评论表情包分布 (Top 10)')
+        ax.set_ylabel('使用次数')
+        ax.grid(axis='y', linestyle='--', alpha=0.5)
+        fig.tight_layout()
+        return ChartImage.from_figure(fig)
 
     @staticmethod
-    def generate_word_cloud(label: QLabel, comments: list):
-        try:
-            # Expanded stop words list
-            STOP_WORDS = {
-                "的", "了", "在", "是", "我", "有", "和", "就", "不", "人", "都", "一", "一个", "上", "也", "很", "到", "说", "要", "去", "你",
-                "会", "着", "没有", "看", "好", "自己", "这", "那", "有", "什么", "个", "因为", "所以", "但是", "如果", "我们", "你们", "他们",
-                "这个", "那个", "视频", "弹幕", "哈哈", "哈哈哈", "哈哈哈哈", "啊", "吧", "嘛", "呀", "呢", "哦", "嗯", "up", "UP", "怎么", "还是",
-                "真的", "就是", "觉得", "喜欢", "支持", "加油", "其实", "然后", "现在", "时候", "已经", "可以", "一下", "这里", "那里",
-                "doge", "call", "https", "com", "bilibili", "opus", "回复", "楼上", "转发", "点赞", "收藏", "关注", "投币",
-                "星星",  "滑稽", "打卡", "第一", "前排", "沙发", "板凳", "地板", "热乎", "来了", "更新", "辛苦",
-                "www", "http", "cn", "net", "org", "html", "htm", "感觉", "有没有", "是不是", "或者", "只是", "为了", "不过", "只要", "只有"
-            }
-            
-            text = " ".join(comments)
-            
-            # Cut words
-            words = jieba.cut(text)
-            
-            # Filter stop words and short words
-            filtered_words = []
-            for w in words:
-                w = w.strip()
-                if len(w) > 1 and w not in STOP_WORDS and not w.isdigit():
-                    filtered_words.append(w)
-            
-            if not filtered_words:
-                label.setText("评论内容不足以生成词云")
-                return
-
-            wc = WordCloud(
-                font_path="msyh.ttc", # Microsoft YaHei
-                background_color="white",
-                width=800,
-                height=400,
-                max_words=150, # Increased
-                stopwords=STOP_WORDS,
-                collocations=False,
-                mask=None # Can add shape mask if needed
-            ).generate(" ".join(filtered_words))
-            
-            image = wc.to_image()
-            pixmap = QPixmap.fromImage(QImage(image.tobytes(), image.width, image.height, QImage.Format_RGB888))
-            label.setPixmap(pixmap)
-            
-        except Exception as e:
-            logger.error(f"Generate word cloud error: {e}")
-            label.setText(f"词云生成失败: {e}")
+    def word_cloud(word_freq: dict):
+        """:param word_freq: NLP引擎统计的词频，不再重新分词"""
+        # Filter stop words and short words
+        frequencies = {w: c for w, c in (word_freq or {}).items()
+                       if len(w) > 1 and w not in WORD_CLOUD_STOP_WORDS and not w.isdigit()}
+
+        if not frequencies:
+            return "评论内容不足以生成词云"
+
+        wc = WordCloud(
+            font_path="msyh.ttc", # Microsoft YaHei
+            background_color="white",
+            width=800,
+            height=400,
+            max_words=150, # Increased
+            stopwords=WORD_CLOUD_STOP_WORDS,
+            collocations=False,
+            mask=None # Can add shape mask if needed
+        ).generate_from_frequencies(frequencies)
+
+        image = wc.to_image().convert('RGBA')
+        return ChartImage(image.tobytes(), image.width, image.height)
+
+
+# 图表类型 -> (绘制函数, 失败时显示的文字)
+CHARTS = {
+    'stats': (ChartGenerator.stats_chart, "图表生成失败"),
+    'ratio': (ChartGenerator.ratio_chart, "图表生成失败"),
+    'danmaku': (ChartGenerator.danmaku_chart, "图表生成失败"),
+    'level': (ChartGenerator.level_chart, "图表生成失败"),
+    'sentiment': (ChartGenerator.sentiment_chart, "情感分析图表生成失败"),
+    'location': (ChartGenerator.location_chart, "图表生成失败"),
+    'danmaku_color': (ChartGenerator.danmaku_color_chart, "图表生成失败"),
+    'emoji': (ChartGenerator.emoji_chart, "图表生成失败"),
+    'word_cloud': (ChartGenerator.word_cloud, "词云生成失败"),
+}
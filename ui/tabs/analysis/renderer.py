@@ -0,0 +1,146 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+import logging
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QPixmap
+
+from core.danmaku import DanmakuStore
+from core.frame_decoder import FrameCache
+from .charts import CHARTS, ChartImage
+
+logger = logging.getLogger('bilibili_desktop')
+
+# 磁盘图表缓存的文件头: 宽, 高, 数据摘要
+CHART_HEADER = struct.Struct('<II32s')
+
+
+def _feed(h, value):
+    if isinstance(value, DanmakuStore):
+        h.update(value.times.tobytes())
+        h.update(value.colors.tobytes())
+    elif isinstance(value, array):
+        h.update(value.tobytes())
+    elif isinstance(value, np.ndarray):
+        # 与从缓存JSON中读出的列表得到相同的摘要
+        _feed(h, value.tolist())
+        return
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            h.update(str(key).encode('utf-8'))
+            _feed(h, value[key])
+    else:
+        h.update(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    h.update(b'\0')
+
+
+def data_hash(args):
+    """计算图表输入数据的摘要，作为缓存键的一部分"""
+    h = hashlib.md5()
+    for arg in args:
+        _feed(h, arg)
+    return h.hexdigest()
+
+
+class ChartRenderer(QObject):
+    """
+    负责在线程池中并行渲染分析图表：图表绘制为RGBA像素后通过信号交给GUI线程显示，
+    不经过PNG编码解码；结果按 (BV号, 图表类型, 数据摘要) 缓存在内存和磁盘上，重复分析时直接显示
+    """
+    chart_ready = pyqtSignal(str, int, object)  # 图表类型, 请求序号, ChartImage 或提示文字
+
+    def __init__(self, max_workers=4, cache_mb=64, chart_dir=None, parent=None):
+        """
+        :param chart_dir: 返回某个BV号图表缓存目录的函数，为空时只缓存在内存中
+        """
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.cache = FrameCache(cache_mb * 1024 * 1024)
+        self.chart_dir = chart_dir
+        self.targets = {}  # 图表类型 -> (QLabel, 请求序号)
+        self.token = 0
+        self.chart_ready.connect(self._on_ready)
+
+    def render(self, label, chart_type, bvid, *args):
+        """
+        提交一个图表，完成后显示在 label 上；同一图表类型的新请求会让旧请求的结果被丢弃
+        """
+        self.token += 1
+        self.targets[chart_type] = (label, self.token)
+        label.setText("图表生成中...")
+        self.executor.submit(self._job, chart_type, self.token, bvid, args)
+
+    def _job(self, chart_type, token, bvid, args):
+        func, failure_text = CHARTS[chart_type]
+        try:
+            digest = data_hash(args)
+            key = (bvid, chart_type, digest)
+            result = self.cache.get(key)
+            if result is None:
+                result = self._load(bvid, chart_type, digest)
+                if result is None:
+                    result = func(*args)
+                    if isinstance(result, ChartImage):
+                        self._save(bvid, chart_type, digest, result)
+                if isinstance(result, ChartImage):
+                    self.cache.put(key, result)
+        except Exception as e:
+            logger.error(f"Generate {chart_type} chart error: {e}")
+            result = f"{failure_text}: {e}"
+        self.chart_ready.emit(chart_type, token, result)
+
+    def _chart_path(self, bvid, chart_type):
+        if not self.chart_dir or not bvid:
+            return None
+        return os.path.join(self.chart_dir(bvid), f"{chart_type}.bin")
+
+    def _load(self, bvid, chart_type, digest):
+        """读取磁盘上的图表缓存，数据摘要不一致时视为没有缓存"""
+        path = self._chart_path(bvid, chart_type)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                raw = zlib.decompress(f.read())
+            width, height, saved = CHART_HEADER.unpack_from(raw)
+            if saved.decode('ascii') != digest:
+                return None
+            return ChartImage(raw[CHART_HEADER.size:], width, height)
+        except Exception as e:
+            logger.warning(f"读取图表缓存失败: {path}: {e}")
+            return None
+
+    def _save(self, bvid, chart_type, digest, image):
+        path = self._chart_path(bvid, chart_type)
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            header = CHART_HEADER.pack(image.width, image.height, digest.encode('ascii'))
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(zlib.compress(header + image.data, 1))
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"保存图表缓存失败: {path}: {e}")
+
+    def _on_ready(self, chart_type, token, result):
+        label, current = self.targets.get(chart_type, (None, None))
+        if label is None or current != token:
+            return
+        del self.targets[chart_type]
+        if isinstance(result, ChartImage):
+            label.setPixmap(QPixmap.fromImage(result.to_qimage()))
+        else:
+            label.setText(result)
+
+    def shutdown(self):
+        self.targets.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,16 +1,44 @@
 import logging
 import requests
 import datetime
-import jieba.analyse
-import re
-from collections import Counter
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from PyQt5.QtCore import QThread, pyqtSignal
-from snownlp import SnowNLP
+
+from core.config import ConfigManager
+from core.danmaku_stats import summarize
+from core.nlp import get_engine
 
 logger = logging.getLogger('bilibili_desktop')
 
+# 分析阶段：每个阶段完成后通过 partial_signal 发出对应的数据
+STAGE_INFO = 'info'          # info
+STAGE_COVER = 'cover'        # cover_data
+STAGE_DANMAKU = 'danmaku'    # danmaku, danmaku_stats
+STAGE_COMMENTS = 'comments'  # comments, comment_dates, user_levels, user_genders, comment_hours, locations
+STAGE_NLP = 'nlp'            # sentiment_score, keywords, emojis, word_freq
+STAGE_RELATED = 'related'    # related
+ALL_STAGES = (STAGE_INFO, STAGE_COVER, STAGE_DANMAKU, STAGE_COMMENTS, STAGE_NLP, STAGE_RELATED)
+
+# 每个视频最多保留的统计数据记录条数
+STAT_HISTORY_LIMIT = 500
+
+# 关键词统计的自定义停用词
+KEYWORD_STOP_WORDS = {
+    "视频", "弹幕", "这个", "那个", "什么", "因为", "所以", "如果", "但是", "就是", 
+    "真的", "觉得", "喜欢", "支持", "加油", "其实", "然后", "现在", "时候", "已经", 
+    "可以", "一下", "这里", "那里", "哈哈", "哈哈哈", "up", "UP", "Up", "怎么",
+    "还是", "感觉", "有没有", "是不是", "或者", "只是", "为了", "不过", "只要", "只有",
+    "回复", "查看", "图片", "表情", "doge", "妙啊", "吃瓜", "滑稽", "笑死", "甚至",
+    "虽然", "但是", "看到", "知道", "告诉", "希望", "今天", "明天", "今年", "明年",
+    "还是", "还有", "and", "the", "of", "to", "in", "it", "is", "for",
+    "啊", "呀", "呢", "吧", "嘛", "哦", "嗯", "哼", "哈", "咳", "呸", "嘘",
+    "b站", "B站", "哔哩哔哩", "投币", "点赞", "收藏", "关注", "三连", "白嫖", "下次一定"
+}
+
 class AnalysisWorker(QThread):
+    partial_signal = pyqtSignal(str, dict) # stage, data
     finished_signal = pyqtSignal(dict, str) # result, error
 
     def __init__(self, crawler, bvid):
@@ -20,174 +48,220 @@ class AnalysisWorker(QThread):
 
     def run(self):
         try:
-            # 1. Get video info
+            # 提前启动NLP工作进程，模型加载与网络请求同时进行
+            get_engine().warm_up()
+            self.cache = self.crawler.analysis_cache
+
+            # 0. 先显示上次的分析结果，之后只更新发生变化的部分
+            result = {}
+            self.updated = {}
+            cached = self.cache.load(self.bvid)
+            if cached:
+                result.update(cached['result'])
+                self.updated.update(cached.get('updated', {}))
+                snapshot = dict(result)  # result 之后还会在本线程中修改
+                for stage in ALL_STAGES:
+                    self.partial_signal.emit(stage, snapshot)
+
+            # 1. Get video info (其余数据都依赖它，统计数据每次都重新获取)
             info = self.crawler.api.get_video_info(self.bvid)
             if not info or 'data' not in info:
                 raise Exception("无法获取视频信息")
             
             video_data = info['data']
-            aid = video_data.get('aid')
-            cid = video_data.get('cid')
-            
-            # 2. Get comments for word cloud and other analysis
-            comments = []
-            comment_dates = []
-            user_levels = []
-            user_genders = []
-            comment_hours = []
-            locations = []
-            
-            if aid:
-                # Fetch multiple pages (Limit to 20 pages / 400 comments to avoid slow analysis)
-                # API default page size is 20
-                max_pages = 20
-                for page in range(1, max_pages + 1):
-                    try:
-                        replies = self.crawler.api.get_video_comments(aid, page=page)
-                        if not replies:
-                            break
-                            
-                        for r in replies:
-                            content = r.get('content', {}).get('message', '')
-                            if content:
-                                comments.append(content)
-                                
-                            # Extract date
-                            ctime = r.get('ctime', 0)
-                            if ctime:
-                                comment_dates.append(ctime)
-                                
-                            # Extract level
-                            level = r.get('member', {}).get('level_info', {}).get('current_level', 0)
-                            user_levels.append(level)
-                            
-                            # Extract location
-                            try:
-                                # 优化IP属地提取逻辑
-                                loc = ""
-                                # 1. Try standard field
-                                reply_control = r.get('reply_control', {})
-                                if reply_control and 'location' in reply_control:
-                                    loc = reply_control['location']
-                                # 2. Try root field (sometimes)
-                                elif 'location' in r:
-                                    loc = r['location']
-                                
-                                if loc:
-                                    # Remove prefix if present, support both colon types
-                                    clean_loc = loc.replace('IP属地：', '').replace('IP属地:', '').strip()
-                                    if clean_loc and clean_loc != "未知":
-                                        locations.append(clean_loc)
-                            except: pass
-                            
-                    except Exception as e:
-                        logger.error(f"Error fetching comments page {page}: {e}")
-                        break
-            
-            # 2.5 Get Danmaku (Fixed: Added back)
-            danmaku = []
-            if cid:
-                try:
-                    danmaku = self.crawler.get_video_danmaku(cid)
-                except Exception as e:
-                    logger.error(f"Failed to get danmaku: {e}")
+            now = time.time()
+            result['info'] = video_data
+            history = result.get('stat_history', []) + [{'time': now, **video_data.get('stat', {})}]
+            result['stat_history'] = history[-STAT_HISTORY_LIMIT:]
+            self.updated[STAGE_INFO] = now
+            self.partial_signal.emit(STAGE_INFO, {'info': video_data, 'stat_history': result['stat_history']})
+
+            # 2. 各数据源互不依赖，并行获取；评论到达后立即开始NLP分析
+            #    返回 None 表示与缓存相比没有变化
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = {
+                    executor.submit(self._fetch_danmaku, video_data,
+                                    result.get('danmaku_stats') is not None): STAGE_DANMAKU,
+                    executor.submit(self._fetch_comments, video_data.get('aid'),
+                                    result.get('comment_ids') if cached else None): STAGE_COMMENTS,
+                    executor.submit(self._fetch_related): STAGE_RELATED,
+                }
+                if not result.get('cover_data'):
+                    futures[executor.submit(self._fetch_cover, video_data)] = STAGE_COVER
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage = futures.pop(future)
+                        data = future.result()
+                        if data is not None:
+                            result.update(data)
+                            self.updated[stage] = time.time()
+                            self.partial_signal.emit(stage, data)
+                        if stage == STAGE_COMMENTS:
+                            futures[executor.submit(self._analyze_comments, result.get('comments', []),
+                                                    result.get('comment_ids', []),
+                                                    'keywords' in result)] = STAGE_NLP
+
+            # 弹幕没有变化 (缓存未过期或条数相同) 时结果中只有统计，从缓存读取原始弹幕供导出使用
+            if 'danmaku' not in result and result.get('danmaku_stats') is not None:
+                danmaku = self.cache.load_danmaku(self.bvid)
+                if danmaku is not None:
+                    result['danmaku'] = danmaku
 
-            # 2.6 Get Related Videos
-            related = []
             try:
-                related = self.crawler.api.get_related_videos(self.bvid)
+                self.cache.save(self.bvid, result, self.updated)
             except Exception as e:
-                logger.error(f"Failed to get related videos: {e}")
+                logger.error(f"Failed to save analysis cache: {e}")
+            self.finished_signal.emit(result, "")
+        except Exception as e:
+            self.finished_signal.emit({}, str(e))
 
-            # 3. Get cover image
-            cover_data = None
-            pic_url = video_data.get('pic', '')
-            if pic_url:
-                try:
-                    resp = requests.get(pic_url, timeout=10)
-                    if resp.status_code == 200:
-                        cover_data = resp.content
-                except Exception as e:
-                    logger.error(f"Failed to download cover: {e}")
-            
-            # 4. Sentiment Analysis
-            sentiment_score = 0.5
+    def _fetch_cover(self, video_data):
+        cover_data = None
+        pic_url = video_data.get('pic', '')
+        if pic_url:
+            try:
+                resp = requests.get(pic_url, timeout=10)
+                if resp.status_code == 200:
+                    cover_data = resp.content
+            except Exception as e:
+                logger.error(f"Failed to download cover: {e}")
+        return {'cover_data': cover_data}
+
+    def _fetch_related(self):
+        related = []
+        try:
+            related = self.crawler.api.get_related_videos(self.bvid)
+        except Exception as e:
+            logger.error(f"Failed to get related videos: {e}")
+        return {'related': related}
+
+    def _fetch_danmaku(self, video_data, has_cache=False):
+        """
+        弹幕接口不支持只获取新增部分：缓存未过期时不请求，过期后重新获取并按弹幕id合并到缓存中，
+        只有条数变化时才重新计算统计
+        """
+        ttl = ConfigManager().get('analysis_danmaku_ttl', 3600)
+        if has_cache and time.time() - self.updated.get(STAGE_DANMAKU, 0) < ttl:
+            return None
+
+        danmaku = []
+        cid = video_data.get('cid')
+        if cid:
             try:
-                if comments:
-                    scores = []
-                    for c in comments:
-                        # 简单的过滤：移除纯表情、纯符号
-                        clean_c = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', '', c)
-                        if len(clean_c) > 1:
-                            s = SnowNLP(clean_c)
-                            scores.append(s.sentiments)
-                    if scores:
-                        sentiment_score = sum(scores) / len(scores)
-            except ImportError:
-                logger.warning("SnowNLP not installed, skipping sentiment analysis")
+                danmaku = self.crawler.get_video_danmaku(cid, video_data.get('duration'), video_data.get('aid'))
             except Exception as e:
-                logger.error(f"Sentiment analysis failed: {e}")
+                logger.error(f"Failed to get danmaku: {e}")
 
-            # 4. Keyword Analysis (Optimized)
-            keywords = []
+        cached = self.cache.load_danmaku(self.bvid) if has_cache else None
+        if cached:
+            before = len(cached)
+            if danmaku:
+                cached.extend(danmaku)
+                cached.sort()
+            if len(cached) == before:
+                self.updated[STAGE_DANMAKU] = time.time()
+                return None
+            danmaku = cached
+
+        # 弹幕统计 (密度、高能时刻、颜色/模式分布、刷屏关键词)
+        danmaku_stats = None
+        if danmaku:
             try:
-                if comments:
-                    # 预处理：合并所有评论
-                    text = " ".join(comments)
-                    
-                    # 自定义停用词
-                    stop_words = {
-                        "视频", "弹幕", "这个", "那个", "什么", "因为", "所以", "如果", "但是", "就是", 
-                        "真的", "觉得", "喜欢", "支持", "加油", "其实", "然后", "现在", "时候", "已经", 
-                        "可以", "一下", "这里", "那里", "哈哈", "哈哈哈", "up", "UP", "Up", "怎么",
-                        "还是", "感觉", "有没有", "是不是", "或者", "只是", "为了", "不过", "只要", "只有",
-                        "回复", "查看", "图片", "表情", "doge", "妙啊", "吃瓜", "滑稽", "笑死", "甚至",
-                        "虽然", "但是", "看到", "知道", "告诉", "希望", "今天", "明天", "今年", "明年",
-                        "还是", "还有", "and", "the", "of", "to", "in", "it", "is", "for",
-                        "啊", "呀", "呢", "吧", "嘛", "哦", "嗯", "哼", "哈", "咳", "呸", "嘘",
-                        "b站", "B站", "哔哩哔哩", "投币", "点赞", "收藏", "关注", "三连", "白嫖", "下次一定"
-                    }
-                    
-                    # 使用 jieba 提取关键词
-                    # topK=50，提取更多以供筛选
-                    tags = jieba.analyse.extract_tags(text, topK=50, withWeight=True)
-                    
-                    # 过滤停用词和单字
-                    keywords = []
-                    for word, weight in tags:
-                        if word.lower() not in stop_words and len(word) > 1 and not word.isdigit():
-                            keywords.append((word, weight))
-                            if len(keywords) >= 20: # 保留前20个
-                                break
+                danmaku_stats = summarize(danmaku, video_data.get('duration'))
+                self.cache.save_danmaku(self.bvid, danmaku)
             except Exception as e:
-                logger.error(f"Keyword extraction failed: {e}")
+                logger.error(f"Danmaku statistics failed: {e}")
+        return {'danmaku': danmaku, 'danmaku_stats': danmaku_stats}
 
-            # 5. Emoji Analysis
-            emojis = []
+    def _fetch_comments(self, aid, cached_ids=None):
+        """:param cached_ids: 缓存中的评论id，本地保存的评论没有增加时返回 None"""
+        comments = []
+        comment_ids = []
+        comment_dates = []
+        user_levels = []
+        user_genders = []
+        comment_hours = []
+        locations = []
+        
+        if aid:
+            # 增量获取：只请求上次分析之后的新评论 (每次最多 analysis_comment_limit 条)，已保存的评论从本地读取
+            # 较早评论的补齐留给下载评论时的完整获取
             try:
-                emoji_pattern = re.compile(r'\[(.*?)\]')
-                for c in comments:
-                    found = emoji_pattern.findall(c)
-                    if found:
-                        emojis.extend(found)
+                limit = ConfigManager().get('analysis_comment_limit', 400)
+                replies = self.crawler.refresh_comments(aid, limit, backfill=False)
             except Exception as e:
-                logger.error(f"Emoji extraction failed: {e}")
-
-            result = {
-                'info': video_data,
-                'comments': comments,
-                'comment_dates': comment_dates,
-                'user_levels': user_levels,
-                'user_genders': user_genders,
-                'comment_hours': comment_hours,
-                'locations': locations,
-                'danmaku': danmaku,
-                'related': related,
-                'cover_data': cover_data,
-                'sentiment_score': sentiment_score,
-                'keywords': keywords,
-                'emojis': emojis
-            }
-            self.finished_signal.emit(result, "")
+                logger.error(f"Error fetching comments: {e}")
+                replies = []
+            
+            for r in replies:
+                content = r.get('content', {}).get('message', '')
+                if content:
+                    comments.append(content)
+                    comment_ids.append(r.get('rpid', 0))
+                    
+                # Extract date
+                ctime = r.get('ctime', 0)
+                if ctime:
+                    comment_dates.append(ctime)
+                    
+                # Extract level
+                level = r.get('member', {}).get('level_info', {}).get('current_level', 0)
+                user_levels.append(level)
+                
+                # Extract location
+                try:
+                    # 优化IP属地提取逻辑
+                    loc = ""
+                    # 1. Try standard field
+                    reply_control = r.get('reply_control', {})
+                    if reply_control and 'location' in reply_control:
+                        loc = reply_control['location']
+                    # 2. Try root field (sometimes)
+                    elif 'location' in r:
+                        loc = r['location']
+                    
+                    if loc:
+                        # Remove prefix if present, support both colon types
+                        clean_loc = loc.replace('IP属地：', '').replace('IP属地:', '').strip()
+                        if clean_loc and clean_loc != "未知":
+                            locations.append(clean_loc)
+                except: pass
+
+        if cached_ids is not None and len(cached_ids) == len(comment_ids):
+            return None
+        return {
+            'comments': comments,
+            'comment_ids': comment_ids,
+            'comment_dates': comment_dates,
+            'user_levels': user_levels,
+            'user_genders': user_genders,
+            'comment_hours': comment_hours,
+            'locations': locations
+        }
+
+    def _analyze_comments(self, comments, comment_ids, has_cache=False):
+        """
+        情感、关键词、表情统计：在常驻进程池中完成，每条评论只分词一次；
+        汇总状态保存在缓存中，只分析尚未分析过的评论，没有新评论时返回 None
+        每次最多分析 analysis_comment_limit 条 (最新的优先)，本地保存的评论很多时分几次分析完
+        """
+        engine = get_engine()
+        try:
+            state, analyzed = self.cache.load_nlp_state(self.bvid)
+            if state is None:
+                state, analyzed = engine.new_state(), set()
+            new = [(rpid, text) for rpid, text in zip(comment_ids, comments) if rpid not in analyzed]
+            limit = ConfigManager().get('analysis_comment_limit', 400)
+            if limit:
+                new = new[:limit]
+            if not new and has_cache:
+                return None
+            if new:
+                state = engine.accumulate(state, [text for _, text in new])
+                analyzed.update(rpid for rpid, _ in new)
+                self.cache.save_nlp_state(self.bvid, state, analyzed)
+            return engine.finish(state, KEYWORD_STOP_WORDS)
         except Exception as e:
-            self.finished_signal.emit({}, str(e))
+            logger.error(f"Comment NLP analysis failed: {e}")
+            return {'sentiment_score': 0.5, 'keywords': [], 'emojis': [], 'word_freq': {}}
@@ -10,6 +10,8 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLa
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QPropertyAnimation, QEasingCurve, QRect, QTimer
 from ui.workers import WorkerThread
 from ui.message_box import BilibiliMessageBox
+from core.prefetch import PlayurlPrefetcher
+from core.utils import format_size
 
 class HistoryDialog(QDialog):
     def __init__(self, history_file, parent=None):
@@ -224,6 +226,9 @@ class BangumiTab(QWidget):
         self.crawler = main_window.crawler
         self.current_series_title = ""
         self.history_file = os.path.join(self.crawler.data_dir, "bangumi_history.json")
+        # 当前集下载时，后台预先解析后续几集的下载地址
+        self.prefetch_count = self.crawler.network.config.get('prefetch_count', 2)
+        self.prefetcher = PlayurlPrefetcher(self.crawler.api)
         self.init_ui()
         
     def init_ui(self):
@@ -339,6 +344,13 @@ class BangumiTab(QWidget):
         self.download_btn.clicked.connect(self.start_batch_download)
         self.download_btn.setEnabled(False)
         action_layout.addWidget(self.download_btn)
+
+        self.estimate_btn = QPushButton("预估大小")
+        self.estimate_btn.setStyleSheet("background-color: #409eff; color: white; padding: 10px 30px; font-size: 18px;")
+        self.estimate_btn.setCursor(Qt.PointingHandCursor)
+        self.estimate_btn.clicked.connect(self.estimate_selected)
+        self.estimate_btn.setEnabled(False)
+        action_layout.addWidget(self.estimate_btn)
         
         self.stop_btn = QPushButton("停止下载")
         self.stop_btn.setStyleSheet("background-color: #999; color: white; padding: 10px 30px; font-size: 18px;")
@@ -480,6 +492,7 @@ class BangumiTab(QWidget):
             self._anim_timer.stop()
             if self.episode_list.count() > 0:
                 self.download_btn.setEnabled(True)
+                self.estimate_btn.setEnabled(True)
             return
             
         ep = self.episodes_data[self._anim_index]
@@ -509,6 +522,55 @@ class BangumiTab(QWidget):
         for i in range(self.episode_list.count()):
             self.episode_list.item(i).setCheckState(Qt.Unchecked)
 
+    def estimate_selected(self):
+        """下载前预估选中视频的总大小和耗时"""
+        bvids = []
+        for i in range(self.episode_list.count()):
+            item = self.episode_list.item(i)
+            if item.checkState() == Qt.Checked and item.data(Qt.UserRole).get('bvid'):
+                bvids.append(item.data(Qt.UserRole).get('bvid'))
+
+        if not bvids:
+            BilibiliMessageBox.warning(self, "提示", "请选择要预估的视频")
+            return
+
+        settings_tab = self.main_window.settings_tab
+        params = settings_tab.get_download_params()
+        params["bvids"] = bvids
+        config = {
+            'cookies': self.crawler.cookies,
+            'data_dir': settings_tab.data_dir_input.text().strip(),
+            'max_retries': settings_tab.retry_count.value(),
+            'timeout': settings_tab.timeout_spin.value(),
+            'retry_interval': settings_tab.retry_interval_spin.value()
+        }
+
+        self.estimate_btn.setEnabled(False)
+        self.current_task_label.setText(f"正在预估 {len(bvids)} 个视频的下载大小...")
+        self.estimate_thread = WorkerThread("estimate_batch", params, config=config)
+        self.estimate_thread.finished_signal.connect(self.on_estimate_finished)
+        self.estimate_thread.start()
+
+    def on_estimate_finished(self, result):
+        self.estimate_btn.setEnabled(True)
+        if not self.is_downloading:
+            self.current_task_label.setText("就绪")
+        if result.get('status') != 'success' or not result.get('data'):
+            BilibiliMessageBox.error(self, "错误", f"预估失败: {result.get('message', '未知错误')}")
+            return
+
+        data = result['data']
+        failed = [item for item in data['items'] if item.get('error')]
+        lines = [f"共 {len(data['items'])} 个视频，预计总大小 {format_size(data['total_bytes'])}"]
+        if data.get('eta_seconds'):
+            minutes, seconds = divmod(int(data['eta_seconds']), 60)
+            lines.append(f"预计耗时约 {minutes} 分 {seconds} 秒 (按 {format_size(int(data['speed']))}/s 估算)")
+        else:
+            lines.append("无法测速，未能预估耗时")
+        if failed:
+            lines.append(f"{len(failed)} 个视频无法获取下载地址: " + ", ".join(item['bvid'] for item in failed[:5]))
+        BilibiliMessageBox.information(self, "下载预估", "\n".join(lines))
+
     def start_batch_download(self):
         self.download_queue = []
         for i in range(self.episode_list.count()):
@@ -594,6 +656,8 @@ class BangumiTab(QWidget):
         params = settings_tab.get_download_params()
         params["bvid"] = bvid
         params["title"] = title
+        params["prefetcher"] = self.prefetcher
+        self.prefetch_upcoming(params)
         
         # 构建配置字典
         config = {
@@ -611,6 +675,20 @@ class BangumiTab(QWidget):
         self.current_thread.progress_signal.connect(self.update_progress)
         self.current_thread.start()
         
+    def prefetch_upcoming(self, params):
+        """预取队列中接下来几集的下载地址"""
+        if self.prefetch_count <= 0:
+            return
+        upcoming = [ep.get('bvid') for ep in self.download_queue[:self.prefetch_count]]
+        self.prefetcher.prefetch(
+            upcoming,
+            quality_preference=params.get('video_quality', '1080p'),
+            codec_preference=params.get('video_codec', 'H.264/AVC'),
+            audio_quality_preference=params.get('audio_quality', '高音质 (Hi-Res/Dolby)'),
+            selection_policy=params.get('selection_policy', 'preference'),
+            size_budget=params.get('size_budget')
+        )
+
     def update_progress(self, p_type, current, total):
         if total <= 0: return
         
@@ -750,6 +828,7 @@ class BangumiTab(QWidget):
         
     def finish_batch_download(self):
         self.is_downloading = False
+        self.prefetcher.clear()
         self.download_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.current_task_label.setText("批量下载完成")
@@ -775,6 +854,7 @@ class BangumiTab(QWidget):
                     self.save_history(self.current_series_title, title, bvid, "已取消", "")
 
             self.download_queue = []
+            self.prefetcher.clear()
             self.current_task_label.setText("下载已停止")
             self.progress_bar.setValue(0) # 重置进度条
             self.download_btn.setEnabled(True)
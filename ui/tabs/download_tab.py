@@ -4,11 +4,12 @@ import PyQt5.QtCore as QtCore
 import re
 
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
-                             QLineEdit, QGroupBox, QProgressBar, QMessageBox, QDialog)
+                             QLineEdit, QGroupBox, QProgressBar, QMessageBox, QDialog, QCheckBox)
 from PyQt5.QtCore import Qt
 from ui.workers import WorkerThread
 from ui.message_box import BilibiliMessageBox
 from ui.styles import UIStyles
+from ui.widgets.video_player_window import VideoPlayerWindow
 
 class CheckCollectionThread(QtCore.QThread):
     finished_signal = QtCore.pyqtSignal(dict)
@@ -52,6 +53,10 @@ class DownloadTab(QWidget):
         self.bvid_input.setPlaceholderText("请输入视频BV号或视频地址，例如: BV1xx411c7mD")
         input_layout.addWidget(self.bvid_input)
         
+        self.preview_check = QCheckBox("边下边播")
+        self.preview_check.setToolTip("下载开始后即可通过本地地址播放已下载的部分")
+        input_layout.addWidget(self.preview_check)
+        
         self.download_btn = QPushButton("开始下载")
         self.download_btn.setCursor(Qt.PointingHandCursor)
         self.download_btn.clicked.connect(lambda: self.download_video())
@@ -285,6 +290,7 @@ class DownloadTab(QWidget):
         # 创建并启动工作线程
         params = settings_tab.get_download_params()
         params["bvid"] = bvid
+        params["preview"] = self.preview_check.isChecked()
         if title:
             params["title"] = title
             
@@ -311,6 +317,9 @@ class DownloadTab(QWidget):
         self.download_status.setText(message)
         self.main_window.statusBar().showMessage(message)
         
+        if data.get("preview_url"):
+            self.open_preview(data["preview_url"])
+        
         status = data.get("status", "")
         if status == "error":
             self.main_window.log_to_console(message, "error")
@@ -321,6 +330,14 @@ class DownloadTab(QWidget):
         else:
             self.main_window.log_to_console(message, "info")
 
+    def open_preview(self, url):
+        """打开边下边播窗口"""
+        bvid = self.current_thread.params.get("bvid", "") if self.current_thread else ""
+        title = self.bvid_input.toolTip() or bvid
+        self.main_window.log_to_console(f"边下边播地址: {url}", "info")
+        self.preview_window = VideoPlayerWindow(bvid, title, url=url)
+        self.preview_window.show()
+
     def update_download_progress(self, progress_type, current, total):
         """更新下载进度"""
         # 获取合并设置
@@ -2,7 +2,7 @@ import os
 import json
 import logging
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
-                             QLineEdit, QCheckBox, QComboBox, QSpinBox, 
+                             QLineEdit, QCheckBox, QComboBox, QSpinBox, QDoubleSpinBox,
                              QGridLayout, QFileDialog, QScrollArea, QFrame,
                              QDialog, QTextBrowser)
 from PyQt5.QtGui import QDesktopServices
@@ -19,6 +19,7 @@ from ui.widgets.custom_combobox import NoScrollComboBox
 from ui.about_module import AboutDialog
 from ui.version_dialog import VersionDialog
 from core.version_manager import VersionManager
+from core.selector import POLICY_NAMES
 
 class SettingsTab(QWidget):
     def __init__(self, main_window):
@@ -228,9 +229,36 @@ class SettingsTab(QWidget):
         self.audio_quality_combo.setStyleSheet(combo_style)
         pref_layout.addWidget(self.audio_quality_combo, 2, 1)
 
+        # 4. 选择策略 (基于预估体积)
+        policy_label = QLabel("流选择策略:")
+        policy_label.setStyleSheet("font-size: 20px; color: #555;")
+        pref_layout.addWidget(policy_label, 3, 0)
+        
+        self.policy_combo = NoScrollComboBox()
+        self.policy_combo.addItems(list(POLICY_NAMES.keys()))
+        self.policy_combo.setCurrentText("按偏好选择")
+        self.policy_combo.setStyleSheet(combo_style)
+        self.policy_combo.setToolTip("画质达标时最小体积: 同画质下自动选择更小的HEVC/AV1流\n限制单个视频体积: 在体积上限内选择最高画质")
+        self.policy_combo.currentTextChanged.connect(self.update_budget_state)
+        pref_layout.addWidget(self.policy_combo, 3, 1)
+        
+        # 5. 体积上限
+        budget_label = QLabel("单个视频体积上限 (GB):")
+        budget_label.setStyleSheet("font-size: 20px; color: #555;")
+        pref_layout.addWidget(budget_label, 4, 0)
+        
+        self.size_budget_spin = QDoubleSpinBox()
+        self.size_budget_spin.setRange(0.1, 100)
+        self.size_budget_spin.setSingleStep(0.5)
+        self.size_budget_spin.setValue(2.0)
+        self.size_budget_spin.setFixedWidth(120)
+        self.size_budget_spin.setStyleSheet(self.retry_count.styleSheet().replace("QSpinBox", "QDoubleSpinBox"))
+        self.size_budget_spin.setEnabled(False)
+        pref_layout.addWidget(self.size_budget_spin, 4, 1)
+
         tips_label = QLabel("💡 提示：实际下载画质取决于视频源和账号权限，登录大会员可解锁最高画质")
         tips_label.setStyleSheet("color: #999; font-size: 18px; margin-top: 10px; font-style: italic;")
-        pref_layout.addWidget(tips_label, 3, 0, 1, 2)
+        pref_layout.addWidget(tips_label, 5, 0, 1, 2)
         
         pref_card.add_layout(pref_layout)
         self.content_layout.addWidget(pref_card)
@@ -296,10 +324,10 @@ class SettingsTab(QWidget):
         self.floating_window_check.setChecked(True) # 默认开启
         checkbox_layout.addWidget(self.floating_window_check, 2, 0)
         
-        self.hardware_acceleration_check = QCheckBox("启用 NVIDIA 硬件加速 (NVDEC)")
+        self.hardware_acceleration_check = QCheckBox("启用硬件加速 (自动检测)")
         self.hardware_acceleration_check.setStyleSheet(checkbox_style)
         self.hardware_acceleration_check.setCursor(Qt.PointingHandCursor)
-        self.hardware_acceleration_check.setToolTip("需要 NVIDIA 显卡支持，可加速视频处理")
+        self.hardware_acceleration_check.setToolTip("自动检测可用的 NVENC/QSV/AMF 等硬件编码器，不可用时回退到CPU编码")
         checkbox_layout.addWidget(self.hardware_acceleration_check, 2, 1)
         
         download_card.add_layout(checkbox_layout)
@@ -480,6 +508,8 @@ class SettingsTab(QWidget):
             'video_quality': self.quality_combo.currentText(),
             'video_codec': self.codec_combo.currentText(),
             'audio_quality': self.audio_quality_combo.currentText(),
+            'selection_policy': POLICY_NAMES.get(self.policy_combo.currentText(), 'preference'),
+            'size_budget_gb': self.size_budget_spin.value(),
             'always_lock_account': self.always_lock_check.isChecked(),
             'hardware_acceleration': self.hardware_acceleration_check.isChecked()
         }
@@ -533,6 +563,12 @@ class SettingsTab(QWidget):
                 self.codec_combo.setCurrentText(config['video_codec'])
             if 'audio_quality' in config:
                 self.audio_quality_combo.setCurrentText(config['audio_quality'])
+            if 'selection_policy' in config:
+                for name, policy in POLICY_NAMES.items():
+                    if policy == config['selection_policy']:
+                        self.policy_combo.setCurrentText(name)
+            if 'size_budget_gb' in config:
+                self.size_budget_spin.setValue(config['size_budget_gb'])
             if 'always_lock_account' in config:
                 self.always_lock_check.setChecked(config['always_lock_account'])
             if 'hardware_acceleration' in config:
@@ -560,5 +596,11 @@ class SettingsTab(QWidget):
             "download_comments": self.download_comments_check.isChecked(),
             "video_quality": self.quality_combo.currentText(),
             "video_codec": self.codec_combo.currentText(),
-            "audio_quality": self.audio_quality_combo.currentText()
+            "audio_quality": self.audio_quality_combo.currentText(),
+            "selection_policy": POLICY_NAMES.get(self.policy_combo.currentText(), 'preference'),
+            "size_budget": int(self.size_budget_spin.value() * 1024 ** 3)
         }
+
+    def update_budget_state(self, text):
+        """仅在体积预算策略下启用体积上限输入"""
+        self.size_budget_spin.setEnabled(POLICY_NAMES.get(text) == 'budget')
@@ -10,6 +10,7 @@ from .pages.compress_page import CompressPage
 from .pages.frame_page import FramePage
 from .pages.reverse_page import ReversePage
 from .pages.remove_watermark_page import RemoveWatermarkPage
+from .pages.batch_page import BatchPage
 
 class VideoEditTab(QWidget):
     def __init__(self, main_window):
@@ -64,7 +65,8 @@ class VideoEditTab(QWidget):
             ("视频压缩", "compress"), 
             ("视频去水印", "watermark"),
             ("视频反转", "reverse"),
-            ("逐帧获取", "frame")
+            ("逐帧获取", "frame"),
+            ("批量处理", "batch")
         ]
         
         for text, tag in nav_items:
@@ -92,6 +94,7 @@ class VideoEditTab(QWidget):
         self.pages['watermark'] = RemoveWatermarkPage(self.main_window, self.processor)
         self.pages['reverse'] = ReversePage(self.main_window, self.processor)
         self.pages['frame'] = FramePage(self.main_window, self.processor)
+        self.pages['batch'] = BatchPage(self.main_window, self.processor)
         
         for tag, page in self.pages.items():
             self.content_stack.addWidget(page)
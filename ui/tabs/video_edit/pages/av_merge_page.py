@@ -90,6 +90,7 @@ class AVMergePage(BaseEditPage):
         
         self.worker = GenericWorker(self.processor.av_merge, self.video_path, self.audio_path)
         self.worker.progress_signal.connect(self.update_progress)
+        self.connect_stats(self.worker, self.progress_bar)
         self.worker.finished_signal.connect(self.on_merge_finished)
         self.worker.start()
 
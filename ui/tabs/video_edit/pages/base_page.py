@@ -5,6 +5,7 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLa
 from PyQt5.QtCore import Qt, QSize
 from ui.widgets.custom_combobox import NoScrollComboBox
 from ui.widgets.edit_widgets import VideoFileWidget
+from ..workers import FilmstripWorker
 
 class BaseEditPage(QWidget):
     def __init__(self, main_window, processor):
@@ -12,6 +13,7 @@ class BaseEditPage(QWidget):
         self.main_window = main_window
         self.processor = processor
         self.worker = None
+        self.filmstrip_workers = []
 
     def setup_header(self, layout, title, subtitle):
         title_label = QLabel(title)
@@ -55,6 +57,59 @@ class BaseEditPage(QWidget):
         btn.clicked.connect(callback)
         return btn
 
+    def create_cancel_button(self):
+        """取消当前任务的按钮，任务运行时才可用"""
+        btn = self.create_button("取消", self.cancel_worker)
+        btn.setEnabled(False)
+        return btn
+
+    def cancel_worker(self):
+        if self.worker and self.worker.isRunning() and hasattr(self.worker, 'stop'):
+            self.worker.stop()
+            self.main_window.log_to_console("正在取消任务...", "warning")
+
+    def connect_stats(self, worker, bar):
+        """在进度条上显示ffmpeg的实时统计 (fps、速度、码率、剩余时间)，任务结束后恢复"""
+        def on_stats(stats):
+            parts = ["%p%"]
+            if stats.get('fps'):
+                parts.append(f"{stats['fps']:.0f} fps")
+            if stats.get('speed'):
+                parts.append(f"{stats['speed']:.2f}x")
+            if stats.get('bitrate') and stats['bitrate'] != 'N/A':
+                parts.append(stats['bitrate'])
+            if stats.get('eta') is not None:
+                minutes, seconds = divmod(int(stats['eta']), 60)
+                parts.append(f"剩余 {minutes:02d}:{seconds:02d}")
+            bar.setFormat("  ".join(parts))
+
+        bar.setFormat("%p%")
+        worker.stats_signal.connect(on_stats)
+        worker.finished_signal.connect(lambda *args: bar.setFormat("%p%"))
+
+    def load_filmstrip(self, file_path, filmstrip):
+        """后台生成 (或从缓存读取) 缩略图条，完成后显示在 filmstrip 上"""
+        generator = getattr(self.processor, 'filmstrips', None)
+        filmstrip.clear()
+        if generator is None:
+            return
+        filmstrip.video_path = file_path
+        worker = FilmstripWorker(generator, file_path, filmstrip.count, filmstrip.thumb_height)
+
+        def on_finished(video_path, sprite):
+            if worker in self.filmstrip_workers:
+                self.filmstrip_workers.remove(worker)
+            try:
+                # 生成期间可能已换成其他文件或控件已被移除
+                if sprite and filmstrip.video_path == video_path:
+                    filmstrip.set_sprite(sprite)
+            except RuntimeError:
+                pass
+
+        worker.finished_signal.connect(on_finished)
+        self.filmstrip_workers.append(worker)
+        worker.start()
+
     def create_primary_button(self, text, callback):
         btn = QPushButton(text)
         btn.setCursor(Qt.PointingHandCursor)
@@ -0,0 +1,215 @@
+import os
+from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QGroupBox, QSpinBox, QListWidgetItem,
+                             QFileDialog, QStackedWidget, QWidget)
+from PyQt5.QtCore import Qt
+from ui.widgets.custom_combobox import NoScrollComboBox
+from ui.widgets.edit_widgets import DragDropListWidget
+from core.batch import BatchProcessor, VIDEO_EXTENSIONS, collect_sources
+from .base_page import BaseEditPage
+from ..workers import BatchWorker
+
+
+STATUS_TEXT = {
+    'pending': '等待中',
+    'running': '处理中',
+    'success': '✅ 完成',
+    'skipped': '⏭ 已跳过',
+    'failed': '❌ 失败',
+    'cancelled': '已取消',
+}
+
+class BatchPage(BaseEditPage):
+    # 批量页面支持的操作 (音视频合并和剪辑需要逐个指定参数，仅命令行支持批量)
+    OPERATIONS = [("格式转换", "convert"), ("视频压缩", "compress"), ("去水印", "watermark")]
+
+    def __init__(self, main_window, processor):
+        super().__init__(main_window, processor)
+        self.batch_processor = BatchProcessor(processor)
+        self.files = []
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(40, 30, 40, 30)
+        layout.setSpacing(20)
+        
+        self.setup_header(layout, "批量处理", "对多个视频执行同一操作，已处理过的文件会自动跳过")
+        
+        self.batch_file_list = DragDropListWidget()
+        self.batch_file_list.file_dropped.connect(self.add_file)
+        layout.addWidget(self.batch_file_list, 1)
+        
+        file_btns = QHBoxLayout()
+        file_btns.addWidget(self.create_button("添加文件", self.select_files))
+        file_btns.addWidget(self.create_button("添加文件夹", self.select_folder))
+        file_btns.addWidget(self.create_button("清空", self.clear_files))
+        file_btns.addStretch()
+        self.count_label = QLabel("共 0 个文件")
+        self.count_label.setStyleSheet("color: #666; font-size: 14px;")
+        file_btns.addWidget(self.count_label)
+        layout.addLayout(file_btns)
+        
+        # Settings
+        settings_group = QGroupBox("批量设置")
+        settings_group.setStyleSheet("QGroupBox { font-size: 20px; color: #333; border: 1px solid #ddd; border-radius: 8px; margin-top: 10px; padding-top: 15px; }")
+        settings_layout = QHBoxLayout(settings_group)
+        
+        settings_layout.addWidget(QLabel("操作:"))
+        self.op_combo = NoScrollComboBox()
+        self.op_combo.addItems([name for name, _ in self.OPERATIONS])
+        self.style_combo(self.op_combo)
+        settings_layout.addWidget(self.op_combo)
+        settings_layout.addSpacing(20)
+        
+        self.options_stack = QStackedWidget()
+        
+        # 格式转换
+        convert_widget = QWidget()
+        convert_layout = QHBoxLayout(convert_widget)
+        convert_layout.setContentsMargins(0, 0, 0, 0)
+        convert_layout.addWidget(QLabel("目标格式:"))
+        self.format_combo = NoScrollComboBox()
+        self.format_combo.addItems(["mp4", "mkv", "avi", "mov", "mp3"])
+        self.style_combo(self.format_combo)
+        convert_layout.addWidget(self.format_combo)
+        convert_layout.addStretch()
+        self.options_stack.addWidget(convert_widget)
+        
+        # 视频压缩
+        compress_widget = QWidget()
+        compress_layout = QHBoxLayout(compress_widget)
+        compress_layout.setContentsMargins(0, 0, 0, 0)
+        compress_layout.addWidget(QLabel("目标分辨率:"))
+        self.res_combo = NoScrollComboBox()
+        self.res_combo.addItems(["1920x1080", "1280x720", "854x480", "640x360"])
+        self.style_combo(self.res_combo)
+        compress_layout.addWidget(self.res_combo)
+        compress_layout.addWidget(QLabel("画质 (CRF):"))
+        self.crf_spin = QSpinBox()
+        self.crf_spin.setRange(18, 51)
+        self.crf_spin.setValue(23)
+        self.style_spinbox(self.crf_spin)
+        compress_layout.addWidget(self.crf_spin)
+        compress_layout.addStretch()
+        self.options_stack.addWidget(compress_widget)
+        
+        # 去水印 (自动计算水印位置)
+        watermark_widget = QWidget()
+        watermark_layout = QHBoxLayout(watermark_widget)
+        watermark_layout.setContentsMargins(0, 0, 0, 0)
+        watermark_layout.addWidget(QLabel("自动检测水印位置 (未检测到时按分辨率估计)"))
+        watermark_layout.addStretch()
+        self.options_stack.addWidget(watermark_widget)
+        
+        self.op_combo.currentIndexChanged.connect(self.options_stack.setCurrentIndex)
+        settings_layout.addWidget(self.options_stack, 1)
+        layout.addWidget(settings_group)
+        
+        # Controls
+        controls_frame = self.create_control_frame()
+        controls_layout = QHBoxLayout(controls_frame)
+        controls_layout.addStretch()
+        
+        self.batch_btn = self.create_primary_button("开始批量处理", self.start_batch)
+        self.batch_btn.setEnabled(False)
+        controls_layout.addWidget(self.batch_btn)
+        
+        self.batch_cancel_btn = self.create_cancel_button()
+        controls_layout.addWidget(self.batch_cancel_btn)
+        
+        layout.addWidget(controls_frame)
+        
+        self.batch_progress = self.create_progress_bar()
+        layout.addWidget(self.batch_progress)
+        
+        self.batch_status = QLabel("")
+        self.batch_status.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.batch_status)
+        
+        self.reset_list(self.batch_file_list, "👇 拖拽多个视频文件到此处")
+
+    def add_file(self, file_path):
+        if not file_path.lower().endswith(VIDEO_EXTENSIONS):
+            return
+        path = os.path.abspath(file_path)
+        if path in self.files:
+            return
+        if not self.files:
+            self.batch_file_list.clear()
+        self.files.append(path)
+        item = QListWidgetItem(f"{os.path.basename(path)}    {STATUS_TEXT['pending']}")
+        item.setData(Qt.UserRole, path)
+        self.batch_file_list.addItem(item)
+        self.count_label.setText(f"共 {len(self.files)} 个文件")
+        self.batch_btn.setEnabled(True)
+
+    def select_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择视频文件", self.main_window.crawler.data_dir,
+            "Video Files (*.mp4 *.mkv *.avi *.mov *.flv);;All Files (*.*)"
+        )
+        for path in paths:
+            self.add_file(path)
+
+    def select_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择文件夹", self.main_window.crawler.data_dir)
+        if not folder:
+            return
+        for path in collect_sources(folder):
+            self.add_file(path)
+
+    def clear_files(self):
+        if self.worker and self.worker.isRunning():
+            return
+        self.files = []
+        self.count_label.setText("共 0 个文件")
+        self.batch_btn.setEnabled(False)
+        self.reset_list(self.batch_file_list, "👇 拖拽多个视频文件到此处")
+
+    def get_options(self, operation):
+        if operation == 'convert':
+            return {'format': self.format_combo.currentText()}
+        if operation == 'compress':
+            return {'resolution': self.res_combo.currentText(), 'crf': self.crf_spin.value()}
+        return {}
+
+    def start_batch(self):
+        if not self.files:
+            return
+        operation = self.OPERATIONS[self.op_combo.currentIndex()][1]
+        
+        self.batch_btn.setEnabled(False)
+        self.batch_cancel_btn.setEnabled(True)
+        self.batch_progress.setVisible(True)
+        self.batch_progress.setValue(0)
+        self.batch_status.setText(f"正在批量处理 {len(self.files)} 个文件...")
+        for i in range(self.batch_file_list.count()):
+            item = self.batch_file_list.item(i)
+            item.setText(f"{os.path.basename(item.data(Qt.UserRole))}    {STATUS_TEXT['pending']}")
+        
+        self.main_window.log_to_console(f"开始批量{self.op_combo.currentText()}: {len(self.files)} 个文件", "info")
+        
+        self.worker = BatchWorker(self.batch_processor, operation, list(self.files), self.get_options(operation))
+        self.worker.progress_signal.connect(self.batch_progress.setValue)
+        self.worker.item_signal.connect(self.on_item_changed)
+        self.worker.finished_signal.connect(self.on_batch_finished)
+        self.worker.start()
+
+    def on_item_changed(self, index, status, message):
+        item = self.batch_file_list.item(index)
+        if not item:
+            return
+        item.setText(f"{os.path.basename(item.data(Qt.UserRole))}    {STATUS_TEXT.get(status, status)}")
+        item.setToolTip(message)
+        if status == 'failed':
+            self.main_window.log_to_console(f"处理失败: {os.path.basename(item.data(Qt.UserRole))}: {message}", "error")
+
+    def on_batch_finished(self, summary):
+        self.batch_btn.setEnabled(True)
+        self.batch_cancel_btn.setEnabled(False)
+        self.batch_progress.setValue(100)
+        text = f"完成 {summary['success']} 个，跳过 {summary['skipped']} 个，失败 {summary['failed']} 个"
+        if summary.get('error'):
+            text = f"❌ 批量处理出错: {summary['error']}"
+        self.batch_status.setText(text)
+        self.main_window.log_to_console(f"批量处理结束: {text}", "success" if not summary['failed'] else "warning")
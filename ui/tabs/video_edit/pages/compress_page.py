@@ -60,6 +60,9 @@ class CompressPage(BaseEditPage):
         self.compress_btn.setEnabled(False)
         controls_layout.addWidget(self.compress_btn)
         
+        self.compress_cancel_btn = self.create_cancel_button()
+        controls_layout.addWidget(self.compress_cancel_btn)
+        
         layout.addWidget(controls_frame)
         
         self.compress_progress = self.create_progress_bar()
@@ -93,11 +96,14 @@ class CompressPage(BaseEditPage):
         # Removed fade_in/fade_out arguments
         self.worker = GenericWorker(self.processor.compress_video, file_path, res, crf)
         self.worker.progress_signal.connect(self.compress_progress.setValue)
+        self.connect_stats(self.worker, self.compress_progress)
         self.worker.finished_signal.connect(self.on_compress_finished)
         self.worker.start()
+        self.compress_cancel_btn.setEnabled(True)
         
     def on_compress_finished(self, success, msg):
         self.compress_btn.setEnabled(True)
+        self.compress_cancel_btn.setEnabled(False)
         if success:
             self.compress_status.setText(f"✅ 压缩成功: {os.path.basename(msg)}")
             self.compress_progress.setValue(100)
@@ -115,6 +115,7 @@ class ConvertPage(BaseEditPage):
         
         self.worker = GenericWorker(self.processor.convert_video, file_path, fmt)
         self.worker.progress_signal.connect(self.convert_progress.setValue)
+        self.connect_stats(self.worker, self.convert_progress)
         self.worker.finished_signal.connect(lambda s, m: self.on_convert_finished(s, m, btn))
         self.worker.start()
         
@@ -1,15 +1,16 @@
 import os
 from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QGroupBox, 
-                             QStackedWidget, QDoubleSpinBox, QSpinBox, QMessageBox, QWidget)
+                             QStackedWidget, QDoubleSpinBox, QSpinBox, QMessageBox, QWidget, QCheckBox)
 from PyQt5.QtCore import Qt
 from ui.widgets.custom_combobox import NoScrollComboBox
-from ui.widgets.edit_widgets import DragDropListWidget
+from ui.widgets.edit_widgets import DragDropListWidget, FilmstripWidget
 from .base_page import BaseEditPage
 from ..workers import GenericWorker
 
 class CutPage(BaseEditPage):
     def __init__(self, main_window, processor):
         super().__init__(main_window, processor)
+        self.cut_duration = 0
         self.init_ui()
 
     def init_ui(self):
@@ -94,6 +95,18 @@ class CutPage(BaseEditPage):
         
         settings_layout.addLayout(range_layout)
         
+        # Filmstrip: 显示剪辑范围，点击将较近的一端移动到该位置
+        self.filmstrip = FilmstripWidget(thumb_height=60, count=16)
+        self.filmstrip.position_clicked.connect(self.on_filmstrip_clicked)
+        settings_layout.addWidget(self.filmstrip)
+        for spin in (self.start_time_spin, self.end_time_spin, self.start_frame_spin, self.end_frame_spin):
+            spin.valueChanged.connect(self.update_filmstrip_range)
+        
+        self.smart_cut_check = QCheckBox("智能剪辑 (仅重新编码首尾片段，速度更快)")
+        self.smart_cut_check.setChecked(True)
+        self.smart_cut_check.setToolTip("中间部分按关键帧直接复制，只有首尾不完整的GOP会重新编码")
+        settings_layout.addWidget(self.smart_cut_check)
+        
         # Make settings group larger by giving it stretch in main layout
         layout.addWidget(settings_group, 1) # Add stretch factor 1 to settings
         
@@ -146,11 +159,14 @@ class CutPage(BaseEditPage):
                 if self.end_time_spin.value() == 0:
                     self.end_time_spin.setValue(duration)
                 self.duration_label.setText(f"总时长: {duration:.2f}秒")
+        self.update_filmstrip_range()
 
     def on_cut_file_dropped(self, file_path):
         self.set_single_file(file_path, self.cut_file_list, self.cut_btn)
+        self.load_filmstrip(file_path, self.filmstrip)
         # Get duration
         duration = self.processor.get_video_duration(file_path)
+        self.cut_duration = duration
         self.duration_label.setText(f"总时长: {duration:.2f}秒")
         self.start_time_spin.setMaximum(duration)
         self.end_time_spin.setMaximum(duration)
@@ -165,6 +181,27 @@ class CutPage(BaseEditPage):
         except:
             pass
         
+    def update_filmstrip_range(self):
+        if self.input_stack.currentIndex() == 1:
+            total = self.end_frame_spin.maximum()
+            if total > 0:
+                self.filmstrip.set_range(self.start_frame_spin.value() / total, self.end_frame_spin.value() / total)
+        elif self.cut_duration > 0:
+            self.filmstrip.set_range(self.start_time_spin.value() / self.cut_duration,
+                                     self.end_time_spin.value() / self.cut_duration)
+
+    def on_filmstrip_clicked(self, ratio):
+        if self.input_stack.currentIndex() == 1:
+            start_spin, end_spin = self.start_frame_spin, self.end_frame_spin
+            value = int(ratio * end_spin.maximum())
+        else:
+            start_spin, end_spin = self.start_time_spin, self.end_time_spin
+            value = ratio * self.cut_duration
+        if abs(value - start_spin.value()) <= abs(value - end_spin.value()):
+            start_spin.setValue(value)
+        else:
+            end_spin.setValue(value)
+
     def start_cut(self):
         file_path = self.cut_file_list.item(0).data(Qt.UserRole)
         if not file_path:
@@ -190,8 +227,10 @@ class CutPage(BaseEditPage):
         self.main_window.log_to_console(f"开始剪辑视频: {os.path.basename(file_path)} ({start} - {end})", "info")
         
         # Removed fade_in and fade_out
-        self.worker = GenericWorker(self.processor.cut_video, file_path, start, end, unit)
+        self.worker = GenericWorker(self.processor.cut_video, file_path, start, end, unit,
+                                    smart=self.smart_cut_check.isChecked())
         self.worker.progress_signal.connect(self.cut_progress.setValue)
+        self.connect_stats(self.worker, self.cut_progress)
         self.worker.finished_signal.connect(self.on_cut_finished)
         self.worker.start()
         
@@ -2,19 +2,30 @@ import os
 import cv2
 from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QGroupBox, 
                              QSizePolicy, QSlider, QSpinBox, QFileDialog, 
-                             QPushButton, QFrame, QSplitter, QWidget)
-from PyQt5.QtCore import Qt
+                             QPushButton, QFrame, QSplitter, QWidget,
+                             QStackedWidget, QDoubleSpinBox, QLineEdit)
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap
-from ui.widgets.edit_widgets import DragDropListWidget
+from ui.widgets.custom_combobox import NoScrollComboBox
+from ui.widgets.edit_widgets import DragDropListWidget, FilmstripWidget
+from core.config import ConfigManager
+from core.frame_decoder import FrameDecoder
 from .base_page import BaseEditPage
+from ..workers import GenericWorker
 
 class FramePage(BaseEditPage):
+    # 解码线程完成一帧后通过信号回到界面线程显示
+    frame_ready = pyqtSignal(int, object)
+
     def __init__(self, main_window, processor):
         super().__init__(main_window, processor)
-        self.cap = None
+        self.decoder = None
+        self.video_path = None
         self.current_frame_img = None
+        self.current_frame_idx = 0
         self.total_frames = 0
         self.fps = 30 # Default
+        self.frame_ready.connect(self.show_frame)
         self.init_ui()
 
     def init_ui(self):
@@ -116,6 +127,12 @@ class FramePage(BaseEditPage):
         
         controls_layout.addLayout(slider_layout)
         
+        # Filmstrip (点击缩略图跳转)
+        self.filmstrip = FilmstripWidget(thumb_height=60, count=16)
+        self.filmstrip.position_clicked.connect(
+            lambda ratio: self.frame_slider.setValue(int(ratio * max(0, self.total_frames - 1))))
+        controls_layout.addWidget(self.filmstrip)
+        
         # 2. Buttons
         btns_layout = QHBoxLayout()
         btns_layout.setSpacing(10)
@@ -210,23 +227,81 @@ class FramePage(BaseEditPage):
         controls_layout.addLayout(btns_layout)
         layout.addWidget(controls_frame)
         
+        # Bulk Export
+        export_group = QGroupBox("批量导出")
+        export_group.setStyleSheet("QGroupBox { font-size: 16px; color: #333; border: 1px solid #ddd; border-radius: 8px; margin-top: 10px; padding-top: 15px; }")
+        export_layout = QHBoxLayout(export_group)
+        
+        export_layout.addWidget(QLabel("方式:"))
+        self.export_mode_combo = NoScrollComboBox()
+        self.export_mode_combo.addItems(["每隔N帧", "指定时间点", "场景变化"])
+        self.style_combo(self.export_mode_combo)
+        export_layout.addWidget(self.export_mode_combo)
+        
+        self.export_stack = QStackedWidget()
+        self.export_interval_spin = QSpinBox()
+        self.export_interval_spin.setRange(1, 100000)
+        self.export_interval_spin.setValue(30)
+        self.export_interval_spin.setSuffix(" 帧")
+        self.style_spinbox(self.export_interval_spin)
+        self.export_stack.addWidget(self.export_interval_spin)
+        
+        self.export_times_edit = QLineEdit()
+        self.export_times_edit.setPlaceholderText("时间点(秒)，以逗号分隔，如 1.5, 10, 62")
+        self.export_stack.addWidget(self.export_times_edit)
+        
+        self.export_scene_spin = QDoubleSpinBox()
+        self.export_scene_spin.setRange(0.05, 1.0)
+        self.export_scene_spin.setSingleStep(0.05)
+        self.export_scene_spin.setValue(0.3)
+        self.export_scene_spin.setToolTip("场景变化阈值，越小导出的帧越多")
+        self.style_spinbox(self.export_scene_spin)
+        self.export_stack.addWidget(self.export_scene_spin)
+        
+        self.export_mode_combo.currentIndexChanged.connect(self.export_stack.setCurrentIndex)
+        export_layout.addWidget(self.export_stack, 1)
+        
+        export_layout.addWidget(QLabel("格式:"))
+        self.export_format_combo = NoScrollComboBox()
+        self.export_format_combo.addItems(["jpg", "png"])
+        self.style_combo(self.export_format_combo)
+        export_layout.addWidget(self.export_format_combo)
+        
+        self.export_btn = self.create_button("导出", self.start_export)
+        self.export_btn.setEnabled(False)
+        export_layout.addWidget(self.export_btn)
+        
+        self.export_cancel_btn = self.create_cancel_button()
+        export_layout.addWidget(self.export_cancel_btn)
+        
+        layout.addWidget(export_group)
+        
+        self.export_progress = self.create_progress_bar()
+        layout.addWidget(self.export_progress)
+        
         self.reset_list(self.frame_file_list, "👇 拖拽视频文件到此处")
 
     def load_video_for_frame(self, file_path):
         self.set_single_file(file_path, self.frame_file_list, None)
+        self.video_path = file_path
+        self.export_btn.setEnabled(True)
+        self.load_filmstrip(file_path, self.filmstrip)
         
-        if self.cap is not None:
-            self.cap.release()
+        if self.decoder is not None:
+            self.decoder.close()
+            self.decoder = None
+        self.current_frame_img = None
             
         try:
-            self.cap = cv2.VideoCapture(file_path)
-            if not self.cap.isOpened():
+            decoder = FrameDecoder(file_path, self.frame_ready.emit, probe=self.processor.probe,
+                                   cache_mb=ConfigManager().get('frame_cache_mb', 256))
+            if not decoder.open():
                 self.main_window.log_to_console("无法打开视频文件", "error")
                 return
+            self.decoder = decoder
                 
-            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            self.fps = self.cap.get(cv2.CAP_PROP_FPS)
-            if self.fps <= 0: self.fps = 30
+            self.total_frames = decoder.total_frames
+            self.fps = decoder.fps
             
             self.frame_slider.setRange(0, self.total_frames - 1)
             self.frame_slider.setValue(0)
@@ -249,6 +324,8 @@ class FramePage(BaseEditPage):
             self.frame_spin.blockSignals(True)
             self.frame_spin.setValue(frame_idx)
             self.frame_spin.blockSignals(False)
+        if self.total_frames > 1:
+            self.filmstrip.set_marker(frame_idx / (self.total_frames - 1))
         self.update_frame_preview(frame_idx)
         
     def on_frame_spin_changed(self, val):
@@ -265,16 +342,20 @@ class FramePage(BaseEditPage):
         self.jump_frame(delta_frames)
             
     def update_frame_preview(self, frame_idx):
-        if not self.cap or not self.cap.isOpened():
+        if not self.decoder:
+            return
+        # 解码在后台线程进行，快速拖动时只有最新的请求会被显示
+        self.decoder.request(frame_idx)
+
+    def show_frame(self, frame_idx, frame):
+        # 丢弃已经不是当前位置的帧
+        if frame_idx != self.frame_slider.value():
             return
             
         try:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            ret, frame = self.cap.read()
-            if ret:
-                # Convert BGR to RGB
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if frame is not None:
                 self.current_frame_img = frame
+                self.current_frame_idx = frame_idx
                 
                 h, w, ch = frame.shape
                 bytes_per_line = ch * w
@@ -305,7 +386,7 @@ class FramePage(BaseEditPage):
             
         file_path, _ = QFileDialog.getSaveFileName(
             self, "保存帧", 
-            os.path.join(self.main_window.crawler.data_dir, f"frame_{self.frame_slider.value()}.jpg"), 
+            os.path.join(self.main_window.crawler.data_dir, f"frame_{self.current_frame_idx}.jpg"), 
             "Image Files (*.jpg *.png *.bmp)"
         )
         
@@ -317,3 +398,45 @@ class FramePage(BaseEditPage):
                 self.main_window.log_to_console(f"已保存帧到: {file_path}", "success")
             except Exception as e:
                  self.main_window.log_to_console(f"保存失败: {e}", "error")
+
+    def start_export(self):
+        if not self.video_path:
+            return
+        mode = ('interval', 'timestamps', 'scene')[self.export_mode_combo.currentIndex()]
+        timestamps = None
+        if mode == 'timestamps':
+            try:
+                timestamps = [float(t) for t in self.export_times_edit.text().replace('，', ',').split(',') if t.strip()]
+            except ValueError:
+                self.main_window.log_to_console("时间点格式不正确", "error")
+                return
+            if not timestamps:
+                self.main_window.log_to_console("请输入要导出的时间点", "warning")
+                return
+        
+        name = os.path.splitext(os.path.basename(self.video_path))[0]
+        default_dir = os.path.join(self.main_window.crawler.data_dir, "frames", name)
+        output_dir = QFileDialog.getExistingDirectory(self, "选择导出目录", os.path.dirname(default_dir))
+        if not output_dir:
+            return
+        output_dir = os.path.join(output_dir, name)
+        
+        self.export_btn.setEnabled(False)
+        self.export_cancel_btn.setEnabled(True)
+        self.export_progress.setVisible(True)
+        self.export_progress.setValue(0)
+        self.main_window.log_to_console(f"开始批量导出帧: {output_dir}", "info")
+        
+        self.worker = GenericWorker(self.processor.export_frames, self.video_path, output_dir, mode=mode,
+                                    interval=self.export_interval_spin.value(), timestamps=timestamps,
+                                    scene_threshold=self.export_scene_spin.value(),
+                                    image_format=self.export_format_combo.currentText())
+        self.worker.progress_signal.connect(lambda c, t: self.export_progress.setValue(int(c * 100 / t) if t else 0))
+        self.worker.finished_signal.connect(self.on_export_finished)
+        self.worker.start()
+
+    def on_export_finished(self, success, msg):
+        self.export_btn.setEnabled(True)
+        self.export_cancel_btn.setEnabled(False)
+        self.export_progress.setVisible(False)
+        self.main_window.log_to_console(msg if success else f"导出失败: {msg}", "success" if success else "error")
@@ -155,6 +155,7 @@ class MergePage(BaseEditPage):
                 widget = MergeItemWidget(f, duration, fps)
                 widget.removed.connect(lambda w: self.remove_merge_item(w))
                 self.merge_list.setItemWidget(item, widget)
+                self.load_filmstrip(f, widget.filmstrip)
                 
                 # Simple fade in animation for the new item
                 opacity = QGraphicsOpacityEffect(widget)
@@ -185,6 +186,7 @@ class MergePage(BaseEditPage):
                 widget = MergeItemWidget(f, duration, fps)
                 widget.removed.connect(lambda w: self.remove_merge_item(w))
                 self.merge_list.setItemWidget(item, widget)
+                self.load_filmstrip(f, widget.filmstrip)
                 
                 # Simple fade in animation for the new item
                 opacity = QGraphicsOpacityEffect(widget)
@@ -252,6 +254,7 @@ class MergePage(BaseEditPage):
         # Use merge_videos_with_range
         self.worker = GenericWorker(self.processor.merge_videos_with_range, file_list, output_path)
         self.worker.progress_signal.connect(self.merge_progress.setValue)
+        self.connect_stats(self.worker, self.merge_progress)
         self.worker.finished_signal.connect(lambda s, m: self.on_merge_finished(s, m, merge_dir))
         self.worker.start()
         
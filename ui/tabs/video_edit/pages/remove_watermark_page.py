@@ -1,22 +1,25 @@
 import os
 import cv2
+import threading
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QFileDialog, QSizePolicy, QScrollArea, QFrame, QGroupBox)
 from PyQt5.QtCore import Qt, QRect, QSize, pyqtSignal, QThread
 from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen, QColor
 from .base_page import BaseEditPage
-from ui.widgets.edit_widgets import DragDropListWidget
+from ui.widgets.edit_widgets import DragDropListWidget, FilmstripWidget
 from core.watermark import WatermarkRemover
 
 class WatermarkWorker(QThread):
     progress_signal = pyqtSignal(int)
     finished_signal = pyqtSignal(bool, str)
+    stats_signal = pyqtSignal(dict)
 
     def __init__(self, processor, input_path, rect):
         super().__init__()
         self.processor = processor
         self.input_path = input_path
         self.rect = rect
+        self.stop_event = threading.Event()
         # Use the processor's watermark_remover which is correctly configured with a runner
         if hasattr(processor, 'watermark_remover') and processor.watermark_remover:
             self.remover = processor.watermark_remover
@@ -25,6 +28,9 @@ class WatermarkWorker(QThread):
             # Note: accessing protected member _run_ffmpeg_with_progress
             self.remover = WatermarkRemover(processor.ffmpeg_path, processor._run_ffmpeg_with_progress)
 
+    def stop(self):
+        self.stop_event.set()
+
     def update_progress(self, current, total):
         if total > 0:
             self.progress_signal.emit(int(current / total * 100))
@@ -34,12 +40,30 @@ class WatermarkWorker(QThread):
             success, result = self.remover.remove_watermark_delogo(
                 self.input_path, 
                 rect=self.rect,
-                progress_callback=self.update_progress
+                progress_callback=self.update_progress,
+                stop_event=self.stop_event,
+                stats_callback=self.stats_signal.emit
             )
             self.finished_signal.emit(success, result)
         except Exception as e:
             self.finished_signal.emit(False, str(e))
 
+class DetectWorker(QThread):
+    """在后台自动检测水印位置"""
+    finished_signal = pyqtSignal(str, object)  # 视频路径, (x, y, w, h) 或 None
+
+    def __init__(self, detector, input_path):
+        super().__init__()
+        self.detector = detector
+        self.input_path = input_path
+
+    def run(self):
+        try:
+            rect = self.detector.detect(self.input_path)
+        except Exception:
+            rect = None
+        self.finished_signal.emit(self.input_path, rect)
+
 class VideoPreviewLabel(QWidget):
     rect_selected = pyqtSignal(QRect)
 
@@ -60,6 +84,22 @@ class VideoPreviewLabel(QWidget):
         self.selection_rect = QRect()
         self.update()
 
+    def set_video_rect(self, video_rect):
+        """按视频坐标设置选区 (用于自动检测结果)"""
+        if not self.image or self.image.isNull():
+            return None
+        img_w, img_h = self.image.width(), self.image.height()
+        # 与 paintEvent 相同的缩放和居中计算
+        self.scale_factor = min(self.width() / img_w, self.height() / img_h)
+        self.image_offset = ((self.width() - int(img_w * self.scale_factor)) // 2,
+                             (self.height() - int(img_h * self.scale_factor)) // 2)
+        x, y, w, h = video_rect
+        self.selection_rect = QRect(int(x * self.scale_factor) + self.image_offset[0],
+                                    int(y * self.scale_factor) + self.image_offset[1],
+                                    int(w * self.scale_factor), int(h * self.scale_factor))
+        self.update()
+        return self.selection_rect
+
     def mousePressEvent(self, event):
         if self.image and not self.image.isNull():
             self.is_selecting = True
@@ -149,6 +189,8 @@ class RemoveWatermarkPage(BaseEditPage):
         super().__init__(main_window, processor)
         self.input_path = ""
         self.selection_rect = None # QRect in label coordinates
+        self.final_rect = None
+        self.detect_worker = None
         self.init_ui()
 
     def init_ui(self):
@@ -202,6 +244,12 @@ class RemoveWatermarkPage(BaseEditPage):
         
         layout.addWidget(preview_container, 1) # Give stretch to preview
         
+        # Filmstrip: 点击缩略图换一帧预览 (部分视频片头没有水印)
+        self.filmstrip = FilmstripWidget(thumb_height=60, count=16)
+        self.filmstrip.setToolTip("点击选择用于框选水印的画面")
+        self.filmstrip.position_clicked.connect(self.on_filmstrip_clicked)
+        layout.addWidget(self.filmstrip)
+        
         # Progress
         self.progress_bar = self.create_progress_bar()
         layout.addWidget(self.progress_bar)
@@ -223,11 +271,42 @@ class RemoveWatermarkPage(BaseEditPage):
             
         self.input_path = file_path
         self.load_preview(file_path)
-        self.status_label.setText("请在预览图上框选水印区域")
+        self.load_filmstrip(file_path, self.filmstrip)
+        self.status_label.setText("正在自动检测水印位置...")
         self.start_btn.setEnabled(False)
         self.selection_rect = None
+        self.final_rect = None
+        
+        detector = getattr(self.processor, 'watermark_detector', None)
+        if detector is None:
+            self.status_label.setText("请在预览图上框选水印区域")
+            return
+        self.detect_worker = DetectWorker(detector, file_path)
+        self.detect_worker.finished_signal.connect(self.on_detected)
+        self.detect_worker.start()
+
+    def on_detected(self, file_path, rect):
+        # 检测期间已换了文件或用户已手动框选
+        if file_path != self.input_path or self.final_rect is not None:
+            return
+        if not rect:
+            self.status_label.setText("未检测到水印，请在预览图上框选水印区域")
+            return
+        self.selection_rect = self.preview_widget.set_video_rect(rect)
+        self.final_rect = tuple(rect)
+        x, y, w, h = rect
+        self.status_label.setText(f"已自动检测到水印: ({x}, {y}), 大小: {w}x{h}，可重新框选调整")
+        self.start_btn.setEnabled(True)
+
+    def on_filmstrip_clicked(self, ratio):
+        if self.input_path:
+            self.load_preview(self.input_path, ratio)
+            self.filmstrip.set_marker(ratio)
+            # 换帧后保留已选的水印区域
+            if self.final_rect:
+                self.selection_rect = self.preview_widget.set_video_rect(self.final_rect)
 
-    def load_preview(self, file_path):
+    def load_preview(self, file_path, ratio=None):
         try:
             cap = cv2.VideoCapture(file_path)
             # Read a frame from the middle to ensure watermark is visible (sometimes intro doesn't have it)
@@ -237,6 +316,8 @@ class RemoveWatermarkPage(BaseEditPage):
             
             # Try to read at 5 seconds, or 10% if video is short
             target_frame = min(int(fps * 5), int(frame_count * 0.1))
+            if ratio is not None:
+                target_frame = min(int(frame_count * ratio), max(0, frame_count - 1))
             cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
             
             ret, frame = cap.read()
@@ -287,6 +368,7 @@ class RemoveWatermarkPage(BaseEditPage):
         
         self.worker = WatermarkWorker(self.processor, self.input_path, self.final_rect)
         self.worker.progress_signal.connect(self.progress_bar.setValue)
+        self.connect_stats(self.worker, self.progress_bar)
         self.worker.finished_signal.connect(self.on_finished)
         self.worker.start()
         
@@ -33,6 +33,9 @@ class ReversePage(BaseEditPage):
         self.reverse_btn.setEnabled(False)
         controls_layout.addWidget(self.reverse_btn)
         
+        self.reverse_cancel_btn = self.create_cancel_button()
+        controls_layout.addWidget(self.reverse_cancel_btn)
+        
         layout.addWidget(controls_frame)
         
         self.reverse_progress = self.create_progress_bar()
@@ -62,11 +65,14 @@ class ReversePage(BaseEditPage):
         
         self.worker = GenericWorker(self.processor.reverse_video, file_path)
         self.worker.progress_signal.connect(self.reverse_progress.setValue)
+        self.connect_stats(self.worker, self.reverse_progress)
         self.worker.finished_signal.connect(self.on_reverse_finished)
         self.worker.start()
+        self.reverse_cancel_btn.setEnabled(True)
         
     def on_reverse_finished(self, success, msg):
         self.reverse_btn.setEnabled(True)
+        self.reverse_cancel_btn.setEnabled(False)
         if success:
             self.reverse_status.setText(f"✅ 反转成功: {os.path.basename(msg)}")
             self.reverse_progress.setValue(100)
@@ -1,14 +1,22 @@
+import inspect
+import threading
 from PyQt5.QtCore import QThread, pyqtSignal
 
 class GenericWorker(QThread):
     progress_signal = pyqtSignal(int, int)
     finished_signal = pyqtSignal(bool, str)
+    stats_signal = pyqtSignal(dict)  # ffmpeg统计: fps/speed/bitrate/out_time_us/eta
     
     def __init__(self, func, *args, **kwargs):
         super().__init__()
         self.func = func
         self.args = args
         self.kwargs = kwargs
+        self.stop_event = threading.Event()
+        
+    def stop(self):
+        """请求取消任务 (终止正在运行的ffmpeg)"""
+        self.stop_event.set()
         
     def run(self):
         def callback(current, total):
@@ -16,8 +24,69 @@ class GenericWorker(QThread):
             
         # Inject callback into kwargs
         self.kwargs['progress_callback'] = callback
+        try:
+            parameters = inspect.signature(self.func).parameters
+        except (TypeError, ValueError):
+            parameters = {}
+        if 'stop_event' in parameters:
+            self.kwargs['stop_event'] = self.stop_event
+        if 'stats_callback' in parameters:
+            self.kwargs['stats_callback'] = self.stats_signal.emit
         try:
             success, msg = self.func(*self.args, **self.kwargs)
+            if not success and self.stop_event.is_set():
+                msg = "已取消"
             self.finished_signal.emit(success, msg)
         except Exception as e:
             self.finished_signal.emit(False, str(e))
+
+class BatchWorker(QThread):
+    """在后台执行 BatchProcessor，逐项汇报状态"""
+    progress_signal = pyqtSignal(int, int)
+    item_signal = pyqtSignal(int, str, str)  # index, status, message
+    finished_signal = pyqtSignal(dict)
+
+    def __init__(self, batch_processor, operation, sources, options=None):
+        super().__init__()
+        self.batch_processor = batch_processor
+        self.operation = operation
+        self.sources = sources
+        self.options = options or {}
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        def progress(current, total):
+            self.progress_signal.emit(current, total)
+
+        def item_changed(index, item):
+            self.item_signal.emit(index, item.status, item.message)
+
+        try:
+            summary = self.batch_processor.run(self.operation, self.sources, self.options,
+                                               progress_callback=progress, item_callback=item_changed,
+                                               stop_event=self.stop_event)
+        except Exception as e:
+            summary = {'total': len(self.sources), 'success': 0, 'skipped': 0,
+                       'failed': len(self.sources), 'items': [], 'error': str(e)}
+        self.finished_signal.emit(summary)
+
+class FilmstripWorker(QThread):
+    """在后台生成视频缩略图条"""
+    finished_signal = pyqtSignal(str, str)  # 视频路径, 缩略图条路径 (失败为空)
+
+    def __init__(self, generator, video_path, count=12, height=72):
+        super().__init__()
+        self.generator = generator
+        self.video_path = video_path
+        self.count = count
+        self.height = height
+
+    def run(self):
+        try:
+            sprite = self.generator.get(self.video_path, self.count, self.height)
+        except Exception:
+            sprite = None
+        self.finished_signal.emit(self.video_path, sprite or "")
@@ -1,12 +1,72 @@
 from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QFrame, QLabel, 
                              QPushButton, QListWidget, QStackedWidget, QDoubleSpinBox, 
                              QSpinBox, QAbstractItemView)
-from PyQt5.QtCore import Qt, pyqtSignal, QSize
-from PyQt5.QtGui import QColor, QBrush, QPixmap
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QRect
+from PyQt5.QtGui import QColor, QBrush, QPixmap, QPainter, QPen
 from ui.widgets.custom_combobox import NoScrollComboBox
 
 import os
 
+class FilmstripWidget(QWidget):
+    """缩略图时间轴：显示缩略图条，可标记当前位置和选中范围，点击返回位置比例 (0-1)"""
+    position_clicked = pyqtSignal(float)
+
+    def __init__(self, thumb_height=72, count=12, parent=None):
+        super().__init__(parent)
+        self.thumb_height = thumb_height
+        self.count = count
+        self.video_path = None
+        self.sprite = None
+        self.marker = None
+        self.range = None
+        self.setFixedHeight(thumb_height)
+        self.setCursor(Qt.PointingHandCursor)
+
+    def clear(self):
+        self.video_path = None
+        self.sprite = None
+        self.marker = None
+        self.range = None
+        self.update()
+
+    def set_sprite(self, sprite_path):
+        pixmap = QPixmap(sprite_path)
+        self.sprite = pixmap if not pixmap.isNull() else None
+        self.update()
+
+    def set_marker(self, ratio):
+        self.marker = ratio
+        self.update()
+
+    def set_range(self, start_ratio, end_ratio):
+        self.range = (start_ratio, end_ratio) if end_ratio > start_ratio else None
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.sprite is not None and self.width() > 0:
+            self.position_clicked.emit(max(0.0, min(1.0, event.x() / self.width())))
+        super().mousePressEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.rect()
+        if self.sprite is None:
+            painter.fillRect(rect, QColor("#e0e0e0"))
+            return
+        painter.drawPixmap(rect, self.sprite)
+
+        width = rect.width()
+        if self.range:
+            # 选中范围以外的部分变暗
+            shade = QColor(0, 0, 0, 140)
+            start_x, end_x = int(self.range[0] * width), int(self.range[1] * width)
+            painter.fillRect(QRect(0, 0, start_x, rect.height()), shade)
+            painter.fillRect(QRect(end_x, 0, width - end_x, rect.height()), shade)
+        if self.marker is not None:
+            painter.setPen(QPen(QColor("#fb7299"), 2))
+            x = int(self.marker * width)
+            painter.drawLine(x, 0, x, rect.height())
+
 class MergeItemWidget(QWidget):
     removed = pyqtSignal(QWidget)
     
@@ -53,6 +113,11 @@ class MergeItemWidget(QWidget):
         
         layout.addLayout(info_layout, 1)
         
+        # Filmstrip (变暗部分为不截取的范围)
+        self.filmstrip = FilmstripWidget(thumb_height=40, count=6)
+        self.filmstrip.setFixedWidth(240)
+        layout.addWidget(self.filmstrip)
+        
         # Range Selection
         range_group = QFrame()
         range_group.setStyleSheet("background-color: transparent; border: none;")
@@ -130,6 +195,9 @@ class MergeItemWidget(QWidget):
         
         layout.addWidget(range_group)
         
+        for spin in (self.start_spin, self.end_spin, self.start_frame, self.end_frame):
+            spin.valueChanged.connect(self.update_filmstrip_range)
+        
         # Remove button
         remove_btn = QPushButton("✕")
         remove_btn.setFixedSize(30, 30)
@@ -167,6 +235,12 @@ class MergeItemWidget(QWidget):
 
     def update_inputs(self, index):
         self.input_stack.setCurrentIndex(index)
+        self.update_filmstrip_range()
+
+    def update_filmstrip_range(self):
+        if self.duration > 0:
+            start, end = self.get_range()
+            self.filmstrip.set_range(start / self.duration, min(end, self.duration) / self.duration)
         
     def get_range(self):
         if self.input_stack.currentIndex() == 0: # Time
@@ -10,9 +10,10 @@ import signal
 import json
 
 class VideoPlayerWindow(QMainWindow):
-    def __init__(self, bvid, title="", cookies=None):
+    def __init__(self, bvid, title="", cookies=None, url=None):
         super().__init__()
         self.bvid = bvid
+        self.url = url  # 边下边播时为本地预览地址
         self.video_title = title
         self.cookies = cookies or {}
         self.player_process = None
@@ -74,7 +75,7 @@ class VideoPlayerWindow(QMainWindow):
         try:
             # Construct URL
             # Use full video page for better compatibility and quality selection
-            url = f"https://www.bilibili.com/video/{self.bvid}"
+            url = self.url or f"https://www.bilibili.com/video/{self.bvid}"
             
             # Determine command based on environment
             if getattr(sys, 'frozen', False):
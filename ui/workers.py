@@ -93,7 +93,8 @@ class WorkerThread(QThread):
         self.task_map = {
             "popular_videos": self._get_popular_videos,
             "video_info": self._get_video_info,
-            "download_video": self._download_video
+            "download_video": self._download_video,
+            "estimate_batch": self._estimate_batch
         }
     
     def run(self):
@@ -153,6 +154,22 @@ class WorkerThread(QThread):
         data = self.crawler.get_video_info(bvid)
         return {"status": "success", "data": data}
 
+    def _estimate_batch(self):
+        bvids = self.params.get('bvids', [])
+        data = self.crawler.estimate_batch(
+            bvids,
+            video_quality=self.params.get('video_quality', '1080p'),
+            video_codec=self.params.get('video_codec', 'H.264/AVC'),
+            audio_quality=self.params.get('audio_quality', '高音质 (Hi-Res/Dolby)'),
+            selection_policy=self.params.get('selection_policy', 'preference'),
+            size_budget=self.params.get('size_budget'),
+            speed=self.params.get('speed')
+        )
+        return {"status": "success", "data": data}
+
+    def _on_preview(self, url):
+        self.update_signal.emit({"status": "info", "message": "边下边播已就绪", "preview_url": url})
+
     def _download_video(self):
         bvid = self.params.get('bvid')
         
@@ -167,6 +184,21 @@ class WorkerThread(QThread):
         def merge_cb(current, total):
              self.progress_signal.emit("merge", current, total)
              
+        # 队列预取的下载地址 (若已过期或设置不一致则为None，由crawler重新获取)
+        download_info = None
+        prefetcher = self.params.get('prefetcher')
+        if prefetcher:
+            download_info = prefetcher.take(
+                bvid, timeout=self.timeout,
+                quality_preference=self.params.get('video_quality', '1080p'),
+                codec_preference=self.params.get('video_codec', 'H.264/AVC'),
+                audio_quality_preference=self.params.get('audio_quality', '高音质 (Hi-Res/Dolby)'),
+                selection_policy=self.params.get('selection_policy', 'preference'),
+                size_budget=self.params.get('size_budget')
+            )
+
+        preview_cb = self._on_preview if self.params.get('preview') else None
+
         should_merge = self.params.get('should_merge', True)
         delete_original = self.params.get('delete_original', True)
         download_danmaku = self.params.get('download_danmaku', False)
@@ -184,7 +216,11 @@ class WorkerThread(QThread):
             stop_event=self.stop_event,
             video_quality=self.params.get('video_quality', '1080p'),
             video_codec=self.params.get('video_codec', 'H.264/AVC'),
-            audio_quality=self.params.get('audio_quality', '高音质 (Hi-Res/Dolby)')
+            audio_quality=self.params.get('audio_quality', '高音质 (Hi-Res/Dolby)'),
+            selection_policy=self.params.get('selection_policy', 'preference'),
+            size_budget=self.params.get('size_budget'),
+            download_info=download_info,
+            preview_callback=preview_cb
         )
         
         status = "error"